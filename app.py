@@ -3,26 +3,51 @@ Bureaucracy Breaker - Complete Backend with Website Form Support
 Transforms PDF and website forms into conversational experiences.
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Request, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 import PyPDF2
+from PyPDF2.generic import (ArrayObject, BooleanObject, DecodedStreamObject, DictionaryObject, IndirectObject,
+                            NameObject, NumberObject, TextStringObject)
 import io
+import csv
+import zipfile
 import os
+import sys
+import logging
 import json
 import requests
+from requests.adapters import HTTPAdapter
 import re
 import base64
 import time
-from PIL import Image
+import math
+import random
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+from cryptography.fernet import Fernet, InvalidToken
 from dotenv import load_dotenv
 from datetime import datetime
 import uuid
-from typing import Dict, List, Optional, Any
+import zlib
+import threading
+import mmap
+import hashlib
+import sqlite3
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from html import unescape as html_unescape
+import multiprocessing
+import signal
+import faulthandler
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Any, Tuple, Union
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": ["chrome-extension://*", "http://localhost:3000", "http://localhost:8004"]}})
+CORS(app, resources={r"/*": {"origins": ["chrome-extension://*", "http://localhost:3000", "http://localhost:8004"]}},
+     expose_headers=["X-Unfilled-Fields"])
 
 # Load environment variables
 load_dotenv()
@@ -32,15 +57,236 @@ OPENROUTER_API_KEY = os.getenv("My_api_key")
 UPLOAD_FOLDER = 'temp_uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = 64 * 1024
+PDF_MAGIC = b'%PDF-'
+PDF_MAGIC_WINDOW = 1024  # the header may follow up to 1KB of leading junk
+MAX_IMAGE_SIZE = int(os.getenv("MAX_IMAGE_SIZE", str(20 * 1024 * 1024)))  # 20MB
+MAX_IMAGE_PIXELS = 50_000_000  # larger images are refused before decoding
+IMAGE_MAX_SIZE = (1200, 600)  # pixels kept of a prepared image (~300dpi over a 4x2in box)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))  # background image preparation threads
+QUESTION_WORKERS = int(os.getenv("QUESTION_WORKERS", "4"))
+QUESTION_BATCH_SIZE = int(os.getenv("QUESTION_BATCH_SIZE", "20"))
+QUESTION_GROUP_MAX_FIELDS = int(os.getenv("QUESTION_GROUP_MAX_FIELDS", "8"))  # fields asked in one question
+TEXT_WORKERS = int(os.getenv("TEXT_WORKERS", "2"))  # background page-text extraction threads
+TEXT_PAGES_PER_JOB = 16
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))  # 0 = run PDF work inline
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "32"))  # queued + running PDF jobs
+PDF_JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", "60"))  # seconds, from when the job starts
+PDF_JOB_KILL_GRACE = 5  # seconds past the timeout before a job that ignores it loses its worker
+PDF_WORKER_CACHE_SIZE = 4  # parsed documents kept per worker process
+QUESTION_CACHE_PATH = os.getenv("QUESTION_CACHE_PATH", "question_cache.db")  # empty = memory only
+QUESTION_CACHE_MEMORY_SIZE = int(os.getenv("QUESTION_CACHE_MEMORY_SIZE", "2000"))
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "100000"))
+QUESTION_CACHE_TTL = int(os.getenv("QUESTION_CACHE_TTL", str(30 * 24 * 3600)))  # 30 days
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))  # seconds of inactivity
+SESSION_MEMORY_BUDGET = int(os.getenv("SESSION_MEMORY_BUDGET", str(512 * 1024 * 1024)))  # 512MB
+SESSION_REAP_INTERVAL = int(os.getenv("SESSION_REAP_INTERVAL", "60"))
+OPENROUTER_TIMEOUT = int(os.getenv("OPENROUTER_TIMEOUT", "15"))
+OPENROUTER_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "8"))
+OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "2"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = int(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # 'memory' or 'sqlite'
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+FORM_HTML_MAX_SIZE = int(os.getenv("FORM_HTML_MAX_SIZE", str(2 * 1024 * 1024)))  # characters parsed
+FORM_HTML_PARSE_BUDGET = float(os.getenv("FORM_HTML_PARSE_BUDGET", "2.0"))  # seconds
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "150"))  # prompt context per field
+CHARS_PER_TOKEN = 4
+MAX_JSON_BODY_SIZE = int(os.getenv("MAX_JSON_BODY_SIZE", str(5 * 1024 * 1024)))  # after decompression
+TEMPLATE_REGISTRY_PATH = os.getenv("TEMPLATE_REGISTRY_PATH", "templates.db")  # empty = disabled
+TEMPLATE_REGISTRY_MAX_ENTRIES = int(os.getenv("TEMPLATE_REGISTRY_MAX_ENTRIES", "1000"))
+PROFILE_STORE_PATH = os.getenv("PROFILE_STORE_PATH", "profiles.db")
+PROFILE_KEY = os.getenv("PROFILE_KEY", "")  # Fernet key; answer profiles are off without one
+BULK_ROWS_PER_JOB = 25  # answer rows per PDF worker job
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))  # rows filled per bulk request
+BULK_MAX_ROWS_SIZE = int(os.getenv("BULK_MAX_ROWS_SIZE", str(100 * 1024 * 1024)))  # 100MB rows file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG, INFO, WARNING or ERROR
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # 'text' or 'json' (one object per line)
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# PDF worker processes are spawned, so they import this module again. They
+# only run PDFProcessor/ImageProcessor jobs, so the web process's session
+# store, reaper thread and SQLite databases are not set up in them. (The
+# process name is checked because spawn re-imports the main module before
+# parent_process() is set.)
+IN_PDF_WORKER = multiprocessing.current_process().name != 'MainProcess'
+
+# ============================================================================
+# LOGGING & METRICS
+# ============================================================================
+
+class JSONLogFormatter(logging.Formatter):
+    """One JSON object per line: time, level, process, message and any `extra` fields."""
+
+    STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "process": record.processName,
+            "message": record.getMessage()
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in self.STANDARD_ATTRS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level: str, fmt: str) -> logging.Logger:
+    """Set up the app logger; PDF worker processes re-import this module and get the same setup."""
+    logger = logging.getLogger("bureaucracy_breaker")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        if fmt == "json":
+            handler.setFormatter(JSONLogFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s [%(processName)s] %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    return logger
+
+log = configure_logging(LOG_LEVEL, LOG_FORMAT)
+
+class Metrics:
+    """Process-local counters and histograms, rendered in the Prometheus text format.
+
+    Samples are keyed by metric name and a sorted tuple of label pairs.
+    Figures that components already track (cache hits, pool size, ...)
+    are not duplicated here; /metrics reads them from their stats() at
+    scrape time.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help)
+        self._counters = {}  # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [count per bucket..., +Inf count, sum]}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(self.BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.BUCKETS)] += 1
+            counts[-1] += seconds
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe how long the block takes, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ""
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    @staticmethod
+    def _value(value) -> str:
+        """A sample value with every digit kept; ':g' would turn 1234567 into 1.23457e+06."""
+        if isinstance(value, int):
+            return str(int(value))
+        value = float(value)
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+
+    def render(self, samples: List[tuple] = ()) -> str:
+        """Text exposition of every metric, plus (name, labels, value) `samples` gathered by the caller."""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self._histograms.items()}
+
+        def header(name):
+            kind, help_text = self._meta.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(counters.items()):
+            header(name)
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{self._labels(key)} {self._value(value)}")
+        for name, series in sorted(histograms.items()):
+            header(name)
+            for key, counts in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.BUCKETS, '+Inf'), counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(key)} {counts[-1]:.6f}")
+                lines.append(f"{name}_count{self._labels(key)} {cumulative}")
+        described = set()
+        for name, labels, value in samples:
+            if name not in described:
+                header(name)
+                described.add(name)
+            lines.append(f"{name}{self._labels(tuple(sorted(labels.items())))} {self._value(value)}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+metrics.describe("bb_http_request_duration_seconds", "histogram",
+                 "Time to produce a response (streamed bodies: until the first byte), by route")
+metrics.describe("bb_stage_duration_seconds", "histogram",
+                 "Time spent in each processing stage; PDF stages include time queued for a worker")
+metrics.describe("bb_llm_requests_total", "counter", "AI completion requests by kind and outcome")
+metrics.describe("bb_llm_tokens_total", "counter", "Tokens reported by the AI provider")
+metrics.describe("bb_field_classifier_total", "counter",
+                 "Fields whose question was worded locally (hit) or left to the AI (miss)")
+for name, kind, help_text in [
+    ("bb_question_cache_lookups_total", "counter", "Question cache lookups by result"),
+    ("bb_question_cache_memory_entries", "gauge", "Questions held in the in-memory cache tier"),
+    ("bb_template_lookups_total", "counter", "PDF uploads by template registry result"),
+    ("bb_templates", "gauge", "Templates in the registry"),
+    ("bb_openrouter_requests_sent_total", "counter", "HTTP requests sent to OpenRouter, retries included"),
+    ("bb_openrouter_retries_total", "counter", "OpenRouter requests retried"),
+    ("bb_openrouter_short_circuited_total", "counter", "AI calls skipped while the circuit was open"),
+    ("bb_openrouter_circuit_state", "gauge", "0 closed, 1 half open, 2 open"),
+    ("bb_pdf_jobs_pending", "gauge", "PDF worker jobs queued or running"),
+    ("bb_pdf_jobs_total", "counter", "PDF worker jobs by result"),
+    ("bb_sessions_active", "gauge", "Sessions currently stored"),
+    ("bb_sessions_expired_total", "counter", "Sessions removed after SESSION_TTL"),
+    ("bb_profile_prefilled_fields_total", "counter", "Fields answered from a returning user's profile"),
+]:
+    metrics.describe(name, kind, help_text)
+
 # ============================================================================
 # SESSION MANAGEMENT
 # ============================================================================
 
 class Session:
+    # Attributes that live only in the process that created them and are
+    # never written to a shared session backend.
+    TRANSIENT_ATTRS = ('question_futures', 'context_index', 'text_future', 'image_futures')
+
     def __init__(self, session_id):
         self.session_id = session_id
         self.form_fields = []
@@ -48,74 +294,850 @@ class Session:
         self.answers = {}
         self.created_at = datetime.now()
         self.original_pdf = None
+        self.pdf_path = None
         self.is_fillable_pdf = True
         self.pdf_text_content = ""
+        self.context_index = None  # ContextIndex over the page text extracted so far
+        self.text_future = None  # background page-text extraction
         self.pre_generated_questions = {}
         self.questions_generated = False
-        self.uploaded_images = {}
+        self.question_futures = {}
+        self.image_paths = {}  # field name -> prepared image (see ImageProcessor.prepare)
+        self.image_futures = {}  # field name -> image still being prepared
         self.document_summary = ""
-        self.answered_checkbox_groups = set()
+        self.answered_checkbox_groups = set()  # ids of checkbox groups answered together
+        self.question_groups = []  # QuestionGrouper.group_fields() output
+        self.current_group_index = 0
         self.form_type = "pdf"  # 'pdf' or 'website'
-        self.form_html = ""
+        self.form_context = ""  # compact summary of a website form's schema
+        self.template_id = None  # TemplateRegistry fingerprint of an uploaded PDF
+        self.profile_id = None  # ProfileStore id of the user filling the form
+        self.prefilled_fields = []  # names answered from the profile, never asked
+        self.last_accessed = time.time()
+
+    @property
+    def original_pdf(self) -> Optional[bytes]:
+        """PDF bytes, read from `pdf_path` on first use when stored by reference."""
+        if self._original_pdf is None and self.pdf_path:
+            with open(self.pdf_path, 'rb') as f:
+                self._original_pdf = f.read()
+        return self._original_pdf
+
+    @original_pdf.setter
+    def original_pdf(self, value: Optional[bytes]):
+        self._original_pdf = value
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by this session's documents and uploads."""
+        size = len(self._original_pdf or b"")
+        size += len(self.pdf_text_content) + len(self.form_context)
+        return size
+
+    def to_state(self) -> Dict[str, Any]:
+        """Serialisable session state; PDF and image bytes are left out."""
+        return {
+            "session_id": self.session_id,
+            "form_fields": self.form_fields,
+            "current_field_index": self.current_field_index,
+            "answers": self.answers,
+            "created_at": self.created_at.isoformat(),
+            "pdf_path": self.pdf_path,
+            "is_fillable_pdf": self.is_fillable_pdf,
+            "pdf_text_content": self.pdf_text_content,
+            "image_paths": self.image_paths,
+            "document_summary": self.document_summary,
+            "answered_checkbox_groups": sorted(self.answered_checkbox_groups),
+            "question_groups": self.question_groups,
+            "current_group_index": self.current_group_index,
+            "form_type": self.form_type,
+            "form_context": self.form_context,
+            "template_id": self.template_id,
+            "profile_id": self.profile_id,
+            "prefilled_fields": self.prefilled_fields
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'Session':
+        """Rebuild a session from to_state() output."""
+        session = cls(state["session_id"])
+        session.form_fields = state.get("form_fields", [])
+        session.current_field_index = state.get("current_field_index", 0)
+        session.answers = state.get("answers", {})
+        session.created_at = datetime.fromisoformat(state["created_at"])
+        session.pdf_path = state.get("pdf_path")
+        session.is_fillable_pdf = state.get("is_fillable_pdf", True)
+        session.pdf_text_content = state.get("pdf_text_content", "")
+        session.image_paths = state.get("image_paths", {})
+        session.document_summary = state.get("document_summary", "")
+        session.answered_checkbox_groups = set(state.get("answered_checkbox_groups", []))
+        session.question_groups = state.get("question_groups", [])
+        session.current_group_index = state.get("current_group_index", 0)
+        session.form_type = state.get("form_type", "pdf")
+        session.form_context = state.get("form_context", "")
+        session.template_id = state.get("template_id")
+        session.profile_id = state.get("profile_id")
+        session.prefilled_fields = state.get("prefilled_fields", [])
+        return session
+
+    def close(self):
+        """Release background work and open files tied to this session."""
+        for future in self.question_futures.values():
+            future.cancel()
+        if self.text_future is not None:
+            self.text_future.cancel()
+        for future in self.image_futures.values():
+            future.cancel()
+
+    def remove_files(self):
+        """Delete the uploaded PDF and images stored for this session."""
+        for path in [self.pdf_path, *self.image_paths.values()]:
+            remove_upload(path)
+        # Images still being prepared are removed once they are saved
+        for field_name, future in self.image_futures.items():
+            future.add_done_callback(lambda _, path=self.image_paths.get(field_name): remove_upload(path))
+
+class SessionStore:
+    """Interface for session backends."""
+
+    def add(self, session: Session):
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def save(self, session: Session):
+        """Persist changes made to a session during a request."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def save_questions(self, session: Session, questions: Dict[str, Dict]):
+        """Record generated questions without rewriting the rest of the session."""
+        session.pre_generated_questions.update(questions)
+
+    def save_text(self, session: Session, text: str):
+        """Record extracted document text without rewriting the rest of the session."""
+        session.pdf_text_content = text
+
+    def reap(self):
+        """Evict expired sessions; called periodically by the reaper thread."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def start_reaper(self, interval: int):
+        """Run reap() every `interval` seconds on a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                except Exception as e:
+                    log.error(f"Session reaper failed: {e}")
+
+        threading.Thread(target=loop, name="session-reaper", daemon=True).start()
+
+class MemorySessionStore(SessionStore):
+    """In-process store with idle expiry and a global byte budget.
+
+    Sessions idle for longer than `ttl` seconds are dropped, and when the
+    sessions together hold more than `memory_budget` bytes the least recently
+    used ones are evicted until they fit again.
+    """
+
+    def __init__(self, ttl: int, memory_budget: int):
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self._sessions = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def add(self, session: Session):
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sizes[session.session_id] = session.resident_bytes()
+        self._enforce_budget()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.last_accessed > self.ttl:
+                self._remove(session_id)
+                self.expired += 1
+                return None
+            session.last_accessed = time.time()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def save(self, session: Session):
+        with self._lock:
+            if session.session_id not in self._sessions:
+                return
+            session.last_accessed = time.time()
+            self._sessions.move_to_end(session.session_id)
+            self._sizes[session.session_id] = session.resident_bytes()
+        self._enforce_budget(keep=session.session_id)
+
+    def save_text(self, session: Session, text: str):
+        session.pdf_text_content = text
+        with self._lock:
+            if session.session_id in self._sizes:
+                self._sizes[session.session_id] = session.resident_bytes()
+        self._enforce_budget(keep=session.session_id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._remove(session_id)
+
+    def reap(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [sid for sid, s in self._sessions.items() if s.last_accessed < cutoff]
+            for session_id in stale:
+                self._remove(session_id)
+            self.expired += len(stale)
+        if stale:
+            log.info(f"Reaped {len(stale)} idle sessions")
+        self._enforce_budget()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "active": len(self._sessions),
+                "resident_bytes": sum(self._sizes.values()),
+                "memory_budget_bytes": self.memory_budget,
+                "expired": self.expired,
+                "evicted": self.evicted
+            }
 
-sessions = {}
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """Evict least recently used sessions until the byte budget is met."""
+        with self._lock:
+            total = sum(self._sizes.values())
+            for session_id in list(self._sessions):
+                if total <= self.memory_budget:
+                    break
+                if session_id == keep:
+                    continue
+                total -= self._sizes.get(session_id, 0)
+                self._remove(session_id)
+                self.evicted += 1
+                log.info(f"Evicted session {session_id} to stay within memory budget")
+
+    def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        self._sizes.pop(session_id, None)
+        if session is not None:
+            session.close()
+            session.remove_files()
+
+class SQLiteSessionStore(SessionStore):
+    """Session store shared by every worker process through one SQLite file.
+
+    Session state is stored as JSON, while PDF and image bytes are written to
+    files under `blob_dir` and kept by reference, so reading a session never
+    loads them until a route actually needs the bytes. Parsed PDFs and queued
+    question jobs cannot cross processes; they are kept in a small per-process
+    cache and reattached when the same worker sees the session again.
+    """
+
+    LOCAL_CACHE_SIZE = 32
+
+    def __init__(self, path: str, blob_dir: str, ttl: int):
+        self.path = path
+        self.blob_dir = blob_dir
+        self.ttl = ttl
+        self._local = threading.local()
+        self._transient = OrderedDict()
+        self._transient_lock = threading.Lock()
+        self.expired = 0
+
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, "
+            "last_accessed REAL NOT NULL, blob_bytes INTEGER NOT NULL DEFAULT 0)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS session_questions ("
+            "session_id TEXT NOT NULL, field_name TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, field_name))"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS session_text ("
+            "session_id TEXT PRIMARY KEY, text TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_accessed ON sessions (last_accessed)")
+        db.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            self._local.db = db
+        return db
+
+    def add(self, session: Session):
+        self.save(session)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        db = self._connect()
+        row = db.execute(
+            "SELECT state, last_accessed FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl:
+            self.delete(session_id)
+            self.expired += 1
+            return None
+
+        session = Session.from_state(json.loads(row[0]))
+        session.last_accessed = time.time()
+        db.execute("UPDATE sessions SET last_accessed = ? WHERE session_id = ?", (session.last_accessed, session_id))
+        db.commit()
+
+        for field_name, value in db.execute(
+            "SELECT field_name, value FROM session_questions WHERE session_id = ?", (session_id,)
+        ):
+            session.pre_generated_questions[field_name] = json.loads(value)
+        text_row = db.execute("SELECT text FROM session_text WHERE session_id = ?", (session_id,)).fetchone()
+        if text_row:
+            session.pdf_text_content = text_row[0]
+        session.questions_generated = all(
+            f.get('name', '') in session.pre_generated_questions for f in session.form_fields
+        )
+
+        with self._transient_lock:
+            transient = self._transient.get(session_id)
+            if transient:
+                self._transient.move_to_end(session_id)
+                for attr, value in transient.items():
+                    setattr(session, attr, value)
+        return session
+
+    def save(self, session: Session):
+        self._write_blobs(session)
+        session.last_accessed = time.time()
+        blob_bytes = sum(
+            os.path.getsize(path)
+            for path in [session.pdf_path, *session.image_paths.values()]
+            if path and os.path.exists(path)
+        )
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, state, last_accessed, blob_bytes) VALUES (?, ?, ?, ?)",
+            (session.session_id, json.dumps(session.to_state()), session.last_accessed, blob_bytes)
+        )
+        db.commit()
+
+        with self._transient_lock:
+            self._transient[session.session_id] = {
+                attr: getattr(session, attr) for attr in Session.TRANSIENT_ATTRS
+            }
+            self._transient.move_to_end(session.session_id)
+            while len(self._transient) > self.LOCAL_CACHE_SIZE:
+                self._transient.popitem(last=False)
+
+    def save_questions(self, session: Session, questions: Dict[str, Dict]):
+        session.pre_generated_questions.update(questions)
+        db = self._connect()
+        db.executemany(
+            "INSERT OR REPLACE INTO session_questions (session_id, field_name, value) VALUES (?, ?, ?)",
+            [(session.session_id, name, json.dumps(q)) for name, q in questions.items()]
+        )
+        db.commit()
+
+    def save_text(self, session: Session, text: str):
+        session.pdf_text_content = text
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO session_text (session_id, text) VALUES (?, ?)",
+            (session.session_id, text)
+        )
+        db.commit()
+
+    def delete(self, session_id: str):
+        db = self._connect()
+        row = db.execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        db.execute("DELETE FROM session_questions WHERE session_id = ?", (session_id,))
+        db.execute("DELETE FROM session_text WHERE session_id = ?", (session_id,))
+        db.commit()
+
+        with self._transient_lock:
+            transient = self._transient.pop(session_id, None)
+        if row:
+            session = Session.from_state(json.loads(row[0]))
+            for attr, value in (transient or {}).items():
+                setattr(session, attr, value)
+            session.close()
+            session.remove_files()
+
+    def reap(self):
+        cutoff = time.time() - self.ttl
+        stale = [
+            row[0] for row in self._connect().execute(
+                "SELECT session_id FROM sessions WHERE last_accessed < ?", (cutoff,)
+            )
+        ]
+        for session_id in stale:
+            self.delete(session_id)
+        self.expired += len(stale)
+        if stale:
+            log.info(f"Reaped {len(stale)} idle sessions")
+
+    def stats(self) -> Dict[str, Any]:
+        count, blob_bytes = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(blob_bytes), 0) FROM sessions"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "active": count,
+            "disk_bytes": blob_bytes,
+            "local_cache_entries": len(self._transient),
+            "expired": self.expired
+        }
+
+    def _write_blobs(self, session: Session):
+        """Move in-memory PDF bytes to a file the session references."""
+        if session.pdf_path is None and session._original_pdf is not None:
+            session.pdf_path = self._write_file(f"{session.session_id}.pdf", session._original_pdf)
+
+    def _write_file(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.blob_dir, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+if IN_PDF_WORKER:
+    sessions = None
+elif SESSION_BACKEND == "sqlite":
+    sessions = SQLiteSessionStore(SESSION_DB_PATH, UPLOAD_FOLDER, SESSION_TTL)
+else:
+    sessions = MemorySessionStore(SESSION_TTL, SESSION_MEMORY_BUDGET)
+if sessions is not None:
+    sessions.start_reaper(SESSION_REAP_INTERVAL)
 
 def create_session():
     """Create a new session with unique ID."""
     session_id = str(uuid.uuid4())
-    sessions[session_id] = Session(session_id)
-    print(f"[INFO] Created new session: {session_id}")
-    return sessions[session_id]
+    session = Session(session_id)
+    sessions.add(session)
+    log.info(f"Created new session: {session_id}")
+    return session
 
 def get_session(session_id):
     """Get session by ID or return error."""
-    if session_id not in sessions:
+    if not session_id:
+        return None
+    return sessions.get(session_id)
+
+def save_session(session):
+    """Write back a session after a request has changed it."""
+    sessions.save(session)
+
+def delete_session(session_id):
+    """Remove a session and release everything it holds."""
+    sessions.delete(session_id)
+
+# ============================================================================
+# UPLOAD STORAGE
+# ============================================================================
+
+class UploadFile:
+    """Spool file that receives one multipart upload straight from the parser.
+
+    Size and magic-header checks run on every write, so an oversized or
+    non-PDF body is rejected after the first chunks instead of after the
+    whole request has been buffered.
+    """
+
+    def __init__(self, path: str, max_size: int, magic: Optional[bytes] = None):
+        self.path = path
+        self.max_size = max_size
+        self.magic = magic
+        self.claimed = False
+        self._written = 0
+        self._head = b''
+        self.sha256 = hashlib.sha256()
+        self._file = open(path, 'w+b')
+
+    def write(self, data: bytes) -> int:
+        self._written += len(data)
+        if self._written > self.max_size:
+            raise RequestEntityTooLarge(f"File too large. Maximum {self.max_size // (1024 * 1024)}MB.")
+        if self.magic and len(self._head) < PDF_MAGIC_WINDOW:
+            self._head += data[:PDF_MAGIC_WINDOW - len(self._head)]
+            if self.magic in self._head:
+                self.magic = None
+            elif len(self._head) >= PDF_MAGIC_WINDOW:
+                raise BadRequest("File must be a PDF")
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def read(self, *args) -> bytes:
+        return self._file.read(*args)
+
+    def readline(self, *args) -> bytes:
+        return self._file.readline(*args)
+
+    def seek(self, *args) -> int:
+        return self._file.seek(*args)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class UploadRequest(Request):
+    """Request that spools upload routes' files into UPLOAD_FOLDER with checks."""
+
+    # route -> (file suffix, required magic header, maximum size)
+    UPLOAD_ROUTES = {
+        '/upload-pdf': ('.pdf', PDF_MAGIC, MAX_FILE_SIZE),
+        '/upload-image': ('.img', None, MAX_IMAGE_SIZE),
+        '/bulk-fill': ('.pdf', PDF_MAGIC, MAX_FILE_SIZE)
+    }
+    # Routes whose other (non-PDF) files are parsed the usual way
+    MIXED_UPLOAD_ROUTES = {'/bulk-fill'}
+    # route -> largest body accepted, checked against Content-Length before anything is read
+    BODY_LIMITS = {
+        '/upload-pdf': MAX_FILE_SIZE + UPLOAD_CHUNK_SIZE,
+        '/upload-image': MAX_IMAGE_SIZE + UPLOAD_CHUNK_SIZE,
+        '/bulk-fill': MAX_FILE_SIZE + BULK_MAX_ROWS_SIZE + UPLOAD_CHUNK_SIZE
+    }
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        return self.BODY_LIMITS.get(self.path, super().max_content_length)
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        rule = self.UPLOAD_ROUTES.get(self.path)
+        if rule is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        suffix, magic, max_size = rule
+        if magic and filename and not filename.lower().endswith(suffix):
+            if self.path in self.MIXED_UPLOAD_ROUTES:
+                return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+            raise BadRequest("File must be a PDF")
+        upload = UploadFile(os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}{suffix}"), max_size, magic)
+        if not hasattr(self, 'upload_files'):
+            self.upload_files = []
+        self.upload_files.append(upload)
+        return upload
+
+app.request_class = UploadRequest
+# Body limit for routes without their own in UploadRequest.BODY_LIMITS
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE + UPLOAD_CHUNK_SIZE
+
+@app.before_request
+def start_request_timer():
+    request.started_at = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Observe route latency; streamed bodies are timed until their first byte is ready."""
+    started = getattr(request, 'started_at', None)
+    if started is not None:
+        metrics.observe(
+            "bb_http_request_duration_seconds", time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method, status=str(response.status_code)
+        )
+    return response
+
+@app.teardown_request
+def remove_unclaimed_uploads(error=None):
+    """Delete spooled uploads that no session took ownership of."""
+    for upload in getattr(request, 'upload_files', []):
+        if not upload.claimed:
+            upload.close()
+            remove_upload(upload.path)
+
+def save_upload(file, suffix: str, max_size: int) -> Optional[str]:
+    """Stream an uploaded file into UPLOAD_FOLDER, enforcing max_size as it goes.
+
+    Files already spooled by UploadRequest are claimed in place. Returns the
+    path of the stored file, or None if the upload was larger than max_size
+    (the partial file is removed).
+    """
+    if isinstance(file.stream, UploadFile):
+        file.stream.claimed = True
+        file.stream.close()
+        return file.stream.path
+
+    path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}{suffix}")
+    written = 0
+    try:
+        with open(path, 'wb') as out:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    break
+                out.write(chunk)
+    except Exception:
+        remove_upload(path)
+        raise
+
+    if written > max_size:
+        remove_upload(path)
         return None
-    return sessions[session_id]
+    return path
+
+def upload_digest(file, path: str) -> str:
+    """SHA-256 of a saved upload, taken while it was spooled when possible."""
+    if isinstance(file.stream, UploadFile):
+        return file.stream.sha256.hexdigest()
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def remove_upload(path: Optional[str]):
+    """Delete a stored upload, ignoring files that are already gone."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def stream_upload(path: str, suffix: bytes = b'', chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Yield a stored upload in chunks, followed by `suffix`."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    yield suffix
+
+def get_request_json(max_size: int = MAX_JSON_BODY_SIZE) -> Dict:
+    """Parse a JSON request body, inflating it first if it was sent gzip-encoded."""
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    if encoding == 'identity':
+        return request.get_json(silent=True) or {}
+    if encoding != 'gzip':
+        raise BadRequest(f"Unsupported Content-Encoding: {encoding}")
+
+    # Bounded inflate so a small compressed body cannot expand without limit
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = inflater.decompress(request.get_data(cache=False), max_size + 1)
+    except zlib.error:
+        raise BadRequest("Request body is not valid gzip")
+    if len(body) > max_size:
+        raise BadRequest(f"Request body too large. Maximum {max_size // (1024 * 1024)}MB uncompressed.")
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise BadRequest("Request body is not valid JSON")
+    return data if isinstance(data, dict) else {}
 
 # ============================================================================
 # PDF PROCESSING
 # ============================================================================
 
+class ParsedPDF:
+    """A PDF parsed once at upload and reused for extraction and filling.
+
+    Built from bytes or from a file path; files are memory-mapped so the
+    document is paged in by the OS instead of being copied onto the heap.
+    """
+
+    def __init__(self, pdf_bytes: Optional[bytes] = None, path: Optional[str] = None):
+        self.path = path
+        self._file = None
+        if path:
+            self._file = open(path, 'rb')
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.reader = PyPDF2.PdfReader(self.data)
+        else:
+            self.data = pdf_bytes
+            self.reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        # PdfReader resolves objects lazily from a shared stream, so
+        # concurrent readers must take turns.
+        self.lock = threading.RLock()
+        self._page_texts = {}
+
+    @property
+    def page_count(self) -> int:
+        with self.lock:
+            return len(self.reader.pages)
+
+    def page_text(self, page_index: int) -> str:
+        """Text of one page (0-based), extracted on first use and then memoized."""
+        with self.lock:
+            text = self._page_texts.get(page_index)
+            if text is None:
+                try:
+                    text = self.reader.pages[page_index].extract_text() or ""
+                except Exception as e:
+                    log.debug("Error extracting text from page %d: %s", page_index, e)
+                    text = ""
+                self._page_texts[page_index] = text
+            return text
+
+    @property
+    def pdf_bytes(self) -> bytes:
+        """A copy of the raw document bytes."""
+        return bytes(self.data)
+
+    def close(self):
+        """Unmap and close the backing file, if any."""
+        if self._file is not None:
+            with self.lock:
+                self.data.close()
+                self._file.close()
+                self._file = None
+
 class PDFProcessor:
     """Handles PDF form processing."""
 
     @staticmethod
-    def extract_fields(pdf_bytes: bytes) -> List[Dict]:
+    def parse(pdf: Union[bytes, str, ParsedPDF]) -> ParsedPDF:
+        """Parse raw PDF bytes or a PDF file path, or pass a parsed document through."""
+        if isinstance(pdf, ParsedPDF):
+            return pdf
+        if isinstance(pdf, str):
+            return ParsedPDF(path=pdf)
+        return ParsedPDF(pdf)
+
+    @staticmethod
+    def extract_fields(pdf: Union[bytes, str, ParsedPDF]) -> List[Dict]:
         """Extract field information from a PDF's AcroForm."""
         try:
-            pdf_stream = io.BytesIO(pdf_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_stream)
-            print(f"[DEBUG] PDF has {len(pdf_reader.pages)} pages")
+            parsed = PDFProcessor.parse(pdf)
+            pdf_reader = parsed.reader
+            log.debug("PDF has %d pages", len(pdf_reader.pages))
             field_list = []
 
             # Try to get fields from the PDF reader
             try:
                 if hasattr(pdf_reader, 'get_fields'):
-                    fields_dict = pdf_reader.get_fields()
+                    with parsed.lock:
+                        fields_dict = pdf_reader.get_fields()
                     if fields_dict:
+                        with parsed.lock:
+                            widget_pages = PDFProcessor._widget_pages(pdf_reader)
                         for field_name, field_obj in fields_dict.items():
                             field_type = PDFProcessor._determine_field_type(field_obj)
                             field_info = {
                                 "name": str(field_name),
                                 "type": field_type
                             }
+                            if str(field_name) in widget_pages:
+                                field_info["page"] = widget_pages[str(field_name)]
                             field_list.append(field_info)
-                            print(f"[DEBUG] Found field: {field_name} ({field_type})")
+                            log.debug("Found field: %s (%s)", field_name, field_type)
             except Exception as e:
-                print(f"[DEBUG] get_fields() failed: {e}")
+                log.debug("get_fields() failed: %s", e)
 
             if field_list:
-                print(f"[INFO] Found {len(field_list)} AcroForm fields")
+                log.info(f"Found {len(field_list)} AcroForm fields")
                 return field_list
 
-            print("[INFO] No AcroForm fields found in PDF")
+            log.info("No AcroForm fields found in PDF")
             return []
 
         except Exception as e:
-            print(f"[ERROR] Field extraction failed: {str(e)}")
+            log.error(f"Field extraction failed: {str(e)}")
             return []
 
+    @staticmethod
+    def _widget_pages(pdf_reader) -> Dict[str, int]:
+        """Map each field name (see _iter_widgets) to the (1-based) page of its first widget."""
+        pages = {}
+        for page_index, names, _ in PDFProcessor._iter_widgets(pdf_reader.pages):
+            for name in names:
+                pages.setdefault(name, page_index + 1)
+        return pages
+
+    @staticmethod
+    def _iter_widgets(pages):
+        """Yield (page_index, names, widget) for every form widget on `pages`.
+
+        `names` holds the fully qualified field name and, for fields nested
+        under a parent, the partial name PdfReader.get_fields() reports.
+        """
+        for page_index, page in enumerate(pages):
+            try:
+                annots = page.get('/Annots') or []
+                for annot_ref in annots:
+                    annot = annot_ref.get_object()
+                    if annot.get('/Subtype') != '/Widget':
+                        continue
+                    # Kids without a /T of their own take their parent's name
+                    parts = []
+                    node = annot
+                    while node is not None:
+                        if '/T' in node:
+                            parts.append(str(node['/T']))
+                        node = node.get('/Parent')
+                        node = node.get_object() if node is not None else None
+                    if parts:
+                        qualified = '.'.join(reversed(parts))
+                        yield page_index, (qualified,) if len(parts) == 1 else (qualified, parts[0]), annot
+            except Exception as e:
+                log.debug("Could not read widgets on page %d: %s", page_index, e)
+
+    @staticmethod
+    def _inherited(node, key: str):
+        """Look up a field attribute on a widget or the nearest parent that sets it."""
+        while node is not None:
+            if key in node:
+                return node[key]
+            node = node.get('/Parent')
+            node = node.get_object() if node is not None else None
+        return None
+
+    @staticmethod
+    def _field_node(widget):
+        """The field dictionary holding the value for `widget`: its nearest named ancestor."""
+        node = widget
+        while '/T' not in node and '/Parent' in node:
+            node = node['/Parent'].get_object()
+        return node
+
+    @staticmethod
+    def fingerprint(pdf: Union[bytes, str, ParsedPDF]) -> str:
+        """Hash of the form's structure: page sizes plus each widget's name, type, page and position.
+
+        Copies of one template share a fingerprint even when their bytes
+        differ (re-saved, partly filled, new metadata).
+        """
+        parsed = PDFProcessor.parse(pdf)
+        with parsed.lock:
+            pages = parsed.reader.pages
+            sizes = [[round(float(v)) for v in page.mediabox] for page in pages]
+            widgets = sorted(
+                (names[0], str(PDFProcessor._inherited(widget, '/FT')), page_index,
+                 [round(float(v)) for v in widget.get('/Rect') or []])
+                for page_index, names, widget in PDFProcessor._iter_widgets(pages)
+            )
+        return hashlib.sha256(json.dumps([sizes, widgets]).encode('utf-8')).hexdigest()
+
     @staticmethod
     def _determine_field_type(field_obj) -> str:
         """Determine field type based on PDF field object."""
@@ -134,284 +1156,3249 @@ class PDFProcessor:
                     return "checkbox"
                 elif '/Ch' in ft_str:
                     return "choice"
+                elif '/Sig' in ft_str:
+                    return "signature"
 
             return "text"
         except Exception as e:
-            print(f"[DEBUG] Field type detection error: {e}")
+            log.debug("Field type detection error: %s", e)
             return "text"
 
     @staticmethod
-    def extract_text(pdf_bytes: bytes) -> str:
+    def extract_text(pdf: Union[bytes, str, ParsedPDF]) -> str:
         """Extract all text content from a PDF."""
+        return PDFProcessor.join_pages(PDFProcessor.extract_page_texts(pdf))
+
+    @staticmethod
+    def extract_page_texts(pdf: Union[bytes, str, ParsedPDF]) -> List[str]:
+        """Extract the text of each page; pages without text are empty strings."""
         try:
-            pdf_stream = io.BytesIO(pdf_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_stream)
-            text_content = []
+            parsed = PDFProcessor.parse(pdf)
+            pages = [parsed.page_text(page_index) for page_index in range(parsed.page_count)]
+            log.info(f"Extracted {sum(len(t) for t in pages)} characters of text from PDF")
+            return pages
 
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content.append(f"--- Page {page_num + 1} ---\n{page_text}")
-                except Exception as e:
-                    print(f"[DEBUG] Error extracting text from page {page_num}: {e}")
-                    continue
+        except Exception as e:
+            log.error(f"Text extraction failed: {e}")
+            return []
 
-            full_text = "\n\n".join(text_content)
-            print(f"[INFO] Extracted {len(full_text)} characters of text from PDF")
-            return full_text
+    @staticmethod
+    def join_pages(pages: List[str]) -> str:
+        """Join page texts under "--- Page N ---" markers (see ContextIndex.from_text)."""
+        return "\n\n".join(
+            f"--- Page {page_num + 1} ---\n{text}" for page_num, text in enumerate(pages) if text
+        )
 
-        except Exception as e:
-            print(f"[ERROR] Text extraction failed: {e}")
-            return ""
+    # Field flags (PDF 32000-1, tables 226 and 230)
+    FLAG_RADIO = 1 << 15
+    FLAG_PUSHBUTTON = 1 << 16
+    FLAG_COMBO = 1 << 17
+    FLAG_EDIT = 1 << 18
+    FLAG_MULTISELECT = 1 << 21
+    ANNOT_HIDDEN = 1 << 1  # annotation flag (table 165)
+    CHECKED_ANSWERS = {'yes', 'y', 'true', 'on', '1', 'x', 'checked'}
+    UNCHECKED_ANSWERS = {'no', 'n', 'false', 'off', '0', 'unchecked'}
+
+    @staticmethod
+    def fill_pdf(pdf: Union[bytes, str, ParsedPDF], answers: Dict[str, str],
+                 images: Optional[Dict[str, str]] = None) -> Tuple[bytes, Dict[str, str]]:
+        """Fill PDF form fields with provided answers.
+
+        `images` maps field names to prepared images (ImageProcessor.prepare)
+        that are stamped over those fields instead of their text answers.
+        Returns the filled PDF and a map of field name -> reason for every
+        answer that could not be written. Answers are appended to the
+        original bytes as an incremental update when the document allows it.
+        """
+        parsed = PDFProcessor.parse(pdf)
+        update, failed = PDFProcessor.fill_pdf_update(parsed, answers, images)
+        if update is not None:
+            return parsed.pdf_bytes + update, failed
+        return PDFProcessor._fill_rewrite(parsed, answers, images)
+
+    @staticmethod
+    def fill_pdf_update(pdf: Union[bytes, str, ParsedPDF], answers: Dict[str, str],
+                        images: Optional[Dict[str, str]] = None) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """Fill answers as an incremental update to append to the original file.
+
+        The update holds only the field and widget objects that changed, the
+        AcroForm (for /NeedAppearances) and a new cross-reference section
+        chained to the old one, so its size follows the number of answers
+        rather than the size of the document. Returns (None, {}) when the
+        document needs a full rewrite instead: it is encrypted, has no
+        AcroForm, keeps widgets inline in a page, or its last
+        cross-reference section cannot be found.
+        """
+        images = images or {}
+        answers = {name: value for name, value in answers.items() if name not in images}
+        parsed = PDFProcessor.parse(pdf)
+        with parsed.lock:
+            reader = parsed.reader
+            prev = PDFProcessor._startxref(parsed.data)
+            root = reader.trailer['/Root']
+            if reader.is_encrypted or prev is None or '/AcroForm' not in root:
+                return None, {}
+
+            widgets = {}
+            image_widgets = {}
+            for page_index, names, widget in PDFProcessor._iter_widgets(reader.pages):
+                for name in names:
+                    if name in answers or name in images:
+                        if widget.indirect_reference is None:
+                            return None, {}
+                    if name in answers:
+                        widgets.setdefault(name, []).append(widget)
+                    if name in images:
+                        image_widgets.setdefault(name, []).append((page_index, widget))
+
+            # The reader is shared, so changes go to copies of its objects
+            copies = {}
+
+            def edit(obj):
+                idnum = obj.indirect_reference.idnum
+                if idnum not in copies:
+                    copy = DictionaryObject(obj)
+                    copy.indirect_reference = obj.indirect_reference
+                    copies[idnum] = (obj, copy)
+                return copies[idnum][1]
+
+            # New objects (images, page content) are numbered after the last existing one
+            added = []
+            first_free = PDFProcessor._object_count(reader)
+
+            def add(obj):
+                obj.indirect_reference = IndirectObject(first_free + len(added), 0, reader)
+                added.append(obj)
+                return obj.indirect_reference
+
+            failed = PDFProcessor._fill_answers(widgets, answers, edit)
+            failed.update(PDFProcessor._stamp_images(reader.pages, image_widgets, images, edit, add))
+
+            acroform = root.raw_get('/AcroForm')
+            if isinstance(acroform, IndirectObject):
+                acroform = edit(acroform.get_object())
+            else:
+                acroform = DictionaryObject(acroform.get_object())
+                edit(root)[NameObject('/AcroForm')] = acroform
+            acroform[NameObject('/NeedAppearances')] = BooleanObject(True)
+
+            changed = [copy for original, copy in copies.values() if copy != original]
+            return PDFProcessor._incremental_update(parsed.data, prev, reader, changed + added), failed
+
+    @staticmethod
+    def _fill_rewrite(parsed: ParsedPDF, answers: Dict[str, str],
+                      images: Optional[Dict[str, str]] = None) -> Tuple[bytes, Dict[str, str]]:
+        """Fill answers into a full copy of the document."""
+        images = images or {}
+        answers = {name: value for name, value in answers.items() if name not in images}
+        pdf_writer = PyPDF2.PdfWriter()
+
+        # The AcroForm and pages are cloned into the writer, so the shared
+        # reader is left untouched for later fills. The AcroForm goes first:
+        # page cloning drops /Parent links, while widgets already cloned with
+        # the field tree are reused as-is by the page /Annots. Widget /P
+        # links are skipped (they would drag in the source page tree) and
+        # re-pointed at the new pages below.
+        with parsed.lock:
+            acroform = parsed.reader.trailer['/Root'].get('/AcroForm')
+            if acroform is not None:
+                acroform = acroform.get_object().clone(pdf_writer, ignore_fields=('/P',))
+            for page in parsed.reader.pages:
+                pdf_writer.add_page(page)
+
+        # One pass over the annotations, keeping only widgets we have answers for
+        widgets = {}
+        image_widgets = {}
+        roots = ArrayObject()
+        for page_index, names, widget in PDFProcessor._iter_widgets(pdf_writer.pages):
+            widget[NameObject('/P')] = pdf_writer.pages[page_index].indirect_reference
+            for name in names:
+                if name in answers:
+                    widgets.setdefault(name, []).append(widget)
+                if name in images:
+                    image_widgets.setdefault(name, []).append((page_index, widget))
+            if acroform is None:
+                root = widget
+                while '/Parent' in root:
+                    root = root['/Parent'].get_object()
+                if root.indirect_reference is not None and root.indirect_reference not in roots:
+                    roots.append(root.indirect_reference)
+
+        if acroform is None:
+            acroform = DictionaryObject({NameObject('/Fields'): roots})
+        acroform[NameObject('/NeedAppearances')] = BooleanObject(True)
+        pdf_writer._root_object[NameObject('/AcroForm')] = (
+            acroform.indirect_reference if acroform.indirect_reference is not None else acroform
+        )
+
+        failed = PDFProcessor._fill_answers(widgets, answers, lambda obj: obj)
+        failed.update(PDFProcessor._stamp_images(
+            pdf_writer.pages, image_widgets, images, lambda obj: obj, pdf_writer._add_object
+        ))
+        output_stream = io.BytesIO()
+        pdf_writer.write(output_stream)
+        return output_stream.getvalue(), failed
+
+    @staticmethod
+    def _fill_answers(widgets: Dict[str, List], answers: Dict[str, str], edit) -> Dict[str, str]:
+        """Write each answer to its widgets; returns field name -> reason for the ones that failed.
+
+        `edit` maps a field or widget dictionary to the object to modify.
+        """
+        failed = {}
+        filled = 0
+        for name, value in answers.items():
+            value = str(value).strip() if value is not None else ''
+            if not value:
+                continue
+            if name not in widgets:
+                failed[name] = "field not found"
+                continue
+            try:
+                field = edit(PDFProcessor._field_node(widgets[name][0]))
+                reason = PDFProcessor._fill_field(field, [edit(widget) for widget in widgets[name]], value)
+            except Exception as e:
+                reason = f"could not be written: {e}"
+            if reason:
+                failed[name] = reason
+            else:
+                filled += 1
+        log.info(f"Filled {filled} of {len(answers)} fields")
+        return failed
+
+    @staticmethod
+    def _stamp_images(pages, widgets: Dict[str, List], images: Dict[str, str], edit, add) -> Dict[str, str]:
+        """Draw each field's image over its widgets; returns field name -> reason for the ones that failed.
+
+        `widgets` maps field names to (page index, widget) pairs and `add`
+        stores a new object, returning its reference. Images are drawn into
+        the page content rather than the widget's appearance, which viewers
+        rebuild under /NeedAppearances; the widget itself is hidden so its
+        background cannot cover the image.
+        """
+        failed = {}
+        stamps = {}  # page index -> [(widget, image reference, width, height)]
+        for name, path in images.items():
+            if name not in widgets:
+                failed[name] = "field not found"
+                continue
+            try:
+                image = ImageProcessor.pdf_image(path)
+            except Exception as e:
+                failed[name] = f"image could not be read: {e}"
+                continue
+            ref = add(image)
+            for page_index, widget in widgets[name]:
+                stamps.setdefault(page_index, []).append((widget, ref, image['/Width'], image['/Height']))
+
+        for page_index, page_stamps in stamps.items():
+            page = edit(pages[page_index])
+            resources = PDFProcessor._inherited(page, '/Resources')
+            resources = DictionaryObject(resources.get_object() if resources is not None else {})
+            xobjects = resources.get('/XObject')
+            xobjects = DictionaryObject(xobjects.get_object() if xobjects is not None else {})
+            names = {}
+            content = []
+            for widget, ref, width, height in page_stamps:
+                if ref.idnum not in names:
+                    names[ref.idnum] = next(
+                        f"/BBImage{n}" for n in range(len(xobjects) + 1) if f"/BBImage{n}" not in xobjects
+                    )
+                    xobjects[NameObject(names[ref.idnum])] = ref
+                # Fit the image inside the widget, keeping its proportions, centred
+                x0, y0, x1, y1 = (float(v) for v in widget['/Rect'])
+                x0, x1, y0, y1 = min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)
+                scale = min((x1 - x0) / width, (y1 - y0) / height)
+                w, h = width * scale, height * scale
+                x, y = x0 + (x1 - x0 - w) / 2, y0 + (y1 - y0 - h) / 2
+                content.append(f"q 0 g {w:.2f} 0 0 {h:.2f} {x:.2f} {y:.2f} cm {names[ref.idnum]} Do Q")
+                widget = edit(widget)
+                widget[NameObject('/F')] = NumberObject(int(widget.get('/F', 0)) | PDFProcessor.ANNOT_HIDDEN)
+            resources[NameObject('/XObject')] = xobjects
+            page[NameObject('/Resources')] = resources
+            page[NameObject('/Contents')] = PDFProcessor._append_content(page, "\n".join(content).encode(), add)
+
+        stamped = [name for name in images if name not in failed]
+        if stamped:
+            log.info(f"Stamped {len(stamped)} images")
+        return failed
+
+    @staticmethod
+    def _append_content(page, content: bytes, add) -> ArrayObject:
+        """The page's /Contents with `content` drawn after it.
+
+        The existing content is wrapped in q/Q so any graphics state it
+        leaves behind does not move or recolour what is drawn after it.
+        """
+        contents = page.raw_get('/Contents') if '/Contents' in page else None
+        if isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+            contents = contents.get_object()
+        existing = list(contents) if isinstance(contents, ArrayObject) else [contents] if contents is not None else []
+
+        def new_stream(data: bytes) -> IndirectObject:
+            stream = DecodedStreamObject()
+            stream.set_data(data)
+            return add(stream)
+
+        streams = ArrayObject(existing)
+        if existing:
+            streams.insert(0, new_stream(b"q\n"))
+            content = b"\nQ\n" + content
+        streams.append(new_stream(content + b"\n"))
+        return streams
+
+    @staticmethod
+    def _startxref(data) -> Optional[int]:
+        """Offset of the document's last cross-reference section, or None if it does not point at one."""
+        pos = data.rfind(b'startxref', max(0, len(data) - 2048))
+        match = re.match(rb'\s*(\d+)', data[pos + 9:pos + 40]) if pos >= 0 else None
+        if not match:
+            return None
+        offset = int(match.group(1))
+        head = data[offset:offset + 32]
+        if head.startswith(b'xref') or re.match(rb'\d+\s+\d+\s+obj', head):
+            return offset
+        return None
+
+    @staticmethod
+    def _incremental_update(data, prev: int, reader, objects: List[DictionaryObject]) -> bytes:
+        """Serialize `objects` under their own object numbers, plus an xref section and trailer chained to `prev`."""
+        out = io.BytesIO()
+        base = len(data)
+        if data[-1:] not in (b'\n', b'\r'):
+            out.write(b'\n')
+        offsets = {}
+        for obj in sorted(objects, key=lambda o: o.indirect_reference.idnum):
+            ref = obj.indirect_reference
+            offsets[ref.idnum] = (base + out.tell(), ref.generation)
+            out.write(f"{ref.idnum} {ref.generation} obj\n".encode())
+            obj.write_to_stream(out, None)
+            out.write(b"\nendobj\n")
+
+        trailer = reader.trailer
+        size = max(PDFProcessor._object_count(reader), *(idnum + 1 for idnum in offsets))
+        new_trailer = DictionaryObject({NameObject(key): trailer.raw_get(key) for key in ('/Root', '/Info', '/ID') if key in trailer})
+        new_trailer[NameObject('/Prev')] = NumberObject(prev)
+        xref_offset = base + out.tell()
+        if data[prev:prev + 4] == b'xref':
+            new_trailer[NameObject('/Size')] = NumberObject(size)
+            out.write(b"xref\n")
+            for start, idnums in PDFProcessor._xref_runs(offsets):
+                out.write(f"{start} {len(idnums)}\n".encode())
+                for idnum in idnums:
+                    offset, generation = offsets[idnum]
+                    out.write(f"{offset:010d} {generation:05d} n\r\n".encode())
+            out.write(b"trailer\n")
+            new_trailer.write_to_stream(out, None)
+        else:
+            # Documents indexed by a cross-reference stream get one too
+            offsets[size] = (xref_offset, 0)
+            runs = PDFProcessor._xref_runs(offsets)
+            xref = DecodedStreamObject()
+            xref.set_data(b''.join(
+                b'\x01' + offsets[idnum][0].to_bytes(4, 'big') + offsets[idnum][1].to_bytes(2, 'big')
+                for _, idnums in runs for idnum in idnums
+            ))
+            xref.update(new_trailer)
+            xref.update({
+                NameObject('/Type'): NameObject('/XRef'),
+                NameObject('/Size'): NumberObject(size + 1),
+                NameObject('/W'): ArrayObject([NumberObject(1), NumberObject(4), NumberObject(2)]),
+                NameObject('/Index'): ArrayObject(
+                    NumberObject(n) for start, idnums in runs for n in (start, len(idnums))
+                ),
+            })
+            out.write(f"{size} 0 obj\n".encode())
+            xref.write_to_stream(out, None)
+            out.write(b"\nendobj")
+        out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        return out.getvalue()
+
+    @staticmethod
+    def _object_count(reader) -> int:
+        """Number of object numbers in use (the trailer /Size), so the first free number."""
+        # Readers only keep /Size from classic trailers, so it is recounted from the xref
+        return max(
+            int(reader.trailer.get('/Size', 0)),
+            *(idnum + 1 for section in reader.xref.values() for idnum in section),
+            *(idnum + 1 for idnum in reader.xref_objStm),
+        )
+
+    @staticmethod
+    def _xref_runs(offsets: Dict[int, Any]) -> List[Tuple[int, List[int]]]:
+        """Group object numbers into (first, [numbers]) runs of consecutive numbers."""
+        runs = []
+        for idnum in sorted(offsets):
+            if runs and idnum == runs[-1][0] + len(runs[-1][1]):
+                runs[-1][1].append(idnum)
+            else:
+                runs.append((idnum, [idnum]))
+        return runs
+
+    @staticmethod
+    def _fill_field(field, widgets: List, value: str) -> Optional[str]:
+        """Write one answer to a field and its widgets; returns why it failed, or None."""
+        field_type = PDFProcessor._inherited(field, '/FT')
+        flags = int(PDFProcessor._inherited(field, '/Ff') or 0)
+
+        if field_type == '/Tx':
+            field[NameObject('/V')] = TextStringObject(value)
+            # Viewers rebuild the appearance (NeedAppearances) instead of showing the old value
+            for widget in widgets:
+                widget.pop('/AP', None)
+            return None
+
+        if field_type == '/Btn':
+            if flags & PDFProcessor.FLAG_PUSHBUTTON:
+                return "push buttons cannot be filled"
+            states = [PDFProcessor._on_states(widget) for widget in widgets]
+            wanted = value.lstrip('/').lower()
+            if flags & PDFProcessor.FLAG_RADIO:
+                # A radio answer names one widget's on-state, or its /Opt export value
+                options = PDFProcessor._inherited(field, '/Opt') or []
+                chosen = None
+                for index, widget_states in enumerate(states):
+                    labels = [state[1:].lower() for state in widget_states]
+                    if index < len(options):
+                        labels.append(str(options[index].get_object()).lower())
+                    if widget_states and wanted in labels:
+                        chosen = widget_states[0]
+                        break
+                if chosen is None:
+                    return "not one of the options"
+            else:
+                on_state = next((s[0] for s in states if s), '/Yes')
+                if wanted in PDFProcessor.CHECKED_ANSWERS or wanted == on_state[1:].lower():
+                    chosen = on_state
+                elif wanted in PDFProcessor.UNCHECKED_ANSWERS:
+                    chosen = '/Off'
+                else:
+                    return "expected yes or no"
+            field[NameObject('/V')] = NameObject(chosen)
+            for widget, widget_states in zip(widgets, states):
+                widget[NameObject('/AS')] = NameObject(chosen if chosen in widget_states else '/Off')
+            return None
+
+        if field_type == '/Ch':
+            options = []
+            for option in PDFProcessor._inherited(field, '/Opt') or []:
+                option = option.get_object()
+                if isinstance(option, list):
+                    export, display = str(option[0].get_object()), str(option[-1].get_object())
+                else:
+                    export = display = str(option)
+                options.append((export, display))
+            multiselect = flags & PDFProcessor.FLAG_MULTISELECT and not flags & PDFProcessor.FLAG_COMBO
+            parts = [p.strip() for p in value.split(',')] if multiselect else [value]
+            chosen = []
+            for part in parts:
+                match = next((export for export, display in options
+                              if part.lower() in (export.lower(), display.lower())), None)
+                if match is None:
+                    if not (flags & PDFProcessor.FLAG_COMBO and flags & PDFProcessor.FLAG_EDIT):
+                        return "not one of the options"
+                    match = part  # editable combo boxes accept free text
+                chosen.append(match)
+            if multiselect:
+                field[NameObject('/V')] = ArrayObject(TextStringObject(c) for c in chosen)
+            else:
+                field[NameObject('/V')] = TextStringObject(chosen[0])
+            field.pop('/I', None)  # stale selected indices would override /V
+            for widget in widgets:
+                widget.pop('/AP', None)
+            return None
+
+        return f"unsupported field type {field_type}"
+
+    @staticmethod
+    def _on_states(widget) -> List[str]:
+        """Appearance states other than /Off that a button widget can be set to."""
+        appearances = widget.get('/AP')
+        normal = appearances.get_object().get('/N') if appearances is not None else None
+        if normal is None:
+            return []
+        normal = normal.get_object()
+        if not hasattr(normal, 'keys'):
+            return []
+        return [str(state) for state in normal.keys() if state != '/Off']
+
+# ============================================================================
+# IMAGE PROCESSING
+# ============================================================================
+
+class ImageProcessor:
+    """Turns uploaded photos and scans into small images to stamp into a PDF."""
+
+    FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP', 'BMP', 'TIFF')
+    BACKGROUND_SCALE = 8  # paper brightness is estimated on a 1/8 scale copy
+    MIN_INK_CONTRAST = 24  # gray levels below the paper that still count as paper
+    PADDING = 0.03  # margin left around the ink, as a share of its larger side
+
+    @staticmethod
+    def check(path: str) -> Tuple[int, int]:
+        """Size of the image at `path`, read from its header; raises ValueError if it is not one we take."""
+        try:
+            with Image.open(path, formats=ImageProcessor.FORMATS) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError("File must be a PNG, JPEG, GIF, WebP, BMP or TIFF image") from e
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ValueError(f"Image too large. Maximum {MAX_IMAGE_PIXELS // 1_000_000} megapixels.")
+        return width, height
+
+    @staticmethod
+    def prepare(path: str, out_path: str, bilevel: bool = True) -> Dict[str, Any]:
+        """Decode the image at `path` and save a compact PNG of it at `out_path`.
+
+        The image is turned upright (EXIF orientation), flattened onto white,
+        evened out for uneven lighting, cropped to the ink and shrunk to fit
+        IMAGE_MAX_SIZE. Signatures (`bilevel`) are then reduced to 1 bit per
+        pixel; other images stay 8-bit grayscale. Returns the saved size.
+        """
+        ImageProcessor.check(path)
+        with Image.open(path, formats=ImageProcessor.FORMATS) as image:
+            # JPEGs decode straight to grayscale at the smallest scale still covering IMAGE_MAX_SIZE
+            image.draft('L', IMAGE_MAX_SIZE)
+            gray = ImageProcessor._grayscale(ImageOps.exif_transpose(image))
+
+        # Ink is whatever is darker than the paper around it, so shadows and
+        # gradients across a phone photo do not count
+        scale = ImageProcessor.BACKGROUND_SCALE
+        paper = gray.reduce(scale).filter(ImageFilter.MaxFilter(5)).filter(ImageFilter.BoxBlur(2))
+        ink = ImageChops.subtract(paper.resize(gray.size, Image.BILINEAR), gray)
+        threshold = max(ImageProcessor._otsu(ink.histogram()), ImageProcessor.MIN_INK_CONTRAST)
+
+        # Single stray pixels fade out at 1/4 scale, so they do not widen the crop
+        box = ink.reduce(4).point(lambda v: 255 if v >= threshold // 2 else 0).getbbox()
+        if box is None:
+            raise ValueError("Image looks blank")
+        pad = int(max(box[2] - box[0], box[3] - box[1]) * 4 * ImageProcessor.PADDING) + 1
+        box = (max(box[0] * 4 - pad, 0), max(box[1] * 4 - pad, 0),
+               min(box[2] * 4 + pad, gray.width), min(box[3] * 4 + pad, gray.height))
+
+        if bilevel:
+            ink = ink.crop(box)
+            ink.thumbnail(IMAGE_MAX_SIZE, Image.LANCZOS)
+            result = ink.point(lambda v: 0 if v >= threshold else 255, '1')
+        else:
+            result = gray.crop(box)
+            result.thumbnail(IMAGE_MAX_SIZE, Image.LANCZOS)
+
+        tmp_path = f"{out_path}.tmp"
+        result.save(tmp_path, 'PNG', optimize=True)
+        os.replace(tmp_path, out_path)
+        return {"width": result.width, "height": result.height, "mode": result.mode,
+                "bytes": os.path.getsize(out_path)}
+
+    @staticmethod
+    def _grayscale(image) -> Image.Image:
+        """8-bit grayscale copy of `image`, with any transparency flattened onto white."""
+        if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+            return Image.alpha_composite(background, image).convert('L')
+        return image.convert('L')
+
+    @staticmethod
+    def _otsu(histogram: List[int]) -> int:
+        """Otsu's threshold: the level that best splits a 256-bin histogram in two."""
+        total = sum(histogram)
+        total_weight = sum(level * count for level, count in enumerate(histogram))
+        below = below_weight = 0
+        best, best_level = -1.0, 128
+        for level, count in enumerate(histogram[:-1]):
+            below += count
+            below_weight += level * count
+            above = total - below
+            if not below or not above:
+                continue
+            spread = below * above * (below_weight / below - (total_weight - below_weight) / above) ** 2
+            if spread > best:
+                best, best_level = spread, level + 1
+        return best_level
+
+    @staticmethod
+    def pdf_image(path: str):
+        """An image XObject for a prepared image.
+
+        1-bit images become stencil masks, painted in the fill colour with
+        the paper left transparent, so the form's lines show through.
+        """
+        with Image.open(path) as image:
+            attributes = {
+                NameObject('/Type'): NameObject('/XObject'),
+                NameObject('/Subtype'): NameObject('/Image'),
+                NameObject('/Width'): NumberObject(image.width),
+                NameObject('/Height'): NumberObject(image.height),
+            }
+            if image.mode == '1':
+                attributes[NameObject('/ImageMask')] = BooleanObject(True)
+                attributes[NameObject('/BitsPerComponent')] = NumberObject(1)
+            else:
+                image = image.convert('L')
+                attributes[NameObject('/ColorSpace')] = NameObject('/DeviceGray')
+                attributes[NameObject('/BitsPerComponent')] = NumberObject(8)
+            stream = DecodedStreamObject()
+            stream.set_data(image.tobytes())
+        stream = stream.flate_encode()
+        stream.update(attributes)
+        return stream
+
+# ============================================================================
+# PDF WORKER POOL
+# ============================================================================
+
+class PDFPoolBusy(Exception):
+    """Raised when the PDF worker pool already has its maximum of queued jobs."""
+
+class PDFJobExpired(BaseException):
+    """Raised inside a worker when its job's time is up (not an Exception, so jobs cannot swallow it)."""
+
+class PDFWorkerPool:
+    """Runs CPU-heavy PDFProcessor work in a bounded pool of worker processes.
+
+    PyPDF2 is pure Python, so parsing, text extraction and filling inline
+    would hold the GIL and stall every other request in the process. At most
+    `max_pending` jobs may be queued or running at once; past that, submit()
+    raises PDFPoolBusy. Each job's time limit is enforced inside its worker
+    and starts when the job does (see _pool_job), so time spent queued never
+    counts. Without SIGALRM (Windows) the parent enforces it instead, from
+    when the job is handed to a worker, and stops the pool's workers on
+    expiry. With `workers` set to 0, jobs run inline in the calling thread.
+    """
+
+    # Whether workers can time their own jobs (see _pool_job)
+    WORKER_ALARM = hasattr(signal, 'SIGALRM')
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.retried = 0
+
+    def run(self, fn, *args, timeout: Optional[float] = None):
+        """Run `fn(*args)` in a worker and return its result.
+
+        Raises PDFPoolBusy when the queue is full and TimeoutError when the
+        job runs longer than `timeout` (default: the pool's timeout).
+        """
+        if self.workers <= 0:
+            return fn(*args)
+
+        return self._result(self._submit(fn, args, timeout))
+
+    def imap(self, fn, jobs, window: int, timeout: Optional[float] = None):
+        """Yield `fn(*args)` for each args tuple in `jobs`, in order, with up to `window` jobs in flight.
+
+        For batch work: results stream out while later jobs run, and a full
+        queue is waited out rather than raising PDFPoolBusy. A job that
+        fails yields its exception in place of a result.
+        """
+        if self.workers <= 0:
+            for args in jobs:
+                try:
+                    yield fn(*args)
+                except Exception as e:
+                    yield e
+            return
+
+        jobs = iter(jobs)
+        args = next(jobs, None)
+        in_flight = deque()
+        try:
+            while args is not None or in_flight:
+                if args is not None and len(in_flight) < window:
+                    try:
+                        in_flight.append(self._submit(fn, args, timeout, count_rejected=False))
+                        args = next(jobs, None)
+                        continue
+                    except PDFPoolBusy:
+                        if not in_flight:
+                            time.sleep(0.05)  # interactive jobs hold the queue; wait for room
+                            continue
+                try:
+                    yield self._result(in_flight.popleft())
+                except Exception as e:
+                    yield e
+        finally:
+            for job in in_flight:
+                job["future"].cancel()
+                remove_upload(job["marker"])
+
+    def _result(self, job: Dict[str, Any]):
+        """Wait for a submitted job.
+
+        When a worker dies, every job in its pool fails with
+        BrokenProcessPool. The job that killed it (its marker file holds
+        the traceback _pool_job wrote) raises TimeoutError; the others
+        were only caught up in it and are run once more on a fresh pool.
+        """
+        fn, timeout = job["fn"], job["timeout"]
+        try:
+            if job["marker"] is None:
+                return self._wait(job)
+            return job["future"].result()
+        except TimeoutError:
+            self.timeouts += 1
+            log.warning(f"PDF job {fn.__name__} exceeded {timeout}s")
+            raise
+        except BrokenProcessPool:
+            self._discard(job["executor"])
+            hung = job["marker"] is not None and os.path.exists(job["marker"]) and os.path.getsize(job["marker"]) > 0
+            if hung:
+                self.timeouts += 1
+                log.warning(f"PDF job {fn.__name__} ignored its {timeout}s limit, its worker was stopped")
+                raise TimeoutError(f"PDF processing took longer than {timeout}s")
+            if job["retried"]:
+                raise
+            with self._lock:
+                self.retried += 1
+            log.info(f"Retrying PDF job {fn.__name__} after a worker was lost")
+            return self._result(self._submit(fn, job["args"], timeout, retried=True))
+        finally:
+            remove_upload(job["marker"])
+
+    def _wait(self, job: Dict[str, Any]):
+        """A job's result, timed here from when a worker takes it; past its limit the pool is stopped.
+
+        Every other job on the stopped pool fails with BrokenProcessPool and
+        is run again by _result.
+        """
+        future, deadline = job["future"], None
+        while True:
+            if deadline is None and (future.running() or future.done()):
+                deadline = time.monotonic() + job["timeout"]
+            try:
+                return future.result(timeout=0.1 if deadline is None else max(deadline - time.monotonic(), 0))
+            except TimeoutError:
+                if future.done():
+                    raise
+                if deadline is None or time.monotonic() < deadline:
+                    continue
+            self._discard(job["executor"], terminate=True)
+            raise TimeoutError(f"PDF processing took longer than {job['timeout']}s")
+
+    def _submit(self, fn, args, timeout: Optional[float], count_rejected: bool = True, retried: bool = False):
+        with self._lock:
+            if self._pending >= self.max_pending and not retried:
+                if count_rejected:
+                    self.rejected += 1
+                raise PDFPoolBusy(f"{self._pending} PDF jobs already queued")
+            if self._executor is None:
+                # spawn, not fork: the parent already runs threads whose locks
+                # a forked child could inherit mid-acquire
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            executor = self._executor
+            self._pending += 1
+
+        timeout = timeout or self.timeout
+        marker = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}.job") if self.WORKER_ALARM else None
+        try:
+            future = executor.submit(_pool_job, fn, args, timeout, marker)
+        except BrokenProcessPool:
+            self._job_done(None)
+            self._discard(executor)
+            raise
+        future.add_done_callback(self._job_done)
+        return {"fn": fn, "args": args, "timeout": timeout, "marker": marker,
+                "future": future, "executor": executor, "retried": retried}
+
+    def _job_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    def _discard(self, executor, terminate: bool = False):
+        """Forget a broken pool; the next job starts a fresh one. `terminate` stops its workers first."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.recycled += 1
+        if terminate:
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+                "retried": self.retried
+            }
+
+def _pool_job(fn, args, timeout: float, marker: Optional[str]):
+    """Run one PDFWorkerPool job inside a worker, under its own time limit.
+
+    The limit starts with the job. Past it, TimeoutError is raised inside
+    the job and the worker carries on with the next one. A job stuck in C
+    code cannot take that exception, so PDF_JOB_KILL_GRACE seconds later
+    faulthandler ends this worker alone and writes the job's traceback to
+    `marker`, which tells the parent which job it was. Without a marker
+    (no SIGALRM) the parent times the job instead.
+    """
+    if marker is None:
+        return fn(*args)
+
+    def expire(signum, frame):
+        raise PDFJobExpired()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    try:
+        with open(marker, 'w') as marker_file:
+            faulthandler.dump_traceback_later(timeout + PDF_JOB_KILL_GRACE, exit=True, file=marker_file)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                return fn(*args)
+            except PDFJobExpired:
+                raise TimeoutError(f"PDF processing took longer than {timeout}s") from None
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                faulthandler.cancel_dump_traceback_later()
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+        remove_upload(marker)
+
+pdf_pool = PDFWorkerPool(PDF_WORKERS, PDF_MAX_PENDING, PDF_JOB_TIMEOUT)
+
+# Jobs below run inside worker processes (or inline when PDF_WORKERS=0).
+# Each process keeps a few parsed documents so the text and fill jobs for
+# an upload do not re-parse it.
+
+_worker_documents = OrderedDict()
+_worker_documents_lock = threading.Lock()
+
+def _worker_document(path: str) -> ParsedPDF:
+    """Return this process's parsed copy of the PDF at `path`."""
+    key = (path, os.path.getmtime(path))
+    with _worker_documents_lock:
+        document = _worker_documents.get(key)
+        if document is not None:
+            _worker_documents.move_to_end(key)
+            return document
+        document = ParsedPDF(path=path)
+        _worker_documents[key] = document
+        while len(_worker_documents) > PDF_WORKER_CACHE_SIZE:
+            _, stale = _worker_documents.popitem(last=False)
+            stale.close()
+        return document
+
+def pdf_job_extract_fields(path: str):
+    """Fields of the PDF at `path`, plus its page count and form fingerprint."""
+    document = _worker_document(path)
+    return PDFProcessor.extract_fields(document), document.page_count, PDFProcessor.fingerprint(document)
+
+def pdf_job_page_texts(path: str, pages: List[int]) -> Dict[int, str]:
+    """Text of the given (1-based) pages."""
+    document = _worker_document(path)
+    return {page: document.page_text(page - 1) for page in pages}
+
+def pdf_job_fill(path: str, answers: Dict[str, str],
+                 images: Optional[Dict[str, str]] = None) -> Tuple[bytes, Dict[str, str], bool]:
+    """Fill `answers` and `images` into the PDF at `path`; returns (data, failed fields, is_update).
+
+    When `is_update` is set, `data` is an incremental update to send after
+    the file's own bytes; otherwise it is the whole filled document.
+    """
+    document = _worker_document(path)
+    update, failed = PDFProcessor.fill_pdf_update(document, answers, images)
+    if update is not None:
+        return update, failed, True
+    return (*PDFProcessor._fill_rewrite(document, answers, images), False)
+
+def pdf_job_prepare_image(path: str, out_path: str, bilevel: bool) -> Dict[str, Any]:
+    """ImageProcessor.prepare(), run away from the web process's memory."""
+    return ImageProcessor.prepare(path, out_path, bilevel)
+
+def pdf_job_fill_many(path: str, rows: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """pdf_job_fill for several answer rows; a row that fails gets {"error": reason}."""
+    results = []
+    for answers in rows:
+        try:
+            data, failed, is_update = pdf_job_fill(path, answers)
+            results.append({"data": data, "unfilled": failed, "is_update": is_update})
+        except Exception as e:
+            results.append({"error": str(e)})
+    return results
+
+# ============================================================================
+# WEBSITE FORM PROCESSING
+# ============================================================================
+
+class FormHTMLParser:
+    """Single-pass extractor for the fields and labels in a page's HTML.
+
+    One sweep over the markup builds a name -> field index and a
+    `<label for>` -> text index, and remembers the text element right before
+    each control and any `<label>` wrapping it. Labels are resolved after
+    the sweep, so a `<label for>` that appears after its control still counts.
+
+    The tokenizer only ever moves forward, so parsing is linear in the size
+    of the input; html.parser rescans unterminated tags and goes quadratic
+    on markup like `<a<a<a...`.
+    """
+
+    FIELD_TAGS = {'input': 'text', 'textarea': 'textarea', 'select': 'select'}
+    TEXT_TAGS = {'label', 'span', 'div'}
+    # Inputs that never hold user data
+    SKIPPED_INPUT_TYPES = {'hidden', 'submit', 'button', 'reset', 'image'}
+    # Elements whose content is never markup (or never label text)
+    RAW_TEXT_TAGS = {'script', 'style', 'textarea', 'title'}
+
+    TAG_START_RE = re.compile(r'<(?:/?[a-zA-Z]|[!?])')
+    TAG_NAME_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9:-]{0,63})')
+    TAG_SPECIAL_RE = re.compile(r'[>"\']')
+    ATTR_RE = re.compile(r'([^\s"\'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+    DEADLINE_CHECK_EVERY = 256  # tokens between clock checks
+    MAX_LABEL_DEPTH = 8  # labels don't nest in practice; deeper ones are ignored
+
+    def __init__(self):
+        self.fields = {}
+        self.field_ids = {}
+        self.wrapping_labels = {}
+        self.nearby_text = {}
+        self.labels_for = {}
+        self.truncated = False
+        self._label_stack = []    # open <label> elements: [for, text parts, wrapped names]
+        self._ignored_labels = 0  # open <label> elements past MAX_LABEL_DEPTH
+        self._text_element = None  # [tag, text parts] of an open leaf label/span/div
+        self._preceding_text = None
+        self._in_option = False
+
+    def feed(self, html: str, deadline: Optional[float] = None) -> bool:
+        """Parse `html`; returns False if `deadline` (monotonic) ran out first."""
+        lowered = html.lower()
+        length = len(html)
+        pos = 0
+        tokens = 0
+
+        while pos < length:
+            tokens += 1
+            if deadline is not None and tokens % self.DEADLINE_CHECK_EVERY == 0 \
+                    and time.monotonic() > deadline:
+                self.truncated = True
+                return False
+
+            found = self.TAG_START_RE.search(html, pos)
+            if found is None:
+                self.handle_data(html_unescape(html[pos:]))
+                break
+            start = found.start()
+            if start > pos:
+                self.handle_data(html_unescape(html[pos:start]))
+
+            if html.startswith('<!--', start):
+                end = html.find('-->', start + 4)
+                pos = length if end == -1 else end + 3
+                continue
+            if html.startswith('<!', start) or html.startswith('<?', start):
+                end = html.find('>', start + 2)
+                pos = length if end == -1 else end + 1
+                continue
+
+            match = self.TAG_NAME_RE.match(html, start)
+            if not match:
+                self.handle_data('<')
+                pos = start + 1
+                continue
+
+            end = self._find_tag_end(html, match.end())
+            if end == -1:
+                # No '>' anywhere after this point: the rest is text
+                self.handle_data(html_unescape(html[start:]))
+                break
+            pos = end + 1
+
+            tag = match.group(2).lower()
+            if match.group(1):
+                self.handle_endtag(tag)
+                continue
+
+            self.handle_starttag(tag, self._parse_attrs(html[match.end():end]))
+            if tag in self.RAW_TEXT_TAGS:
+                close = lowered.find('</' + tag, pos)
+                if close == -1:
+                    break
+                if tag == 'title':
+                    self.handle_data(html_unescape(html[pos:close]))
+                pos = close
+
+        return True
+
+    def _find_tag_end(self, html: str, pos: int) -> int:
+        """Index of the '>' closing a tag, skipping quoted attribute values."""
+        while True:
+            match = self.TAG_SPECIAL_RE.search(html, pos)
+            if match is None:
+                return -1
+            if match.group() == '>':
+                return match.start()
+            close = html.find(match.group(), match.end())
+            if close == -1:
+                # Unterminated quote: fall back to the next bare '>'
+                return html.find('>', match.end())
+            pos = close + 1
+
+    def _parse_attrs(self, text: str) -> List[tuple]:
+        """(name, value) pairs from the inside of a start tag."""
+        attrs = []
+        for match in self.ATTR_RE.finditer(text):
+            name, double, single, bare = match.groups()
+            value = double if double is not None else single if single is not None else bare
+            attrs.append((name.lower(), html_unescape(value) if value is not None else None))
+        return attrs
+
+    def handle_starttag(self, tag, attrs):
+        if self._text_element is not None:
+            # Only leaf elements count as nearby text
+            self._text_element = None
+
+        if tag in self.FIELD_TAGS:
+            self._add_field(tag, dict(attrs))
+            self._preceding_text = None
+            return
+
+        self._preceding_text = None
+        if tag == 'label':
+            if len(self._label_stack) < self.MAX_LABEL_DEPTH:
+                self._label_stack.append([dict(attrs).get('for'), [], []])
+            else:
+                self._ignored_labels += 1
+        if tag in self.TEXT_TAGS:
+            self._text_element = [tag, []]
+        elif tag == 'option':
+            self._in_option = True
+
+    def handle_endtag(self, tag):
+        if tag == 'option':
+            self._in_option = False
+        if self._text_element is not None and self._text_element[0] == tag:
+            self._preceding_text = ''.join(self._text_element[1]).strip()
+            self._text_element = None
+        if tag == 'label' and self._ignored_labels:
+            self._ignored_labels -= 1
+        elif tag == 'label' and self._label_stack:
+            label_for, parts, wrapped = self._label_stack.pop()
+            text = ' '.join(''.join(parts).split())
+            if text:
+                if label_for and label_for not in self.labels_for:
+                    self.labels_for[label_for] = text
+                for name in wrapped:
+                    self.wrapping_labels.setdefault(name, text)
+
+    def handle_data(self, data):
+        if self._in_option:
+            return
+        if self._text_element is not None:
+            self._text_element[1].append(data)
+        for label in self._label_stack:
+            label[1].append(data)
+
+    def _add_field(self, tag, attrs):
+        name = attrs.get('name')
+        if not name or name in self.fields:
+            return
+        if tag == 'input' and (attrs.get('type') or 'text').lower() in self.SKIPPED_INPUT_TYPES:
+            return
+
+        self.fields[name] = {'name': name, 'type': self.FIELD_TAGS[tag]}
+        if attrs.get('id'):
+            self.field_ids[name] = attrs['id']
+        if self._preceding_text:
+            self.nearby_text[name] = self._preceding_text
+        if self._label_stack:
+            self._label_stack[-1][2].append(name)
+
+    def label_for(self, name: str) -> Optional[str]:
+        """Best label for a field: <label for>, then a wrapping <label>, then nearby text."""
+        field_id = self.field_ids.get(name)
+        return (
+            (self.labels_for.get(field_id) if field_id else None)
+            or self.labels_for.get(name)
+            or self.wrapping_labels.get(name)
+            or self.nearby_text.get(name)
+        )
+
+class WebFormProcessor:
+    """Handles website form processing."""
+
+    SCHEMA_VERSION = 1
+    CONTEXT_FIELD_LABELS = 30  # field labels listed in a form's prompt context
+
+    @staticmethod
+    def extract_fields_from_schema(schema: Dict) -> List[Dict]:
+        """Extract field information from the content script's form schema.
+
+        Schema v1: {"version": 1, "title": str, "forms": [{"name", "heading",
+        "fields": [{"name", "type", "label", "group", "heading",
+        "options": [{"value", "label"}]}]}]}; everything but field names is optional.
+        """
+        if not isinstance(schema, dict) or schema.get('version') != WebFormProcessor.SCHEMA_VERSION:
+            version = schema.get('version') if isinstance(schema, dict) else None
+            raise ValueError(f"Unsupported form schema version: {version}")
+
+        fields = []
+        seen = set()
+        for form in WebFormProcessor._schema_list(schema.get('forms')):
+            for field in WebFormProcessor._schema_list(form.get('fields')) if isinstance(form, dict) else []:
+                name = field.get('name') if isinstance(field, dict) else None
+                if not name or not isinstance(name, str) or name in seen:
+                    continue
+                seen.add(name)
+
+                entry = {
+                    'name': name,
+                    'type': WebFormProcessor._schema_text(field.get('type')) or 'text',
+                    'label': WebFormProcessor._schema_text(field.get('label')) or WebFormProcessor._label_from_name(name)
+                }
+                for key in ('group', 'heading'):
+                    text = WebFormProcessor._schema_text(field.get(key))
+                    if text:
+                        entry[key] = text
+                options = []
+                for option in WebFormProcessor._schema_list(field.get('options')):
+                    if isinstance(option, dict):
+                        value = WebFormProcessor._schema_text(option.get('value')) or ''
+                        options.append({'value': value, 'label': WebFormProcessor._schema_text(option.get('label')) or value})
+                if options:
+                    entry['options'] = options
+                fields.append(entry)
+
+        log.info(f"Extracted {len(fields)} fields from website form schema")
+        return fields
+
+    @staticmethod
+    def schema_context(schema: Dict, fields: List[Dict]) -> str:
+        """Short page/form/section summary used as prompt context for website forms."""
+        lines = []
+        if WebFormProcessor._schema_text(schema.get('title')):
+            lines.append(f"Page: {schema['title']}")
+        for form in WebFormProcessor._schema_list(schema.get('forms')):
+            if isinstance(form, dict) and WebFormProcessor._schema_text(form.get('name')):
+                heading = f" ({form['heading']})" if WebFormProcessor._schema_text(form.get('heading')) else ""
+                lines.append(f"Form: {form['name']}{heading}")
+
+        sections = []
+        for field in fields:
+            for key in ('heading', 'group'):
+                if field.get(key) and field[key] not in sections:
+                    sections.append(field[key])
+        if sections:
+            lines.append("Sections: " + ", ".join(sections))
+
+        labels = [field['label'] for field in fields[:WebFormProcessor.CONTEXT_FIELD_LABELS]]
+        if labels:
+            lines.append("Fields: " + ", ".join(labels))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _schema_list(value) -> List:
+        """A schema value that should be a list; anything else counts as empty."""
+        return value if isinstance(value, list) else []
+
+    @staticmethod
+    def _schema_text(value) -> Optional[str]:
+        """A schema value that should be a string; anything else is dropped."""
+        return value if isinstance(value, str) else None
+
+    @staticmethod
+    def _label_from_name(name: str) -> str:
+        return name.replace('_', ' ').replace('-', ' ').title()
+
+    @staticmethod
+    def extract_fields_from_html(html: str, forms_data: List[Dict] = None) -> List[Dict]:
+        """Extract field information from HTML."""
+        fields = []
+        
+        # If we have structured form data from content script, use that
+        if forms_data:
+            seen = set()
+            for form in forms_data:
+                for field in form.get('fields', []):
+                    if field['name'] not in seen:
+                        seen.add(field['name'])
+                        fields.append({
+                            'name': field['name'],
+                            'type': field.get('type', 'text'),
+                            'label': field.get('label', field['name'])
+                        })
+        else:
+            # Fallback: parse HTML directly in one pass, within a size and time budget
+            html = html or ''
+            if len(html) > FORM_HTML_MAX_SIZE:
+                log.warning(f"Form HTML is {len(html)} chars, parsing the first {FORM_HTML_MAX_SIZE}")
+                html = html[:FORM_HTML_MAX_SIZE]
+
+            parser = FormHTMLParser()
+            if not parser.feed(html, deadline=time.monotonic() + FORM_HTML_PARSE_BUDGET):
+                log.warning(f"Form HTML parse exceeded {FORM_HTML_PARSE_BUDGET}s, "
+                            f"keeping the {len(parser.fields)} fields found so far")
+            for name, field in parser.fields.items():
+                label = parser.label_for(name)
+                fields.append({
+                    'name': name,
+                    'type': field['type'],
+                    'label': label or WebFormProcessor._label_from_name(name)
+                })
+
+        log.info(f"Extracted {len(fields)} fields from website form")
+        return fields
+
+# ============================================================================
+# CONTEXT INDEX
+# ============================================================================
+
+class ContextIndex:
+    """Inverted index over a document's page text, used to pick prompt context.
+
+    Pages are cut into short snippets. A field's name and label are looked up
+    in the index, matching snippets are ranked by BM25 (boosted on the page
+    that holds the field's widget) and the best are packed into a budget.
+    """
+
+    SNIPPET_CHARS = 300
+    PAGE_BOOST = 1.5
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    PAGE_MARKER_RE = re.compile(r'^--- Page (\d+) ---$', re.MULTILINE)
+    TERM_RE = re.compile(r'[a-z][a-z0-9]+')
+    CAMEL_RE = re.compile(r'([a-z])([A-Z])')
+    STOPWORDS = {
+        'the', 'and', 'for', 'of', 'to', 'in', 'on', 'or', 'by', 'an', 'is', 'be',
+        'if', 'at', 'as', 'it', 'this', 'that', 'with', 'from', 'your', 'you', 'are',
+        'not', 'all', 'any', 'may', 'will', 'has', 'have', 'was', 'were', 'which',
+    }
+    # Words that show up in generated field names but say nothing about content
+    NAME_NOISE = {'field', 'fld', 'txt', 'text', 'box', 'check', 'cb', 'chk', 'tf', 'topmostsubform', 'page'}
+
+    def __init__(self, pages: Optional[List[str]] = None):
+        self.snippets = []   # (1-based page, text)
+        self.lengths = []    # terms per snippet
+        self.postings = {}   # term -> [(snippet id, term frequency)]
+        self.pages = set()
+        self.page_texts = {}  # 1-based page -> raw text
+        self._lock = threading.Lock()
+        for page_num, text in enumerate(pages or []):
+            self.add_page(page_num + 1, text)
+
+    @classmethod
+    def from_text(cls, text: str) -> 'ContextIndex':
+        """Rebuild an index from PDFProcessor.join_pages() output."""
+        index = cls()
+        markers = list(cls.PAGE_MARKER_RE.finditer(text or ""))
+        for i, marker in enumerate(markers):
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+            index.add_page(int(marker.group(1)), text[marker.end():end])
+        return index
+
+    @classmethod
+    def terms(cls, text: str) -> List[str]:
+        """Lower-cased index terms, splitting camelCase and dropping stopwords."""
+        text = cls.CAMEL_RE.sub(r'\1 \2', text).lower()
+        return [t for t in cls.TERM_RE.findall(text) if t not in cls.STOPWORDS]
+
+    def add_page(self, page: int, text: str):
+        """Index one page of text; pages already indexed are skipped."""
+        snippets = self._split(text)
+        with self._lock:
+            if page in self.pages:
+                return
+            self.pages.add(page)
+            self.page_texts[page] = text
+            for snippet in snippets:
+                snippet_id = len(self.snippets)
+                counts = {}
+                for term in self.terms(snippet):
+                    counts[term] = counts.get(term, 0) + 1
+                self.snippets.append((page, snippet))
+                self.lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    self.postings.setdefault(term, []).append((snippet_id, count))
+
+    def document_text(self) -> str:
+        """All indexed page text, in PDFProcessor.join_pages() form."""
+        with self._lock:
+            pages = [self.page_texts.get(page, "") for page in range(1, max(self.pages, default=0) + 1)]
+        return PDFProcessor.join_pages(pages)
+
+    def select(self, field: Dict, budget_chars: int) -> str:
+        """The most relevant snippets for a field, in document order, within budget_chars."""
+        with self._lock:
+            return self._select(field, budget_chars)
+
+    def _select(self, field: Dict, budget_chars: int) -> str:
+        if not self.snippets:
+            return ""
+
+        query = {
+            t for t in self.terms(f"{field.get('name', '')} {field.get('label', '')}")
+            if t not in self.NAME_NOISE
+        }
+        page = field.get('page')
+        total = len(self.snippets)
+        average_length = (sum(self.lengths) / total) or 1
+
+        scores = {}
+        for term in query:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for snippet_id, count in postings:
+                norm = self.BM25_K1 * (1 - self.BM25_B + self.BM25_B * self.lengths[snippet_id] / average_length)
+                scores[snippet_id] = scores.get(snippet_id, 0.0) + idf * count * (self.BM25_K1 + 1) / (count + norm)
+
+        if page is not None:
+            for snippet_id in scores:
+                if self.snippets[snippet_id][0] == page:
+                    scores[snippet_id] *= self.PAGE_BOOST
+
+        ranked = sorted(scores, key=lambda snippet_id: -scores[snippet_id])
+        if not ranked:
+            # Nothing matches: fall back to the top of the field's page, or of the document
+            ranked = [i for i, (p, _) in enumerate(self.snippets) if p == page] or list(range(total))
+
+        chosen = []
+        used = 0
+        for snippet_id in ranked:
+            cost = len(self.snippets[snippet_id][1]) + 12  # room for the page tag
+            if used + cost > budget_chars:
+                continue
+            chosen.append(snippet_id)
+            used += cost
+
+        return "\n".join(
+            f"[Page {self.snippets[i][0]}] {self.snippets[i][1]}" for i in sorted(chosen)
+        )
+
+    def _split(self, text: str) -> List[str]:
+        """Cut page text into snippets of whole lines, about SNIPPET_CHARS long."""
+        snippets = []
+        current = []
+        size = 0
+        for line in text.splitlines():
+            line = ' '.join(line.split())
+            if not line:
+                continue
+            while len(line) > self.SNIPPET_CHARS:
+                cut = line.rfind(' ', 0, self.SNIPPET_CHARS)
+                cut = cut if cut > 0 else self.SNIPPET_CHARS
+                if current:
+                    snippets.append(' '.join(current))
+                    current, size = [], 0
+                snippets.append(line[:cut])
+                line = line[cut:].strip()
+            if size + len(line) > self.SNIPPET_CHARS and current:
+                snippets.append(' '.join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            snippets.append(' '.join(current))
+        return snippets
+
+# ============================================================================
+# QUESTION CACHE
+# ============================================================================
+
+class QuestionCache:
+    """Two-tier question cache: an in-memory LRU in front of a SQLite file.
+
+    Entries are shared across sessions (and processes using the same file),
+    so a form that has been seen before gets its questions without an AI call.
+    """
+
+    PRUNE_EVERY = 200  # disk writes between expiry/size sweeps
+
+    def __init__(self, path: str, memory_size: int, max_entries: int, ttl: int):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS questions ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_questions_created ON questions (created_at)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Question cache disk tier disabled: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(field: Dict, context: str, model: str) -> str:
+        """Build the content-addressed key for a field's question."""
+        context_hash = hashlib.sha256(context.encode('utf-8')).hexdigest()
+        raw = json.dumps([
+            field.get('name', ''),
+            field.get('type', 'text'),
+            field.get('label', ''),
+            model,
+            context_hash
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached question, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created_at FROM questions WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    log.warning(f"Question cache read failed: {e}")
+                    row = None
+                if row and now - row[1] < self.ttl:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.disk_hits += 1
+                    return dict(value)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict):
+        """Store a generated question in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, dict(value), now)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO questions (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(now)
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Question cache write failed: {e}")
+
+    def _remember(self, key: str, value: Dict, created_at: float):
+        """Insert into the memory tier, evicting the least recently used entry."""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now: float):
+        """Drop expired disk entries and trim the table to its size limit."""
+        self._db.execute("DELETE FROM questions WHERE created_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM questions WHERE key IN ("
+            "SELECT key FROM questions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the health endpoint."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "persistent": self._db is not None
+            }
+
+question_cache = None if IN_PDF_WORKER else QuestionCache(
+    QUESTION_CACHE_PATH,
+    QUESTION_CACHE_MEMORY_SIZE,
+    QUESTION_CACHE_MAX_ENTRIES,
+    QUESTION_CACHE_TTL
+)
+
+# ============================================================================
+# TEMPLATE REGISTRY
+# ============================================================================
+
+class TemplateRegistry:
+    """Analysis results for PDF templates that have been uploaded before.
+
+    Entries are keyed by the AcroForm fingerprint (PDFProcessor.fingerprint)
+    and hold the extracted fields, page texts and AI-generated questions, so
+    a known template gets a ready session without being analysed again.
+    Upload digests map to fingerprints, so byte-identical files are not even
+    parsed.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.file_hits = 0
+        self.structure_hits = 0
+        self.misses = 0
+        self._db = None
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS templates ("
+                    "fingerprint TEXT PRIMARY KEY, fields TEXT NOT NULL, page_count INTEGER NOT NULL, "
+                    "page_texts TEXT, questions TEXT NOT NULL, used_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_templates_used ON templates (used_at)")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS template_files ("
+                    "digest TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Template registry disabled: {e}")
+                self._db = None
+
+    def find_file(self, digest: str) -> Optional[Dict]:
+        """The template a byte-identical upload was registered under, or None."""
+        return self._find(
+            "SELECT t.fingerprint, t.fields, t.page_count, t.page_texts, t.questions FROM template_files f "
+            "JOIN templates t ON t.fingerprint = f.fingerprint WHERE f.digest = ?",
+            digest
+        )
+
+    def find(self, fingerprint: str) -> Optional[Dict]:
+        """The template with this AcroForm fingerprint, or None."""
+        return self._find(
+            "SELECT fingerprint, fields, page_count, page_texts, questions FROM templates WHERE fingerprint = ?",
+            fingerprint
+        )
+
+    def _find(self, query: str, key: str) -> Optional[Dict]:
+        if self._db is None:
+            return None
+        with self._lock:
+            try:
+                row = self._db.execute(query, (key,)).fetchone()
+                if row is None:
+                    return None
+                self._db.execute("UPDATE templates SET used_at = ? WHERE fingerprint = ?", (time.time(), row[0]))
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Template registry read failed: {e}")
+                return None
+        return {
+            "fingerprint": row[0],
+            "fields": json.loads(row[1]),
+            "page_count": row[2],
+            # JSON object keys are strings; pages are 1-based ints everywhere else
+            "page_texts": {int(page): text for page, text in json.loads(row[3]).items()} if row[3] else None,
+            "questions": json.loads(row[4])
+        }
+
+    def add(self, fingerprint: str, digest: str, fields: List[Dict], page_count: int):
+        """Register a newly analysed template (if unknown) and the upload digest it came from."""
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO templates (fingerprint, fields, page_count, page_texts, questions, used_at) "
+                    "VALUES (?, ?, ?, NULL, '{}', ?)",
+                    (fingerprint, json.dumps(fields), page_count, time.time())
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO template_files (digest, fingerprint) VALUES (?, ?)",
+                    (digest, fingerprint)
+                )
+                self._prune()
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Template registry write failed: {e}")
+
+    def save_page_texts(self, fingerprint: str, page_texts: Dict[int, str]):
+        """Store a template's extracted page text once every page has been read."""
+        self._update("UPDATE templates SET page_texts = ? WHERE fingerprint = ?", json.dumps(page_texts), fingerprint)
+
+    def save_questions(self, fingerprint: str, questions: Dict[str, Dict]):
+        """Merge AI-generated questions into a template's entry."""
+        if self._db is None or not questions:
+            return
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT questions FROM templates WHERE fingerprint = ?", (fingerprint,)).fetchone()
+                if row is None:
+                    return
+                merged = {**json.loads(row[0]), **questions}
+                self._db.execute("UPDATE templates SET questions = ? WHERE fingerprint = ?", (json.dumps(merged), fingerprint))
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Template registry write failed: {e}")
+
+    def _update(self, query: str, *params):
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.execute(query, params)
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Template registry write failed: {e}")
+
+    def _prune(self):
+        """Drop the least recently used templates beyond max_entries, and their file digests."""
+        self._db.execute(
+            "DELETE FROM templates WHERE fingerprint IN ("
+            "SELECT fingerprint FROM templates ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._db.execute(
+            "DELETE FROM template_files WHERE fingerprint NOT IN (SELECT fingerprint FROM templates)"
+        )
+
+    def record(self, hit: Optional[str]):
+        """Count an upload as a 'file' or 'structure' hit, or a miss (None)."""
+        with self._lock:
+            if hit == "file":
+                self.file_hits += 1
+            elif hit == "structure":
+                self.structure_hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters and size for the health endpoint."""
+        with self._lock:
+            entries = 0
+            if self._db is not None:
+                try:
+                    entries = self._db.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                "file_hits": self.file_hits,
+                "structure_hits": self.structure_hits,
+                "misses": self.misses,
+                "templates": entries,
+                "enabled": self._db is not None
+            }
+
+template_registry = None if IN_PDF_WORKER else TemplateRegistry(TEMPLATE_REGISTRY_PATH, TEMPLATE_REGISTRY_MAX_ENTRIES)
+
+# ============================================================================
+# OPENROUTER CLIENT
+# ============================================================================
+
+class OpenRouterClient:
+    """Shared, connection-pooled HTTP client for the chat-completions API.
+
+    Keeps connections alive across requests, caps how many calls are in
+    flight at once, retries 429/5xx responses with exponential backoff, and
+    trips a circuit breaker after repeated failures so callers fall back
+    immediately instead of waiting on a degraded upstream.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    BACKOFF_BASE = 0.5  # seconds
+    BACKOFF_MAX = 8.0
+
+    def __init__(self, max_concurrency: int, max_retries: int, timeout: int,
+                 failure_threshold: int, reset_timeout: int):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency)
+        self._http.mount('https://', adapter)
+        self._http.mount('http://', adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.requests_sent = 0
+        self.retries = 0
+        self.short_circuited = 0
+
+    def post(self, url: str, payload: Dict, headers: Dict, stream: bool = False) -> Optional[requests.Response]:
+        """POST a chat-completion request.
+
+        Returns the final response (which may still be an error status), or
+        None when the circuit is open, no slot frees up in time, or every
+        attempt failed at the network level. With `stream` the body is left
+        unread for the caller to iterate.
+        """
+        allowed, trial = self._allow_request()
+        if not allowed:
+            self.short_circuited += 1
+            log.warning("OpenRouter circuit open - skipping AI call")
+            return None
+
+        if not self._slots.acquire(timeout=self.timeout):
+            log.warning("OpenRouter concurrency limit reached - skipping AI call")
+            self._record(success=False, trial=trial, counted=False)
+            return None
+
+        try:
+            response = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self.retries += 1
+                    delay = self._backoff(attempt, response)
+                    if response is not None:
+                        response.close()
+                    time.sleep(delay)
+                try:
+                    self.requests_sent += 1
+                    response = self._http.post(url, json=payload, headers=headers, timeout=self.timeout, stream=stream)
+                except requests.RequestException as e:
+                    log.warning(f"OpenRouter request failed (attempt {attempt + 1}): {e}")
+                    response = None
+                    continue
+                if response.status_code not in self.RETRY_STATUSES:
+                    break
+
+            upstream_failed = response is None or response.status_code in self.RETRY_STATUSES
+            self._record(success=not upstream_failed, trial=trial)
+            return response
+        finally:
+            self._slots.release()
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Delay before a retry, honouring a numeric Retry-After header."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.BACKOFF_MAX)
+        delay = min(self.BACKOFF_BASE * (2 ** (attempt - 1)), self.BACKOFF_MAX)
+        return delay + random.uniform(0, delay / 2)
+
+    def _allow_request(self) -> Tuple[bool, bool]:
+        """Whether a call may go ahead, and whether it is the half-open trial.
+
+        Closed: allow. Open: refuse until the reset timeout, then let one
+        trial through.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True, False
+            if self._trial_in_flight or time.time() - self._opened_at < self.reset_timeout:
+                return False, False
+            self._trial_in_flight = True
+            return True, True
+
+    def _record(self, success: bool, trial: bool = False, counted: bool = True):
+        with self._lock:
+            if trial:
+                self._trial_in_flight = False
+            if success:
+                if self._opened_at is not None:
+                    log.info("OpenRouter circuit closed")
+                self._failures = 0
+                self._opened_at = None
+                return
+            if not counted:
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    log.warning(f"OpenRouter circuit opened after {self._failures} failures")
+                self._opened_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._opened_at is None:
+                state = "closed"
+            elif time.time() - self._opened_at >= self.reset_timeout:
+                state = "half_open"
+            else:
+                state = "open"
+            return {
+                "circuit": state,
+                "consecutive_failures": self._failures,
+                "requests_sent": self.requests_sent,
+                "retries": self.retries,
+                "short_circuited": self.short_circuited
+            }
+
+openrouter_client = OpenRouterClient(
+    OPENROUTER_MAX_CONCURRENCY,
+    OPENROUTER_MAX_RETRIES,
+    OPENROUTER_TIMEOUT,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT
+)
+
+# ============================================================================
+# FIELD CLASSIFIER
+# ============================================================================
+
+class FieldClassifier:
+    """Recognises common fields by name or label and words their questions locally.
+
+    Names and labels are split into lowercase words (camelCase, digits and
+    separators), abbreviations are expanded and filler words dropped; the
+    rest must be covered entirely by phrases of one concept. Anything left
+    over ("spouse", "emergency", ...) makes the field ambiguous, and it goes
+    to the AI instead.
+    """
+
+    TEXT_TYPES = {'text', 'email', 'tel', 'date', 'number', 'textarea', 'search', 'url'}
+    CHOICE_TYPES = TEXT_TYPES | {'select', 'choice', 'radio'}
+
+    # concept: (phrases, question, help, field types it fits)
+    CONCEPTS = {
+        'first_name': (("first name", "given name", "forename"), "What is your first name?",
+                       "Enter your given name as it appears on official documents.", TEXT_TYPES),
+        'middle_name': (("middle name",), "What is your middle name?",
+                        "Leave it blank if you do not have one.", TEXT_TYPES),
+        'middle_initial': (("middle initial",), "What is your middle initial?",
+                           "Enter one letter, or leave it blank if you do not have one.", TEXT_TYPES),
+        'last_name': (("last name", "surname", "family name"), "What is your last name?",
+                      "Enter your family name as it appears on official documents.", TEXT_TYPES),
+        'full_name': (("name", "full name", "legal name", "printed name", "print name"), "What is your full name?",
+                      "Enter your first and last name as they appear on official documents.", TEXT_TYPES),
+        'email': (("email", "email address", "contact email"), "What is your email address?",
+                  "Please enter a valid email address.", TEXT_TYPES),
+        'phone': (("phone", "telephone", "phone number", "telephone number", "mobile", "mobile number",
+                   "cell", "cell phone", "home phone", "daytime phone", "contact number", "contact phone"),
+                  "What is your phone number?", "Include the area code.", TEXT_TYPES),
+        'fax': (("fax", "fax number"), "What is your fax number?",
+                "Include the area code, or leave it blank if you do not have one.", TEXT_TYPES),
+        'date_of_birth': (("date birth", "birth date", "birthday", "birthdate"), "What is your date of birth?",
+                          "Enter the date as MM/DD/YYYY.", TEXT_TYPES),
+        'age': (("age",), "How old are you?", "Enter your age in years.", TEXT_TYPES),
+        'place_of_birth': (("place birth", "birth place", "birthplace", "city birth"), "Where were you born?",
+                           "Enter the city and country of your birth.", TEXT_TYPES),
+        'gender': (("gender", "sex"), "What is your gender?",
+                   "Choose the option that matches your official documents.", CHOICE_TYPES),
+        'marital_status': (("marital status",), "What is your marital status?",
+                           "For example single, married, divorced or widowed.", CHOICE_TYPES),
+        'ssn': (("social security number", "social security", "ssn"), "What is your Social Security number?",
+                "Enter the 9 digits as XXX-XX-XXXX.", TEXT_TYPES),
+        'address': (("address", "home address", "mailing address", "residential address", "current address"),
+                    "What is your address?",
+                    "Include street, city, state and ZIP code unless the form asks for them separately.", TEXT_TYPES),
+        'street': (("street", "street address", "address line", "address 1", "address line 1", "street address 1",
+                    "street line 1"), "What is your street address?",
+                   "Enter the house number and street name.", TEXT_TYPES),
+        'address_line2': (("address 2", "address line 2", "street address 2", "street line 2", "apartment",
+                           "apt", "suite", "unit", "apartment number", "apt number", "suite number"),
+                          "Is there an apartment, suite or unit number?", "Leave it blank if there is none.", TEXT_TYPES),
+        'city': (("city", "town", "city town"), "What city do you live in?",
+                 "Enter the city or town of your address.", TEXT_TYPES),
+        'state': (("state", "province", "state province"), "What state do you live in?",
+                  "Enter the state or province of your address.", CHOICE_TYPES),
+        'zip': (("zip", "zip code", "postal code", "postcode", "postal"), "What is your ZIP code?",
+                "Enter the ZIP or postal code of your address.", TEXT_TYPES),
+        'country': (("country", "country residence"), "What country do you live in?",
+                    "Enter the country of your address.", CHOICE_TYPES),
+        'nationality': (("nationality", "citizenship", "country citizenship"), "What is your citizenship?",
+                        "Enter the country you are a citizen of.", CHOICE_TYPES),
+        'company': (("company", "company name", "employer", "employer name", "organization",
+                     "organization name", "business name"), "What is the name of your company or employer?",
+                    "Enter the organisation's full legal name.", TEXT_TYPES),
+        'job_title': (("job title", "occupation", "position"), "What is your job title?",
+                      "Enter your current position or occupation.", TEXT_TYPES),
+        'website': (("website", "web site", "homepage"), "What is your website address?",
+                    "Enter the full URL, starting with https://.", TEXT_TYPES),
+        'passport_number': (("passport number", "passport"), "What is your passport number?",
+                            "Copy it exactly as printed in your passport.", TEXT_TYPES),
+        'drivers_license': (("driver license", "driver license number", "drivers license", "drivers license number",
+                             "license number"), "What is your driver's license number?",
+                            "Copy it exactly as printed on your license.", TEXT_TYPES),
+        'signature': (("signature", "sign", "applicant signature"), "Please add your signature.",
+                      "Use the image upload button to add a photo or scan of your signature.",
+                      TEXT_TYPES | {'signature', 'image'}),
+        'signature_date': (("date signed", "signature date", "signed date", "date signature"),
+                           "What date are you signing this form?", "Enter the date as MM/DD/YYYY.", TEXT_TYPES),
+        'username': (("username", "user name", "user id", "login", "account name"), "What username would you like?",
+                     "Choose the name you will sign in with.", TEXT_TYPES),
+        'agree': (("agree", "i agree", "consent", "accept", "accept terms", "agree terms", "terms conditions",
+                   "accept terms conditions", "agree terms conditions"), "Do you agree to the terms?",
+                  "Answer yes to agree or no to decline.", {'checkbox'}),
+    }
+
+    # Abbreviations and run-together words, expanded before matching
+    ABBREVIATIONS = {
+        'fname': 'first name', 'firstname': 'first name', 'givenname': 'given name', 'fn': 'first name',
+        'mname': 'middle name', 'middlename': 'middle name', 'mi': 'middle initial',
+        'lname': 'last name', 'lastname': 'last name', 'ln': 'last name',
+        'familyname': 'family name', 'fullname': 'full name',
+        'mail': 'email', 'emailaddress': 'email address',
+        'tel': 'telephone', 'ph': 'phone', 'phn': 'phone', 'phonenumber': 'phone number',
+        'telephonenumber': 'telephone number', 'cellphone': 'cell phone', 'mobilephone': 'mobile',
+        'dob': 'date birth', 'bdate': 'birth date', 'bday': 'birthday', 'dateofbirth': 'date birth',
+        'birthdate': 'birth date', 'pob': 'place birth',
+        'socialsecurity': 'social security', 'soc': 'social', 'sec': 'security',
+        'addr': 'address', 'streetaddress': 'street address', 'zipcode': 'zip code', 'postalcode': 'postal code',
+        'dl': 'driver license', 'driverslicense': 'drivers license', 'lic': 'license',
+        'num': 'number', 'nbr': 'number', 'dt': 'date', 'sig': 'signature', 'sgn': 'signature',
+        'org': 'organization', 'organisation': 'organization', 'jobtitle': 'job title',
+        'url': 'website', 'webaddress': 'website', 'userid': 'user id', 'accountname': 'account name',
+    }
+    FILLER_WORDS = {
+        'your', 'my', 'the', 'of', 'a', 'an', 'and', 'or', 'in', 'on', 'is', 'please', 'enter', 'field',
+        'fld', 'txt', 'text', 'input', 'box', 'value', 'info', 'information', 'form', 'applicant', 'applicants',
+        'patient', 'personal', 'required', 'optional', 'here',
+    }
+
+    @staticmethod
+    def words(text: str) -> List[str]:
+        """Lowercase words of a field name or label, abbreviations expanded and filler dropped."""
+        text = re.sub(r'#|\bno\.', ' number ', text or '', flags=re.I)
+        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+        text = re.sub(r'([A-Za-z])(\d)|(\d)([A-Za-z])', r'\1\3 \2\4', text).lower()
+        result = []
+        for word in re.findall(r'[a-z0-9]+', text):
+            for expanded in FieldClassifier.ABBREVIATIONS.get(word, word).split():
+                if expanded not in FieldClassifier.FILLER_WORDS and not (len(expanded) == 1 and expanded.isalpha()):
+                    result.append(expanded)
+        return result
+
+    @staticmethod
+    def _compile(concepts: Dict) -> Tuple[Dict[Tuple[str, ...], str], int]:
+        """Phrase table keyed by normalised word tuples, and the longest phrase length."""
+        phrases = {}
+        for concept, (texts, _question, _help, _types) in concepts.items():
+            for text in texts:
+                phrases[tuple(FieldClassifier.words(text))] = concept
+        return phrases, max(len(key) for key in phrases)
+
+    @staticmethod
+    def classify(field: Dict, strict: bool = False) -> Optional[str]:
+        """The concept a field is, from its label or else its name; None when unsure.
+
+        A label that is not recognised makes the field ambiguous ("Spouse
+        first name" on a field named first_name); the name is only used
+        for fields without a label. `strict` also refuses numbered fields
+        ("Name 2"), which usually belong to someone else on the form.
+        """
+        label = field.get('label')
+        words = FieldClassifier.words(label if isinstance(label, str) and label.strip() else field.get('name'))
+        concept = FieldClassifier._match(words, strict) if words else None
+        if concept and field.get('type', 'text') in FieldClassifier.CONCEPTS[concept][3]:
+            return concept
+        return None
+
+    @staticmethod
+    def _match(words: List[str], strict: bool = False) -> Optional[str]:
+        """Cover the words with the longest known phrases; every word must belong to the same concept."""
+        found = set()
+        i = 0
+        while i < len(words):
+            for length in range(min(FieldClassifier.MAX_PHRASE, len(words) - i), 0, -1):
+                concept = FieldClassifier.PHRASES.get(tuple(words[i:i + length]))
+                if concept:
+                    found.add(concept)
+                    i += length
+                    break
+            else:
+                if strict or not words[i].isdigit():  # stray numbers ("Name 2") do not change the question
+                    return None
+                i += 1
+        return found.pop() if len(found) == 1 else None
+
+    @staticmethod
+    def question(field: Dict) -> Optional[Dict]:
+        """A ready question for a recognised field, or None when the AI should word it."""
+        concept = FieldClassifier.classify(field)
+        metrics.inc("bb_field_classifier_total", result="hit" if concept else "miss")
+        if concept is None:
+            return None
+        _phrases, question, explanation, _types = FieldClassifier.CONCEPTS[concept]
+        return {"question": question, "explanation": explanation, "field_name": field.get('name', '')}
+
+FieldClassifier.PHRASES, FieldClassifier.MAX_PHRASE = FieldClassifier._compile(FieldClassifier.CONCEPTS)
+
+# ============================================================================
+# ANSWER PROFILES
+# ============================================================================
+
+class ProfileStore:
+    """Answers a returning user gave before, encrypted and keyed by what each field means.
+
+    The extension identifies a user by a random profile id it keeps. Each
+    answer is stored under its field's FieldClassifier concept ('first_name',
+    'zip', ...), encrypted with PROFILE_KEY, so matching fields on the next
+    form are filled in instead of asked.
+    """
+
+    # Consent and signing dates belong to one form; identity numbers are never kept
+    SKIPPED_CONCEPTS = {'agree', 'username', 'signature', 'signature_date', 'ssn', 'passport_number', 'drivers_license'}
+    PROFILE_ID = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+    def __init__(self, path: str, key: str):
+        self._lock = threading.Lock()
+        self.prefilled = 0
+        self._fernet = None
+        self._db = None
+
+        if not path or not key:
+            return
+        try:
+            self._fernet = Fernet(key.encode())
+        except ValueError as e:
+            log.warning(f"Answer profiles disabled: PROFILE_KEY is not a Fernet key ({e})")
+            return
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS profile_answers ("
+                "profile_id TEXT NOT NULL, concept TEXT NOT NULL, value BLOB NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (profile_id, concept))"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            log.warning(f"Answer profiles disabled: {e}")
+            self._db = None
+
+    def valid_id(self, profile_id) -> bool:
+        """Whether profiles are enabled and `profile_id` looks like one the extension made."""
+        return self._db is not None and isinstance(profile_id, str) and bool(self.PROFILE_ID.fullmatch(profile_id))
+
+    def autofill(self, profile_id: str, fields: List[Dict]) -> Dict[str, str]:
+        """Remembered answers for the fields whose meaning the profile knows, by field name."""
+        wanted = {}
+        for field in fields:
+            concept = FieldClassifier.classify(field, strict=True)
+            if concept and concept not in self.SKIPPED_CONCEPTS:
+                wanted.setdefault(concept, []).append(field)
+        if not wanted or not self.valid_id(profile_id):
+            return {}
+
+        with self._lock:
+            try:
+                rows = self._db.execute(
+                    f"SELECT concept, value FROM profile_answers WHERE profile_id = ? "
+                    f"AND concept IN ({', '.join('?' * len(wanted))})",
+                    (profile_id, *wanted)
+                ).fetchall()
+            except sqlite3.Error as e:
+                log.warning(f"Answer profile read failed: {e}")
+                return {}
+
+        answers = {}
+        for concept, token in rows:
+            try:
+                value = self._fernet.decrypt(token).decode()
+            except InvalidToken:
+                log.warning("Answer profile entry could not be decrypted; was PROFILE_KEY changed?")
+                continue
+            for field in wanted[concept]:
+                fitted = ProfileStore._fit(field, value)
+                if fitted is not None:
+                    answers[field['name']] = fitted
+        with self._lock:
+            self.prefilled += len(answers)
+        return answers
+
+    @staticmethod
+    def _fit(field: Dict, value: str) -> Optional[str]:
+        """The value to use for a field; one of its options when it has them, else None."""
+        options = field.get('options')
+        if not options:
+            return value
+        wanted = value.strip().lower()
+        for option in options:
+            if wanted in (str(option.get('value', '')).lower(), str(option.get('label', '')).lower()):
+                return option.get('value', '')
+        return None
+
+    def remember(self, profile_id: Optional[str], fields: List[Dict], answers: Dict[str, Any]):
+        """Keep a finished form's answers to recognised fields for the next form."""
+        if not self.valid_id(profile_id):
+            return
+        now = time.time()
+        rows = []
+        for field in fields:
+            value = answers.get(field.get('name', ''))
+            concept = FieldClassifier.classify(field, strict=True)
+            if (not concept or concept in self.SKIPPED_CONCEPTS or not isinstance(value, str)
+                    or not value.strip() or value.startswith("[IMAGE_UPLOADED")):
+                continue
+            rows.append((profile_id, concept, self._fernet.encrypt(value.strip().encode()), now))
+        if not rows:
+            return
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO profile_answers (profile_id, concept, value, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Answer profile write failed: {e}")
+
+    def forget(self, profile_id: str) -> int:
+        """Delete everything stored for a profile; returns the number of answers removed."""
+        if not self.valid_id(profile_id):
+            return 0
+        with self._lock:
+            try:
+                removed = self._db.execute("DELETE FROM profile_answers WHERE profile_id = ?", (profile_id,)).rowcount
+                self._db.commit()
+                return removed
+            except sqlite3.Error as e:
+                log.warning(f"Answer profile delete failed: {e}")
+                return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Profile count and fields filled from profiles, for the health endpoint."""
+        with self._lock:
+            profiles = 0
+            if self._db is not None:
+                try:
+                    profiles = self._db.execute("SELECT COUNT(DISTINCT profile_id) FROM profile_answers").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {"profiles": profiles, "prefilled_fields": self.prefilled, "enabled": self._db is not None}
+
+profile_store = None if IN_PDF_WORKER else ProfileStore(PROFILE_STORE_PATH, PROFILE_KEY)
+
+def apply_profile(session, profile_id):
+    """Fill the fields a returning user's profile already answers; they are not asked."""
+    if not profile_store.valid_id(profile_id):
+        return
+    session.profile_id = profile_id
+    answers = profile_store.autofill(profile_id, session.form_fields)
+    session.answers.update(answers)
+    session.prefilled_fields = sorted(answers)
+    if answers:
+        log.info(f"Filled {len(answers)} fields from an answer profile")
+
+# ============================================================================
+# AI CONVERTERS
+# ============================================================================
+
+class AIConverter:
+    """Handles AI-based question generation using OpenRouter."""
+
+    OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+    DEFAULT_MODEL = "mistralai/mistral-7b-instruct"
+
+    SYSTEM_PROMPT = """You are a professional form assistant helping users fill out forms.
+Your ONLY job is to convert form field names into clear, professional questions.
+
+CRITICAL RULES:
+1. ONLY ask about the EXACT field provided
+2. Match question type to field type
+3. Be professional and helpful
+4. Keep questions concise and clear
+5. NEVER ask the same question twice
+
+OUTPUT FORMAT:
+Question: [Your question here]
+Help: [One sentence explaining what to enter]"""
+
+    BATCH_SYSTEM_PROMPT = """You are a professional form assistant helping users fill out forms.
+Your ONLY job is to convert form field names into clear, professional questions.
+
+CRITICAL RULES:
+1. Write exactly ONE question for EVERY field listed, in the order given
+2. Match question type to field type
+3. Be professional and helpful
+4. Keep questions concise and clear
+5. NEVER ask the same question twice
+
+OUTPUT FORMAT:
+A JSON array and nothing else, one object per field:
+[{"field_name": "<exact field name>", "question": "<question>", "help": "<one sentence explaining what to enter>"}]"""
+
+    @staticmethod
+    def generate_question(field: Dict, context: str = "") -> Optional[Dict]:
+        """Generate a conversational question for a form field using AI."""
+        field_name = field.get('name', '')
+        field_type = field.get('type', 'text')
+        field_label = field.get('label', '')
+        
+        log.debug("Generating question for field: %s (%s)", field_name, field_type)
+
+        local = FieldClassifier.question(field)
+        if local:
+            return local
+
+        cache_key = QuestionCache.make_key(field, context, AIConverter.DEFAULT_MODEL)
+        cached = question_cache.get(cache_key)
+        if cached:
+            return cached
+
+        if not OPENROUTER_API_KEY:
+            log.warning("No OpenRouter API key - using fallback")
+            return AIConverter._fallback_question(field_name, field_type, field_label)
+
+        try:
+            prompt = AIConverter._field_prompt(field, context)
+            content = AIConverter._request_completion(AIConverter.SYSTEM_PROMPT, prompt, max_tokens=150)
+            if content is not None:
+                question_data = AIConverter._parse_response(content, field_name)
+                if not question_data.get('fallback'):
+                    question_cache.put(cache_key, question_data)
+                return question_data
+            return AIConverter._fallback_question(field_name, field_type, field_label)
+
+        except Exception as e:
+            log.error(f"AI generation failed: {e}")
+            return AIConverter._fallback_question(field_name, field_type, field_label)
+
+    @staticmethod
+    def stream_question(field: Dict, context: str = ""):
+        """Generate a question while streaming the AI's output.
+
+        Yields ("token", text) for each chunk of the completion as it arrives,
+        then exactly one ("question", question_data) parsed the same way as
+        generate_question. Recognised, cached and fallback questions skip
+        straight to the final event.
+        """
+        field_name = field.get('name', '')
+        field_type = field.get('type', 'text')
+        field_label = field.get('label', '')
+
+        local = FieldClassifier.question(field)
+        if local:
+            yield "question", local
+            return
+
+        cache_key = QuestionCache.make_key(field, context, AIConverter.DEFAULT_MODEL)
+        cached = question_cache.get(cache_key)
+        if cached:
+            yield "question", cached
+            return
+
+        if not OPENROUTER_API_KEY:
+            yield "question", AIConverter._fallback_question(field_name, field_type, field_label)
+            return
+
+        response = None
+        chunks = []
+        finished = False  # only a stream that reached its end is worth caching
+        outcome = "unavailable"
+        started = time.perf_counter()
+        try:
+            payload = AIConverter._build_payload(
+                AIConverter.SYSTEM_PROMPT, AIConverter._field_prompt(field, context), max_tokens=150
+            )
+            payload["stream"] = True
+            response = openrouter_client.post(AIConverter.OPENROUTER_URL, payload, AIConverter._headers(), stream=True)
+
+            if response is not None and response.status_code == 200:
+                outcome = "ok"
+                # chunk_size=None hands over each chunk as soon as it arrives
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    # Skip keep-alive comments (": ...") and blank separators
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        finished = True
+                        break
+                    try:
+                        event = json.loads(data)
+                        # The last chunk may carry only token usage, with no choices
+                        choices = event.get('choices') or [{}]
+                        delta = (choices[0].get('delta') or {}).get('content')
+                        finished = finished or bool(choices[0].get('finish_reason'))
+                    except (ValueError, AttributeError, TypeError):
+                        continue
+                    AIConverter._record_usage(event.get('usage'))
+                    if delta:
+                        chunks.append(delta)
+                        yield "token", delta
+            elif response is not None:
+                outcome = "error"
+                log.warning(f"AI API returned {response.status_code}")
+        except Exception as e:
+            outcome = "error"
+            log.error(f"AI streaming failed: {e}")
+        finally:
+            if response is not None:
+                response.close()
+            metrics.observe("bb_stage_duration_seconds", time.perf_counter() - started, stage="llm")
+            metrics.inc("bb_llm_requests_total", kind="stream", outcome=outcome)
+
+        if chunks:
+            question_data = AIConverter._parse_response("".join(chunks), field_name)
+            if finished and not question_data.get('fallback'):
+                question_cache.put(cache_key, question_data)
+        else:
+            question_data = AIConverter._fallback_question(field_name, field_type, field_label)
+        yield "question", question_data
+
+    @staticmethod
+    def generate_questions(fields: List[Dict], contexts: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+        """Generate questions for several fields with a single AI request.
+
+        `contexts` maps field names to their prompt context; fields sharing a
+        context share one copy of it in the prompt. Returns a dict keyed by
+        field name. Fields FieldClassifier recognises and cached fields are
+        served without a request, and any field the model leaves out or
+        garbles gets a fallback question, so every field is always covered.
+        """
+        contexts = contexts or {}
+        questions = {}
+        cache_keys = {}
+        misses = []
+        for field in fields:
+            field_name = field.get('name', '')
+            local = FieldClassifier.question(field)
+            if local:
+                questions[field_name] = local
+                continue
+            cache_keys[field_name] = QuestionCache.make_key(field, contexts.get(field_name, ''), AIConverter.DEFAULT_MODEL)
+            cached = question_cache.get(cache_keys[field_name])
+            if cached:
+                questions[field_name] = cached
+            else:
+                misses.append(field)
+
+        if not misses:
+            return questions
+
+        fields = misses
+        log.debug("Generating questions for %d fields in one batch", len(fields))
+
+        if OPENROUTER_API_KEY:
+            try:
+                context_ids = {}
+                field_lines = []
+                for i, f in enumerate(fields):
+                    context = contexts.get(f.get('name', ''), '')
+                    if context and context not in context_ids:
+                        context_ids[context] = len(context_ids) + 1
+                    reference = f" | Context: {context_ids[context]}" if context else ""
+                    field_lines.append(
+                        f"{i + 1}. Field Name: {f.get('name', '')} | Field Type: {f.get('type', 'text')} | Label: {f.get('label', '')}{reference}"
+                    )
+                context_lines = "\n\n".join(f"Context {n}:\n{text}" for text, n in context_ids.items())
+                field_lines = "\n".join(field_lines)
+
+                prompt = f"""Convert each of these form fields into a natural question:
+
+{field_lines}
+
+{context_lines or 'Context: General form fields'}
+
+Return the JSON array now."""
+
+                content = AIConverter._request_completion(
+                    AIConverter.BATCH_SYSTEM_PROMPT, prompt,
+                    max_tokens=min(100 * len(fields) + 100, 4000)
+                )
+                if content is not None:
+                    generated = AIConverter._parse_batch_response(content, fields)
+                    for field_name, question_data in generated.items():
+                        question_cache.put(cache_keys[field_name], question_data)
+                    questions.update(generated)
+            except Exception as e:
+                log.error(f"AI batch generation failed: {e}")
+        else:
+            log.warning("No OpenRouter API key - using fallback")
+
+        for field in fields:
+            field_name = field.get('name', '')
+            if field_name not in questions:
+                questions[field_name] = AIConverter._fallback_question(
+                    field_name, field.get('type', 'text'), field.get('label', '')
+                )
+        return questions
+
+    @staticmethod
+    def _field_prompt(field: Dict, context: str) -> str:
+        """Build the single-field question prompt."""
+        return f"""Convert this form field into a natural question:
+
+Field Name: {field.get('name', '')}
+Field Type: {field.get('type', 'text')}
+Label: {field.get('label', '')}
+
+Context: {context or 'General form field'}
+
+Generate a clear question and helpful explanation."""
+
+    @staticmethod
+    def _build_payload(system_prompt: str, prompt: str, max_tokens: int) -> Dict:
+        return {
+            "model": AIConverter.DEFAULT_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": max_tokens
+        }
+
+    @staticmethod
+    def _headers() -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json"
+        }
+
+    @staticmethod
+    def _request_completion(system_prompt: str, prompt: str, max_tokens: int) -> Optional[str]:
+        """Send one chat-completion request and return the message content."""
+        payload = AIConverter._build_payload(system_prompt, prompt, max_tokens)
+        with metrics.timer("bb_stage_duration_seconds", stage="llm"):
+            response = openrouter_client.post(AIConverter.OPENROUTER_URL, payload, AIConverter._headers())
+        if response is None:
+            metrics.inc("bb_llm_requests_total", kind="completion", outcome="unavailable")
+            return None
+
+        if response.status_code == 200:
+            metrics.inc("bb_llm_requests_total", kind="completion", outcome="ok")
+            result = response.json()
+            AIConverter._record_usage(result.get('usage'))
+            return result['choices'][0]['message']['content']
+
+        metrics.inc("bb_llm_requests_total", kind="completion", outcome="error")
+        log.warning(f"AI API returned {response.status_code}")
+        return None
+
+    @staticmethod
+    def _record_usage(usage: Optional[Dict]):
+        """Count the tokens the provider reports for a completion."""
+        if not isinstance(usage, dict):
+            return
+        for kind in ('prompt', 'completion'):
+            tokens = usage.get(f'{kind}_tokens')
+            if isinstance(tokens, int) and tokens > 0:
+                metrics.inc("bb_llm_tokens_total", tokens, type=kind)
+
+    @staticmethod
+    def _parse_batch_response(content: str, fields: List[Dict]) -> Dict[str, Dict]:
+        """Parse a batched AI response into questions keyed by field name.
+
+        Accepts a JSON array (optionally wrapped in a code fence or prose) and
+        falls back to positional matching when the model renames fields.
+        """
+        field_names = [f.get('name', '') for f in fields]
+        questions = {}
+
+        start = content.find('[')
+        end = content.rfind(']')
+        if start == -1 or end <= start:
+            log.warning("AI batch response contained no JSON array")
+            return questions
+
+        try:
+            items = json.loads(content[start:end + 1])
+        except ValueError as e:
+            log.warning(f"AI batch response was not valid JSON: {e}")
+            return questions
+
+        if not isinstance(items, list):
+            return questions
+
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            question = str(item.get('question') or '').strip()
+            if not question:
+                continue
+
+            field_name = str(item.get('field_name') or '').strip()
+            if field_name not in field_names:
+                # Models sometimes echo the label instead of the name
+                if position < len(field_names) and len(items) == len(field_names):
+                    field_name = field_names[position]
+                else:
+                    continue
+            if field_name in questions:
+                continue
+
+            explanation = str(item.get('help') or item.get('explanation') or '').strip()
+            questions[field_name] = {
+                "question": question,
+                "explanation": explanation or "Please provide the requested information.",
+                "field_name": field_name
+            }
+
+        return questions
+
+    @staticmethod
+    def _parse_response(content: str, field_name: str) -> Dict:
+        """Parse AI response into structured format."""
+        question = ""
+        explanation = ""
+
+        lines = content.strip().split('\n')
+        for line in lines:
+            if line.startswith('Question:'):
+                question = line.replace('Question:', '').strip()
+            elif line.startswith('Help:'):
+                explanation = line.replace('Help:', '').strip()
+
+        parsed = bool(question)
+        if not question:
+            question = f"What should we enter for {field_name}?"
+        if not explanation:
+            explanation = "Please provide the requested information."
+
+        question_data = {
+            "question": question,
+            "explanation": explanation,
+            "field_name": field_name
+        }
+        if not parsed:
+            question_data["fallback"] = True  # the reply had no question; worth asking the AI again
+        return question_data
+
+    @staticmethod
+    def _fallback_question(field_name: str, field_type: str, field_label: str) -> Dict:
+        """Generate a simple fallback question."""
+        label = field_label if field_label else field_name.replace('_', ' ').replace('-', ' ').title()
+        
+        if field_type == 'email':
+            question = f"What is your {label.lower()}?"
+            explanation = "Please enter a valid email address."
+        elif field_type == 'tel':
+            question = f"What is your {label.lower()}?"
+            explanation = "Please enter your phone number."
+        elif field_type == 'date':
+            question = f"What is the {label.lower()}?"
+            explanation = "Please enter the date (e.g., MM/DD/YYYY)."
+        elif field_type == 'select':
+            question = f"Please select {label.lower()}"
+            explanation = "Choose from the available options."
+        else:
+            question = f"What is your {label.lower()}?"
+            explanation = "Please provide the requested information."
+
+        return {
+            "question": question,
+            "explanation": explanation,
+            "field_name": field_name,
+            "fallback": True  # not worth keeping in the template registry
+        }
+
+# ============================================================================
+# QUESTION GROUPS
+# ============================================================================
+
+class QuestionGrouper:
+    """Clusters related form fields so one question covers all of them."""
+
+    ADDRESS_WORDS = {
+        'address', 'addr', 'street', 'apt', 'apartment', 'suite', 'unit', 'city', 'town',
+        'state', 'province', 'county', 'region', 'zip', 'zipcode', 'postal', 'postcode', 'country'
+    }
+    NOT_ADDRESS = re.compile(r'e-?mail|\bip\b|\burl\b|\bweb', re.IGNORECASE)
+    ALONE_TYPES = {'signature', 'image', 'file'}  # uploads attach to the current field
+
+    @staticmethod
+    def group_fields(fields: List[Dict]) -> List[Dict]:
+        """Split fields (in form order) into question groups.
+
+        Consecutive fields share a group when they are checkboxes with a
+        common name stem or fieldset, parts of one address, or share a
+        fieldset or a dotted/bracketed name prefix; groups hold at most
+        QUESTION_GROUP_MAX_FIELDS fields. Each group is {"id", "kind",
+        "title", "fields": [names]}; kind 'field' is one field asked alone.
+        """
+        groups = []
+        current_key = None
+        for field in fields:
+            key = QuestionGrouper._group_key(field)
+            if key is None or key[:2] != current_key or len(groups[-1]['fields']) >= QUESTION_GROUP_MAX_FIELDS:
+                groups.append({"kind": key[0] if key else 'field', "title": key[2] if key else "", "fields": []})
+            current_key = key[:2] if key else None
+            groups[-1]['fields'].append(field.get('name', ''))
+
+        for index, group in enumerate(groups):
+            group['id'] = f"g{index + 1}"
+            if len(group['fields']) == 1:
+                group['kind'], group['title'] = 'field', ""
+        return groups
+
+    @staticmethod
+    def _group_key(field: Dict) -> Optional[Tuple[str, str, str]]:
+        """(kind, scope, title) of the group a field can join, or None to ask it alone."""
+        name = field.get('name', '')
+        field_type = field.get('type', 'text')
+        if field_type in QuestionGrouper.ALONE_TYPES:
+            return None
+        prefix = QuestionGrouper._name_prefix(name)
+        section = field.get('group') or ''  # fieldset legend reported by content.js
+
+        if field_type == 'checkbox':
+            scope = section or prefix or QuestionGrouper._name_stem(name)
+            return ('checkboxes', scope, section or QuestionGrouper._title(scope)) if scope else None
+        if QuestionGrouper._is_address_part(field):
+            return ('address', section or prefix, section or "Address")
+        if section:
+            return ('section', section, section)
+        if prefix:
+            return ('prefix', prefix, QuestionGrouper._title(prefix))
+        return None
+
+    @staticmethod
+    def _name_prefix(name: str) -> str:
+        """'applicant.address.city' -> 'applicant.address', 'owner[name]' -> 'owner'."""
+        match = re.match(r'(.+?)[.\[][^.\[]*$', name)
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def _name_stem(name: str) -> str:
+        """'Check Box3' -> 'Check Box', 'symptom_fever' -> 'symptom'."""
+        stem = re.sub(r'[\d\s._-]+$', '', name)
+        if stem and stem != name:
+            return stem
+        match = re.match(r'(.+)[\s._-][^\s._-]+$', name)
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def _is_address_part(field: Dict) -> bool:
+        text = f"{field.get('name', '')} {field.get('label', '')}"
+        if field.get('type') in ('email', 'radio') or QuestionGrouper.NOT_ADDRESS.search(text):
+            return False
+        words = re.findall(r'[a-z]+', re.sub(r'([a-z])([A-Z])', r'\1 \2', text).lower())
+        return bool(QuestionGrouper.ADDRESS_WORDS.intersection(words))
+
+    @staticmethod
+    def _title(scope: str) -> str:
+        last = re.split(r'[.\[]', scope.replace(']', ''))[-1]
+        return WebFormProcessor._label_from_name(last)
+
+    @staticmethod
+    def field_label(field: Dict) -> str:
+        """A field's label, or one made from the last part of its name."""
+        return field.get('label') or QuestionGrouper._title(field.get('name', ''))
+
+    @staticmethod
+    def group_question(group: Dict) -> Dict:
+        """The question asked for a multi-field group; built from its title, no AI request."""
+        title = group['title']
+        if group['kind'] == 'checkboxes':
+            return {
+                "question": f"{title}: which of these apply?" if title else "Which of these apply?",
+                "explanation": "Tick every option that applies and leave the rest unticked."
+            }
+        if group['kind'] == 'address':
+            return {
+                "question": "What is your address?" if title == "Address" else f"What is the {title.lower()}?",
+                "explanation": "Fill in each part of the address."
+            }
+        return {
+            "question": f"Please fill in the {title} details.",
+            "explanation": "Answer each field below; leave any that do not apply blank."
+        }
+
+# ============================================================================
+# QUESTION PRE-GENERATION
+# ============================================================================
+
+question_executor = ThreadPoolExecutor(max_workers=QUESTION_WORKERS, thread_name_prefix="question-gen")
+
+text_executor = ThreadPoolExecutor(max_workers=TEXT_WORKERS, thread_name_prefix="pdf-text")
+
+image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-prep")
+
+def start_image_preparation(session, field_name: str, raw_path: str):
+    """Prepare an uploaded image for `field_name` in the background, replacing any earlier one.
+
+    The upload is decoded on the PDF workers and deleted once its prepared
+    PNG is saved; the session only keeps the PNG's path.
+    """
+    field = next((f for f in session.form_fields if f.get('name') == field_name), {"name": field_name})
+    bilevel = field.get('type') == 'signature' or FieldClassifier.classify(field) == 'signature'
+    out_path = f"{os.path.splitext(raw_path)[0]}.png"
+
+    def prepare():
+        try:
+            with metrics.timer("bb_stage_duration_seconds", stage="image"):
+                info = pdf_pool.run(pdf_job_prepare_image, raw_path, out_path, bilevel)
+            log.info(f"Prepared image for {field_name}: {info['width']}x{info['height']} {info['mode']}, "
+                     f"{info['bytes']} bytes from {os.path.getsize(raw_path)}")
+            return info
+        except Exception as e:
+            log.warning(f"Image for {field_name} could not be prepared: {e}")
+            raise
+        finally:
+            remove_upload(raw_path)
+
+    old_path = session.image_paths.get(field_name)
+    previous = session.image_futures.pop(field_name, None)
+    if previous is not None:
+        previous.cancel()
+        # An earlier image still being prepared is removed once it is saved
+        previous.add_done_callback(lambda _: remove_upload(old_path))
+    else:
+        remove_upload(old_path)
+    session.image_paths[field_name] = out_path
+    future = image_executor.submit(prepare)
+    # A preparation cancelled before it started still owns the upload
+    future.add_done_callback(lambda f: remove_upload(raw_path) if f.cancelled() else None)
+    session.image_futures[field_name] = future
+
+def ready_images(session) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Prepared images to stamp, waiting for any still in progress.
+
+    Returns (field name -> PNG path, field name -> reason for images that
+    could not be prepared).
+    """
+    images, failed = {}, {}
+    for field_name, path in session.image_paths.items():
+        future = session.image_futures.get(field_name)
+        try:
+            if future is not None:
+                future.result(timeout=PDF_JOB_TIMEOUT)
+        except Exception as e:
+            failed[field_name] = f"image could not be prepared: {e}"
+            continue
+        if os.path.exists(path):
+            images[field_name] = path
+        else:
+            failed[field_name] = "image is still being prepared"
+    return images, failed
+
+def start_text_extraction(session, page_count: int, page_texts: Optional[Dict[int, str]] = None):
+    """Extract and index a PDF's page text in the background, field pages first.
+
+    Text is only needed for prompt context, so the upload response never
+    waits on it; get_field_context() indexes a field's own page on demand if
+    the background job has not reached it yet. `page_texts` (from the
+    template registry) replaces extraction; otherwise the text read is
+    stored for the session's template.
+    """
+    session.context_index = ContextIndex()
+    field_pages = [f['page'] for f in session.form_fields if 1 <= f.get('page', 0) <= page_count]
+    order = list(dict.fromkeys(field_pages + list(range(1, page_count + 1))))
+
+    def extract():
+        started = time.time()
+        for start in range(0, len(order), TEXT_PAGES_PER_JOB):
+            # The upload is removed when the session ends
+            if not os.path.exists(session.pdf_path):
+                return
+            pages = [p for p in order[start:start + TEXT_PAGES_PER_JOB] if p not in session.context_index.pages]
+            if page_texts is not None:
+                for page in pages:
+                    session.context_index.add_page(page, page_texts.get(page, ""))
+                continue
+            while pages:
+                try:
+                    _index_pages(session, pages)
+                    break
+                except PDFPoolBusy:
+                    time.sleep(1)  # text is low priority; let interactive jobs through
+                except Exception as e:
+                    log.error(f"Text extraction failed: {e}")
+                    return
+        text = session.context_index.document_text()
+        sessions.save_text(session, text)
+        if page_texts is None and session.template_id:
+            template_registry.save_page_texts(session.template_id, session.context_index.page_texts)
+        log.info(f"Extracted {len(text)} characters of text from {page_count} pages "
+                 f"in {time.time() - started:.2f}s")
+
+    session.text_future = text_executor.submit(extract)
+
+def _index_pages(session, pages: List[int]):
+    """Extract (1-based) pages in a PDF worker and add them to the session's context index."""
+    with metrics.timer("bb_stage_duration_seconds", stage="text"):
+        texts = pdf_pool.run(pdf_job_page_texts, session.pdf_path, pages)
+    for page in pages:
+        session.context_index.add_page(page, texts.get(page, ""))
+
+def get_field_context(session, field: Dict) -> str:
+    """Prompt context for one field, kept within CONTEXT_TOKEN_BUDGET."""
+    budget_chars = CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN
+
+    if session.form_type == "pdf":
+        if session.context_index is None:
+            # Another worker's session: rebuild from whatever text it saved
+            session.context_index = ContextIndex.from_text(session.pdf_text_content)
+        page = field.get('page')
+        if page and page not in session.context_index.pages and session.pdf_path:
+            try:
+                _index_pages(session, [page])
+            except Exception as e:
+                log.warning(f"Could not extract page {page} for context: {e}")
+        return session.context_index.select(field, budget_chars)
+
+    section = field.get('heading') or field.get('group')
+    context = f"Section: {section}\n{session.form_context}" if section else session.form_context
+    return context[:budget_chars]
+
+def pregenerate_questions(session):
+    """Queue question generation for every field so answers never wait on the AI.
+
+    Fields asked as part of a multi-field group share one question built
+    from the group, and fields filled from a profile are not asked, so
+    both are left out. A per-field client that reaches a grouped field
+    has them generated then (see _queue_grouped_questions).
+    """
+    grouped = _grouped_field_names(session)
+    skipped = grouped | set(session.prefilled_fields)
+    pending = [
+        field for field in session.form_fields
+        if field.get('name', '') not in session.pre_generated_questions
+        and field.get('name', '') not in session.question_futures
+        and field.get('name', '') not in skipped
+    ]
+
+    # Submitted in field order so the first questions are ready first
+    for start in range(0, len(pending), QUESTION_BATCH_SIZE):
+        _queue_question_batch(session, pending[start:start + QUESTION_BATCH_SIZE])
+
+    log.info(f"Queued question generation for {len(pending)} fields "
+             f"({len(grouped)} asked in groups, {len(session.prefilled_fields)} prefilled)")
+
+def _grouped_field_names(session) -> set:
+    """Names of the fields asked as part of a multi-field group."""
+    return {name for group in session.question_groups if group['kind'] != 'field' for name in group['fields']}
+
+def _queue_grouped_questions(session, after: Dict):
+    """Queue the grouped fields following `after` in batches, for clients that ask field by field."""
+    grouped = _grouped_field_names(session) - set(session.prefilled_fields)
+    names = [field.get('name', '') for field in session.form_fields]
+    start = names.index(after.get('name', '')) + 1 if after.get('name', '') in names else len(names)
+    pending = [
+        field for field in session.form_fields[start:]
+        if field.get('name', '') in grouped
+        and field.get('name', '') not in session.pre_generated_questions
+        and field.get('name', '') not in session.question_futures
+    ]
+    for batch_start in range(0, len(pending), QUESTION_BATCH_SIZE):
+        _queue_question_batch(session, pending[batch_start:batch_start + QUESTION_BATCH_SIZE])
+    if pending:
+        log.info(f"Queued question generation for {len(pending)} grouped fields asked one by one")
+
+def _queue_question_batch(session, batch: List[Dict]):
+    """Submit one batched generation job covering the given fields."""
+
+    def generate():
+        try:
+            contexts = {field.get('name', ''): get_field_context(session, field) for field in batch}
+            questions = AIConverter.generate_questions(batch, contexts)
+        except Exception as e:
+            log.error(f"Background question generation failed: {e}")
+            questions = {}
+        sessions.save_questions(session, questions)
+        return questions
+
+    future = question_executor.submit(generate)
+    future.fields = batch
+    for field in batch:
+        session.question_futures[field.get('name', '')] = future
+    future.add_done_callback(lambda _f: _mark_questions_generated(session))
+
+def _mark_questions_generated(session):
+    """Flag the session once every queued question has finished, and keep them for its template."""
+    if all(f.done() for f in list(session.question_futures.values())):
+        session.questions_generated = True
+        if session.template_id:
+            template_registry.save_questions(session.template_id, {
+                name: question for name, question in session.pre_generated_questions.items()
+                if not question.get('fallback')
+            })
+
+def _claim_pregenerated_question(session, field: Dict) -> Optional[Dict]:
+    """Return the pre-generated question for a field, or None if the caller must generate it."""
+    field_name = field.get('name', '')
+
+    question_data = session.pre_generated_questions.get(field_name)
+    if question_data:
+        return question_data
+
+    future = session.question_futures.get(field_name)
+    if future is None and field_name in _grouped_field_names(session):
+        # Left out of pregeneration for the group flow, but asked on its own:
+        # this one is generated inline and the grouped fields after it in the background
+        _queue_grouped_questions(session, field)
+    # A batch still waiting in the queue is cancelled, this field is generated
+    # inline and the rest of the batch is requeued; a batch already talking to
+    # the AI is awaited instead of duplicated.
+    if future and future.cancel():
+        rest = [f for f in future.fields if f.get('name', '') != field_name]
+        if rest:
+            _queue_question_batch(session, rest)
+    elif future:
+        try:
+            question_data = future.result(timeout=20).get(field_name)
+            if question_data:
+                return question_data
+        except FutureTimeoutError:
+            log.warning(f"Pre-generated question for {field_name} timed out")
+        except Exception as e:
+            log.error(f"Pre-generated question for {field_name} failed: {e}")
+    return None
+
+def get_question(session, field: Dict) -> Dict:
+    """Return the question for a field, preferring the pre-generated one."""
+    field_name = field.get('name', '')
+
+    question_data = _claim_pregenerated_question(session, field)
+    if question_data:
+        return question_data
+
+    try:
+        question_data = AIConverter.generate_question(field, get_field_context(session, field))
+    except Exception as e:
+        log.error(f"Question generation failed: {e}")
+        question_data = None
+
+    if not question_data:
+        question_data = {"question": f"Please provide {field_name}:", "explanation": "Enter the required information.",
+                         "fallback": True}
+    sessions.save_questions(session, {field_name: question_data})
+    return question_data
+
+def stream_question(session, field: Dict):
+    """Like get_question, but yields ("token", text) events while the AI writes.
+
+    Always finishes with one ("question", question_data) event.
+    """
+    field_name = field.get('name', '')
+
+    question_data = _claim_pregenerated_question(session, field)
+    if question_data:
+        yield "question", question_data
+        return
+
+    question_data = None
+    try:
+        for event, data in AIConverter.stream_question(field, get_field_context(session, field)):
+            if event == "token":
+                yield event, data
+            else:
+                question_data = data
+    except Exception as e:
+        log.error(f"Question streaming failed: {e}")
+
+    if not question_data:
+        question_data = {"question": f"Please provide {field_name}:", "explanation": "Enter the required information.",
+                         "fallback": True}
+    sessions.save_questions(session, {field_name: question_data})
+    yield "question", question_data
+
+def advance_session(session, answer) -> Optional[Dict]:
+    """Record the answer for the current field and move on.
+
+    Returns the next field, or None once every field has been visited.
+    """
+    # Store answer if provided
+    if answer is not None and session.current_field_index < len(session.form_fields):
+        current_field = session.form_fields[session.current_field_index]
+        field_name = current_field.get('name')
+        if field_name:
+            session.answers[field_name] = answer
 
-    @staticmethod
-    def fill_pdf(pdf_bytes: bytes, answers: Dict[str, str]) -> bytes:
-        """Fill PDF form fields with provided answers."""
-        try:
-            input_stream = io.BytesIO(pdf_bytes)
-            output_stream = io.BytesIO()
+    # Move to next field
+    session.current_field_index += 1
+    skip_answered_fields(session)
+    save_session(session)
 
-            pdf_reader = PyPDF2.PdfReader(input_stream)
-            pdf_writer = PyPDF2.PdfWriter()
+    # Check if we're done
+    if session.current_field_index >= len(session.form_fields):
+        return None
+    return session.form_fields[session.current_field_index]
 
-            # Copy all pages to writer
-            for page in pdf_reader.pages:
-                pdf_writer.add_page(page)
+def skip_answered_fields(session):
+    """Move past fields answered ahead: from the profile or in an answered checkbox group."""
+    answered = set(session.prefilled_fields)
+    answered.update(
+        name for group in session.question_groups
+        if group['id'] in session.answered_checkbox_groups for name in group['fields']
+    )
+    while (session.current_field_index < len(session.form_fields)
+           and session.form_fields[session.current_field_index].get('name') in answered):
+        session.current_field_index += 1
 
-            # Update form fields if they exist
-            if hasattr(pdf_writer, 'update_page_form_field_values'):
-                for page_num in range(len(pdf_writer.pages)):
-                    try:
-                        pdf_writer.update_page_form_field_values(
-                            pdf_writer.pages[page_num],
-                            answers
-                        )
-                    except Exception:
-                        continue
+def advance_group(session, answers: Optional[Dict]) -> Optional[Dict]:
+    """Record answers for the current question group and move on.
 
-            # Write the updated PDF to output stream
-            pdf_writer.write(output_stream)
-            output_stream.seek(0)
-            return output_stream.read()
+    Only the group's own fields are taken from `answers`, and blank answers
+    are skipped. Returns the next group, or None once every group has been visited.
+    """
+    if answers and session.current_group_index < len(session.question_groups):
+        group = session.question_groups[session.current_group_index]
+        for field_name in group['fields']:
+            value = _answer_text(answers.get(field_name))
+            if value:
+                session.answers[field_name] = value
+        if group['kind'] == 'checkboxes':
+            session.answered_checkbox_groups.add(group['id'])
 
-        except Exception:
-            return pdf_bytes
+    session.current_group_index += 1
+    return enter_group(session)
 
-# ============================================================================
-# WEBSITE FORM PROCESSING
-# ============================================================================
+def enter_group(session) -> Optional[Dict]:
+    """Point the session at its current group's first field (image uploads attach there).
 
-class WebFormProcessor:
-    """Handles website form processing."""
+    Groups whose fields were all filled from the profile are skipped.
+    """
+    prefilled = set(session.prefilled_fields)
+    while (session.current_group_index < len(session.question_groups)
+           and prefilled.issuperset(session.question_groups[session.current_group_index]['fields'])):
+        session.current_group_index += 1
+    group = None
+    if session.current_group_index < len(session.question_groups):
+        group = session.question_groups[session.current_group_index]
+        names = [field.get('name', '') for field in session.form_fields]
+        if group['fields'][0] in names:
+            session.current_field_index = names.index(group['fields'][0])
+    save_session(session)
+    return group
 
-    @staticmethod
-    def extract_fields_from_html(html: str, forms_data: List[Dict] = None) -> List[Dict]:
-        """Extract field information from HTML."""
-        fields = []
-        
-        # If we have structured form data from content script, use that
-        if forms_data:
-            for form in forms_data:
-                for field in form.get('fields', []):
-                    if field['name'] not in [f['name'] for f in fields]:
-                        fields.append({
-                            'name': field['name'],
-                            'type': field.get('type', 'text'),
-                            'label': field.get('label', field['name'])
-                        })
-        else:
-            # Fallback: parse HTML directly
-            # Text inputs
-            text_pattern = r'<input[^>]*name=["\']([^"\']+)["\'][^>]*?(?:type=["\'](?:text|email|tel|number|date)["\'])?[^>]*>'
-            for match in re.finditer(text_pattern, html, re.IGNORECASE):
-                name = match.group(1)
-                if name not in [f['name'] for f in fields]:
-                    label = WebFormProcessor._extract_label(html, name)
-                    fields.append({
-                        'name': name,
-                        'type': 'text',
-                        'label': label or name.replace('_', ' ').replace('-', ' ').title()
-                    })
-            
-            # Textareas
-            textarea_pattern = r'<textarea[^>]*name=["\']([^"\']+)["\']'
-            for match in re.finditer(textarea_pattern, html, re.IGNORECASE):
-                name = match.group(1)
-                if name not in [f['name'] for f in fields]:
-                    label = WebFormProcessor._extract_label(html, name)
-                    fields.append({
-                        'name': name,
-                        'type': 'textarea',
-                        'label': label or name.replace('_', ' ').replace('-', ' ').title()
-                    })
-            
-            # Selects
-            select_pattern = r'<select[^>]*name=["\']([^"\']+)["\']'
-            for match in re.finditer(select_pattern, html, re.IGNORECASE):
-                name = match.group(1)
-                if name not in [f['name'] for f in fields]:
-                    label = WebFormProcessor._extract_label(html, name)
-                    fields.append({
-                        'name': name,
-                        'type': 'select',
-                        'label': label or name.replace('_', ' ').replace('-', ' ').title()
-                    })
-
-        print(f"[INFO] Extracted {len(fields)} fields from website form")
-        return fields
+def group_field(session, group: Dict) -> Dict:
+    """The field a single-field group asks about."""
+    name = group['fields'][0]
+    return next((field for field in session.form_fields if field.get('name') == name), {"name": name})
 
-    @staticmethod
-    def _extract_label(html: str, field_name: str) -> Optional[str]:
-        """Try to extract label for a field."""
-        # Look for label with for attribute
-        label_pattern = rf'<label[^>]*for=["\'](?:[^"\']*{field_name}[^"\']*)["\'][^>]*>(.*?)</label>'
-        match = re.search(label_pattern, html, re.IGNORECASE | re.DOTALL)
-        if match:
-            label_text = re.sub(r'<[^>]+>', '', match.group(1)).strip()
-            return label_text
-        
-        # Look for nearby text
-        field_pattern = rf'(?:<label[^>]*>|<span[^>]*>|<div[^>]*>)([^<]*)</(?:label|span|div)>[^<]*<input[^>]*name=["\']{field_name}["\']'
-        match = re.search(field_pattern, html, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-        
-        return None
+def group_payload(session, group: Dict, question_data: Optional[Dict] = None) -> Dict:
+    """Shape a group's question and its fields for the extension's chat view.
 
-# ============================================================================
-# AI CONVERTERS
-# ============================================================================
+    `question_data` is the group's question when the caller already has it
+    (see group_event_stream).
+    """
+    fields_by_name = {field.get('name', ''): field for field in session.form_fields}
+    if question_data is None and group['kind'] == 'field':
+        question_data = get_question(session, group_field(session, group))
+    elif question_data is None:
+        question_data = QuestionGrouper.group_question(group)
 
-class AIConverter:
-    """Handles AI-based question generation using OpenRouter."""
+    fields = []
+    for field_name in group['fields']:
+        field = fields_by_name.get(field_name, {"name": field_name})
+        entry = {"name": field_name, "label": QuestionGrouper.field_label(field), "type": field.get('type', 'text')}
+        if field.get('options'):
+            entry["options"] = field['options']
+        if field_name in session.answers:
+            entry["value"] = session.answers[field_name]
+        fields.append(entry)
 
-    OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-    DEFAULT_MODEL = "mistralai/mistral-7b-instruct"
+    return {
+        "text": question_data.get("question"),
+        "explanation": question_data.get("explanation"),
+        "field_name": group['fields'][0],
+        "group_id": group['id'],
+        "kind": group['kind'],
+        "title": group['title'],
+        "fields": fields,
+        "current": session.current_group_index + 1,
+        "total": len(session.question_groups)
+    }
 
-    SYSTEM_PROMPT = """You are a professional form assistant helping users fill out forms.
-Your ONLY job is to convert form field names into clear, professional questions.
+def question_payload(session, field: Dict, question_data: Dict) -> Dict:
+    """Shape a question for the extension's chat view."""
+    return {
+        "text": question_data.get("question"),
+        "explanation": question_data.get("explanation"),
+        "field_name": field.get('name', ''),
+        "current": session.current_field_index + 1,
+        "total": len(session.form_fields)
+    }
 
-CRITICAL RULES:
-1. ONLY ask about the EXACT field provided
-2. Match question type to field type
-3. Be professional and helpful
-4. Keep questions concise and clear
-5. NEVER ask the same question twice
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-OUTPUT FORMAT:
-Question: [Your question here]
-Help: [One sentence explaining what to enter]"""
+def question_event_stream(session, field: Dict) -> Response:
+    """Stream a field's question as SSE: token events, then the final question."""
+    def generate():
+        for event, data in stream_question(session, field):
+            if event == "token":
+                yield sse_event("token", {"text": data})
+            else:
+                yield sse_event("question", {
+                    "session_id": session.session_id,
+                    "question": question_payload(session, field, data)
+                })
 
-    @staticmethod
-    def generate_question(field: Dict, context: str = "") -> Optional[Dict]:
-        """Generate a conversational question for a form field using AI."""
-        field_name = field.get('name', '')
-        field_type = field.get('type', 'text')
-        field_label = field.get('label', '')
-        
-        print(f"[DEBUG] Generating question for field: {field_name} ({field_type})")
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        if not OPENROUTER_API_KEY:
-            print("[WARNING] No OpenRouter API key - using fallback")
-            return AIConverter._fallback_question(field_name, field_type, field_label)
+def group_event_stream(session, group: Optional[Dict]) -> Response:
+    """Stream a group's question as SSE: token events while the AI writes a
+    single field's question, then the final question (or completed)."""
+    if group is None:
+        return Response(sse_event("completed", {"completed": True}), mimetype="text/event-stream")
 
-        try:
-            # Build prompt
-            prompt = f"""Convert this form field into a natural question:
+    def generate():
+        question_data = None
+        if group['kind'] == 'field':
+            for event, data in stream_question(session, group_field(session, group)):
+                if event == "token":
+                    yield sse_event("token", {"text": data})
+                else:
+                    question_data = data
+        yield sse_event("question", {
+            "session_id": session.session_id,
+            "question": group_payload(session, group, question_data)
+        })
 
-Field Name: {field_name}
-Field Type: {field_type}
-Label: {field_label}
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-Context: {context[:500] if context else 'General form field'}
+# ============================================================================
+# BULK FILLING
+# ============================================================================
 
-Generate a clear question and helpful explanation."""
+def _answer_text(value) -> Optional[str]:
+    """A JSON answer value as the text fill_pdf expects; None means no answer."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)  # list boxes take comma-separated choices
+    return str(value)
 
-            payload = {
-                "model": AIConverter.DEFAULT_MODEL,
-                "messages": [
-                    {"role": "system", "content": AIConverter.SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 150
-            }
+def read_answer_rows(stream, fmt: str):
+    """Yield (answers, error) for each row of a CSV (header row = field names) or JSONL upload."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for row in csv.DictReader(text):
+            yield {k: v for k, v in row.items() if k is not None and v}, None
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield None, f"line {line_number}: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield None, f"line {line_number}: expected a JSON object"
+            continue
+        yield {str(k): _answer_text(v) for k, v in row.items() if _answer_text(v) is not None}, None
 
-            headers = {
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json"
-            }
+class ZipStreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that lets zipfile build an archive chunk by chunk."""
 
-            response = requests.post(
-                AIConverter.OPENROUTER_URL,
-                json=payload,
-                headers=headers,
-                timeout=15
-            )
+    def __init__(self):
+        self._chunks = []
 
-            if response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                return AIConverter._parse_response(content, field_name)
-            else:
-                print(f"[WARNING] AI API returned {response.status_code}")
-                return AIConverter._fallback_question(field_name, field_type, field_label)
+    def writable(self) -> bool:
+        return True
 
-        except Exception as e:
-            print(f"[ERROR] AI generation failed: {e}")
-            return AIConverter._fallback_question(field_name, field_type, field_label)
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
 
-    @staticmethod
-    def _parse_response(content: str, field_name: str) -> Dict:
-        """Parse AI response into structured format."""
-        question = ""
-        explanation = ""
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
 
-        lines = content.strip().split('\n')
-        for line in lines:
-            if line.startswith('Question:'):
-                question = line.replace('Question:', '').strip()
-            elif line.startswith('Help:'):
-                explanation = line.replace('Help:', '').strip()
+def stream_bulk_fill(template_path: str, rows, field_names: set, name_column: Optional[str] = None):
+    """Fill the template once per answer row and yield a ZIP of the results as it is built.
 
-        if not question:
-            question = f"What should we enter for {field_name}?"
-        if not explanation:
-            explanation = "Please provide the requested information."
+    Rows go to the PDF workers BULK_ROWS_PER_JOB at a time, so each worker
+    parses the template once. With incremental output an entry is the
+    template's bytes plus that row's appended update. The last entry,
+    report.jsonl, lists each row's file and unfilled fields, then a summary.
+    """
+    try:
+        with open(template_path, 'rb') as f:
+            template = f.read()
+        buffer = ZipStreamBuffer()
+        archive = zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED)
+        report = []
+        ignored = set()
+        chunk_rows = deque()  # (row_number, file name, error) per row of each queued job
+        rows_seen = 0
+        started = time.perf_counter()
 
-        return {
-            "question": question,
-            "explanation": explanation,
-            "field_name": field_name
-        }
+        def jobs():
+            nonlocal rows_seen
+            batch, meta = [], []
+            for row_number, (row, error) in enumerate(rows, 1):
+                if row_number > BULK_MAX_ROWS:
+                    report.append({"row": row_number, "error": f"row limit of {BULK_MAX_ROWS} reached; remaining rows skipped"})
+                    break
+                rows_seen = row_number
+                name = None
+                if row is not None:
+                    label = secure_filename(row.get(name_column, '')) if name_column else ''
+                    name = f"{row_number:06d}_{label}.pdf" if label else f"{row_number:06d}.pdf"
+                    ignored.update(k for k in row if k not in field_names and k != name_column)
+                    batch.append({k: v for k, v in row.items() if k in field_names})
+                meta.append((row_number, name, error))
+                if len(batch) >= BULK_ROWS_PER_JOB:
+                    chunk_rows.append(meta)
+                    yield template_path, batch
+                    batch, meta = [], []
+            if meta:
+                chunk_rows.append(meta)
+                yield template_path, batch
 
-    @staticmethod
-    def _fallback_question(field_name: str, field_type: str, field_label: str) -> Dict:
-        """Generate a simple fallback question."""
-        label = field_label if field_label else field_name.replace('_', ' ').replace('-', ' ').title()
-        
-        if field_type == 'email':
-            question = f"What is your {label.lower()}?"
-            explanation = "Please enter a valid email address."
-        elif field_type == 'tel':
-            question = f"What is your {label.lower()}?"
-            explanation = "Please enter your phone number."
-        elif field_type == 'date':
-            question = f"What is the {label.lower()}?"
-            explanation = "Please enter the date (e.g., MM/DD/YYYY)."
-        elif field_type == 'select':
-            question = f"Please select {label.lower()}"
-            explanation = "Choose from the available options."
-        else:
-            question = f"What is your {label.lower()}?"
-            explanation = "Please provide the requested information."
+        window = max(1, min(PDF_WORKERS * 2, PDF_MAX_PENDING // 2))
+        filled = 0
+        for results in pdf_pool.imap(pdf_job_fill_many, jobs(), window):
+            meta = chunk_rows.popleft()
+            if isinstance(results, Exception):
+                results = [{"error": str(results) or type(results).__name__}] * len(meta)
+            results = iter(results)
+            for row_number, name, error in meta:
+                result = {"error": error} if error else next(results)
+                if "error" in result:
+                    report.append({"row": row_number, "error": result["error"]})
+                    continue
+                data = template + result["data"] if result["is_update"] else result["data"]
+                archive.writestr(name, data)
+                report.append({"row": row_number, "file": name, "unfilled": result["unfilled"]})
+                filled += 1
+            yield buffer.drain()
 
-        return {
-            "question": question,
-            "explanation": explanation,
-            "field_name": field_name
-        }
+        elapsed = time.perf_counter() - started
+        report.append({
+            "rows": rows_seen,
+            "filled": filled,
+            "failed": rows_seen - filled,
+            "ignored_columns": sorted(ignored),
+            "seconds": round(elapsed, 3)
+        })
+        archive.writestr("report.jsonl", "".join(json.dumps(entry) + "\n" for entry in report))
+        archive.close()
+        yield buffer.drain()
+        metrics.observe("bb_stage_duration_seconds", elapsed, stage="bulk_fill")
+        log.info(f"Bulk fill: {filled} of {rows_seen} rows in {elapsed:.2f}s "
+                 f"({filled / elapsed if elapsed else 0:.0f} rows/s)")
+    finally:
+        remove_upload(template_path)
 
 # ============================================================================
 # ROUTES - HEALTH & INFO
@@ -424,9 +4411,48 @@ def health_check():
         "status": "healthy",
         "version": "1.0.0",
         "features": ["pdf_forms", "website_forms", "ai_questions"],
-        "openrouter_configured": bool(OPENROUTER_API_KEY)
+        "openrouter_configured": bool(OPENROUTER_API_KEY),
+        "openrouter": openrouter_client.stats(),
+        "pdf_workers": pdf_pool.stats(),
+        "question_cache": question_cache.stats(),
+        "templates": template_registry.stats(),
+        "profiles": profile_store.stats(),
+        "sessions": sessions.stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of this process's metrics."""
+    pool = pdf_pool.stats()
+    cache = question_cache.stats()
+    templates = template_registry.stats()
+    client = openrouter_client.stats()
+    store = sessions.stats()
+    profiles = profile_store.stats()
+    circuit = {"closed": 0, "half_open": 1, "open": 2}
+    samples = [
+        ("bb_question_cache_lookups_total", {"result": "memory_hit"}, cache["memory_hits"]),
+        ("bb_question_cache_lookups_total", {"result": "disk_hit"}, cache["disk_hits"]),
+        ("bb_question_cache_lookups_total", {"result": "miss"}, cache["misses"]),
+        ("bb_question_cache_memory_entries", {}, cache["memory_entries"]),
+        ("bb_template_lookups_total", {"result": "file_hit"}, templates["file_hits"]),
+        ("bb_template_lookups_total", {"result": "structure_hit"}, templates["structure_hits"]),
+        ("bb_template_lookups_total", {"result": "miss"}, templates["misses"]),
+        ("bb_templates", {}, templates["templates"]),
+        ("bb_openrouter_requests_sent_total", {}, client["requests_sent"]),
+        ("bb_openrouter_retries_total", {}, client["retries"]),
+        ("bb_openrouter_short_circuited_total", {}, client["short_circuited"]),
+        ("bb_openrouter_circuit_state", {}, circuit[client["circuit"]]),
+        ("bb_pdf_jobs_pending", {}, pool["pending"]),
+        ("bb_pdf_jobs_total", {"result": "completed"}, pool["completed"]),
+        ("bb_pdf_jobs_total", {"result": "rejected"}, pool["rejected"]),
+        ("bb_pdf_jobs_total", {"result": "timeout"}, pool["timeouts"]),
+        ("bb_sessions_active", {}, store["active"]),
+        ("bb_sessions_expired_total", {}, store["expired"]),
+        ("bb_profile_prefilled_fields_total", {}, profiles["prefilled_fields"]),
+    ]
+    return Response(metrics.render(samples), mimetype="text/plain; version=0.0.4")
+
 # ============================================================================
 # ROUTES - PDF FORMS
 # ============================================================================
@@ -444,36 +4470,82 @@ def upload_pdf():
     if not file.filename.endswith('.pdf'):
         return jsonify({"error": "File must be a PDF"}), 400
 
+    pdf_path = None
     try:
-        pdf_bytes = file.read()
-        
-        if len(pdf_bytes) > MAX_FILE_SIZE:
-            return jsonify({"error": "File too large. Maximum 50MB."}), 400
+        # Stream to disk; the size limit is enforced chunk by chunk
+        pdf_path = save_upload(file, '.pdf', MAX_FILE_SIZE)
+        if pdf_path is None:
+            return jsonify({"error": f"File too large. Maximum {MAX_FILE_SIZE // (1024 * 1024)}MB."}), 400
+
+        # A template seen before skips analysis; byte-identical files are not even parsed
+        digest = upload_digest(file, pdf_path)
+        template = template_registry.find_file(digest)
+        if template:
+            template_registry.record("file")
+            fields, page_count, fingerprint = template["fields"], template["page_count"], template["fingerprint"]
+        else:
+            fields = None
+
+        # Parse and extract fields in a PDF worker process
+        try:
+            if fields is None:
+                with metrics.timer("bb_stage_duration_seconds", stage="parse"):
+                    fields, page_count, fingerprint = pdf_pool.run(pdf_job_extract_fields, pdf_path)
+                if fields:
+                    template = template_registry.find(fingerprint)
+                    template_registry.record("structure" if template else None)
+                    template_registry.add(fingerprint, digest, fields, page_count)
+        except PDFPoolBusy:
+            remove_upload(pdf_path)
+            return jsonify({"error": "Server is busy processing other PDFs. Please try again."}), 503, {"Retry-After": "5"}
+        except TimeoutError as e:
+            remove_upload(pdf_path)
+            return jsonify({"error": str(e)}), 504
+        except BrokenProcessPool:
+            log.error("PDF worker stopped while parsing an upload")
+            remove_upload(pdf_path)
+            return jsonify({"error": "PDF processing failed. Please try again."}), 500
+        except PyPDF2.errors.PyPdfError as e:
+            log.warning(f"PDF could not be read: {e}")
+            remove_upload(pdf_path)
+            return jsonify({"error": f"Could not read PDF: {e}"}), 400
 
-        # Extract fields
-        fields = PDFProcessor.extract_fields(pdf_bytes)
-        
         if not fields:
+            remove_upload(pdf_path)
             return jsonify({"error": "No fillable fields found in PDF"}), 400
 
-        # Extract text for context
-        pdf_text = PDFProcessor.extract_text(pdf_bytes)
-
         # Create session
         session = create_session()
         session.form_fields = fields
-        session.original_pdf = pdf_bytes
-        session.pdf_text_content = pdf_text
+        session.pdf_path = pdf_path
         session.form_type = "pdf"
+        session.template_id = fingerprint
+        session.question_groups = QuestionGrouper.group_fields(fields)
+        apply_profile(session, request.form.get('profile_id'))
+        if template:
+            text_state = 'ready' if template['page_texts'] is not None else 'pending'
+            log.info(f"Recognised template {fingerprint[:12]} "
+                     f"({len(template['questions'])} questions, text {text_state})")
+            session.pre_generated_questions.update(template["questions"])
+
+        # Page text (prompt context only) is extracted in the background
+        start_text_extraction(session, page_count, template["page_texts"] if template else None)
+        save_session(session)
+
+        # Generate the remaining questions in the background while the user reads
+        pregenerate_questions(session)
 
         return jsonify({
             "session_id": session.session_id,
             "total_fields": len(fields),
+            "total_groups": len(session.question_groups),
+            "prefilled_fields": session.prefilled_fields,
             "message": "PDF uploaded successfully"
         })
 
     except Exception as e:
-        print(f"[ERROR] PDF upload failed: {str(e)}")
+        log.error(f"PDF upload failed: {str(e)}")
+        remove_upload(pdf_path)
         return jsonify({"error": f"Upload failed: {str(e)}"}), 500
 
 @app.route('/start-session', methods=['POST'])
@@ -487,33 +4559,48 @@ def start_session():
         return jsonify({"error": "Session not found"}), 404
 
     session.current_field_index = 0
+    skip_answered_fields(session)
+    save_session(session)
+
+    if session.form_fields and session.current_field_index >= len(session.form_fields):
+        return jsonify({"session_id": session.session_id, "completed": True})
 
     # Get first field
     if session.form_fields:
-        field = session.form_fields[0]
-        field_name = field.get('name', '')
+        field = session.form_fields[session.current_field_index]
 
-        # Generate question
-        try:
-            context = session.pdf_text_content if session.form_type == "pdf" else session.form_html
-            question_data = AIConverter.generate_question(field, context)
-        except Exception as e:
-            print(f"[ERROR] Question generation failed: {e}")
-            question_data = {"question": f"Please provide {field_name}:", "explanation": "Enter the required information."}
+        # Serve the pre-generated question when it is ready
+        question_data = get_question(session, field)
 
         return jsonify({
             "session_id": session.session_id,
-            "question": {
-                "text": question_data.get("question"),
-                "explanation": question_data.get("explanation"),
-                "field_name": field_name,
-                "current": 1,
-                "total": len(session.form_fields)
-            }
+            "question": question_payload(session, field, question_data)
         })
 
     return jsonify({"error": "No fields to process"}), 400
 
+@app.route('/start-session-stream', methods=['POST'])
+def start_session_stream():
+    """Start a form filling session, streaming the first question as SSE."""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+
+    session = get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    if not session.form_fields:
+        return jsonify({"error": "No fields to process"}), 400
+
+    session.current_field_index = 0
+    skip_answered_fields(session)
+    save_session(session)
+
+    if session.current_field_index >= len(session.form_fields):
+        return Response(sse_event("completed", {"completed": True}), mimetype="text/event-stream")
+
+    return question_event_stream(session, session.form_fields[session.current_field_index])
+
 @app.route('/next-question', methods=['POST'])
 def next_question():
     """Get next question in sequence."""
@@ -525,43 +4612,117 @@ def next_question():
     if not session:
         return jsonify({"error": "Session not found"}), 404
 
-    # Store answer if provided
-    if answer is not None and session.current_field_index < len(session.form_fields):
-        current_field = session.form_fields[session.current_field_index]
-        field_name = current_field.get('name')
-        if field_name:
-            session.answers[field_name] = answer
+    field = advance_session(session, answer)
+    if field is None:
+        return jsonify({"completed": True})
 
-    # Move to next field
-    session.current_field_index += 1
+    # Serve the pre-generated question when it is ready
+    question_data = get_question(session, field)
 
-    # Check if we're done
-    if session.current_field_index >= len(session.form_fields):
-        return jsonify({"completed": True})
+    return jsonify({
+        "session_id": session.session_id,
+        "question": question_payload(session, field, question_data)
+    })
 
-    # Get next field
-    field = session.form_fields[session.current_field_index]
-    field_name = field.get('name', '')
+@app.route('/next-question-stream', methods=['POST'])
+def next_question_stream():
+    """Store an answer and stream the next question as SSE."""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+    answer = data.get('answer')
 
-    # Generate question
-    try:
-        context = session.pdf_text_content if session.form_type == "pdf" else session.form_html
-        question_data = AIConverter.generate_question(field, context)
-    except Exception as e:
-        print(f"[ERROR] Question generation failed: {e}")
-        question_data = {"question": f"Please provide {field_name}:", "explanation": "Enter the required information."}
+    session = get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    field = advance_session(session, answer)
+    if field is None:
+        return Response(sse_event("completed", {"completed": True}), mimetype="text/event-stream")
+
+    return question_event_stream(session, field)
+
+@app.route('/start-group-session', methods=['POST'])
+def start_group_session():
+    """Start a form filling session that asks one question per group of related fields."""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+
+    session = get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    if not session.form_fields:
+        return jsonify({"error": "No fields to process"}), 400
+
+    if not session.question_groups:
+        session.question_groups = QuestionGrouper.group_fields(session.form_fields)
+    session.current_group_index = 0
+    group = enter_group(session)
+    if group is None:
+        return jsonify({"session_id": session.session_id, "completed": True})
 
     return jsonify({
         "session_id": session.session_id,
-        "question": {
-            "text": question_data.get("question"),
-            "explanation": question_data.get("explanation"),
-            "field_name": field_name,
-            "current": session.current_field_index + 1,
-            "total": len(session.form_fields)
-        }
+        "question": group_payload(session, group)
+    })
+
+@app.route('/next-group', methods=['POST'])
+def next_group():
+    """Store the answers for the current group ({field name: answer}) and get the next group."""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+    answers = data.get('answers')
+
+    session = get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    if answers is not None and not isinstance(answers, dict):
+        return jsonify({"error": "answers must map field names to answers"}), 400
+
+    group = advance_group(session, answers)
+    if group is None:
+        return jsonify({"completed": True})
+
+    return jsonify({
+        "session_id": session.session_id,
+        "question": group_payload(session, group)
     })
 
+@app.route('/start-group-session-stream', methods=['POST'])
+def start_group_session_stream():
+    """Start a grouped session, streaming the first group's question as SSE."""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+
+    session = get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    if not session.form_fields:
+        return jsonify({"error": "No fields to process"}), 400
+
+    if not session.question_groups:
+        session.question_groups = QuestionGrouper.group_fields(session.form_fields)
+    session.current_group_index = 0
+    return group_event_stream(session, enter_group(session))
+
+@app.route('/next-group-stream', methods=['POST'])
+def next_group_stream():
+    """Store the current group's answers and stream the next group's question as SSE."""
+    data = request.get_json() or {}
+    session_id = data.get('session_id')
+    answers = data.get('answers')
+
+    session = get_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    if answers is not None and not isinstance(answers, dict):
+        return jsonify({"error": "answers must map field names to answers"}), 400
+
+    return group_event_stream(session, advance_group(session, answers))
+
 @app.route('/generate-pdf', methods=['POST'])
 def generate_pdf():
     """Generate a completed PDF."""
@@ -578,27 +4739,121 @@ def generate_pdf():
     if not session.answers:
         return jsonify({"error": "No answers provided"}), 400
 
-    if not session.original_pdf:
+    if not session.pdf_path and not session.original_pdf:
         return jsonify({"error": "Original PDF not found"}), 400
 
     try:
-        filled_pdf_bytes = PDFProcessor.fill_pdf(session.original_pdf, session.answers)
+        headers = {"Content-Disposition": "attachment;filename=completed_form.pdf"}
+        images, unprepared = ready_images(session)
+        answers = {name: value for name, value in session.answers.items() if name not in unprepared}
+        with metrics.timer("bb_stage_duration_seconds", stage="fill"):
+            if session.pdf_path:
+                filled_pdf, unfilled, is_update = pdf_pool.run(pdf_job_fill, session.pdf_path, answers, images)
+            else:
+                (filled_pdf, unfilled), is_update = PDFProcessor.fill_pdf(session.original_pdf, answers, images), False
+        unfilled.update(unprepared)
+
+        if is_update:
+            # Stream the uploaded file as-is, followed by the appended update
+            headers["Content-Length"] = str(os.path.getsize(session.pdf_path) + len(filled_pdf))
+            filled_pdf = stream_upload(session.pdf_path, filled_pdf)
+
+        if unfilled:
+            log.warning(f"{len(unfilled)} answers could not be written: {unfilled}")
+        headers["X-Unfilled-Fields"] = json.dumps(unfilled)
 
-        # Clean up session
-        if session_id in sessions:
-            del sessions[session_id]
+        # Answers that made it into the PDF are kept for the user's next form
+        profile_store.remember(session.profile_id, session.form_fields, {
+            name: value for name, value in session.answers.items() if name not in unfilled
+        })
 
-        return app.response_class(
-            response=filled_pdf_bytes,
+        response = app.response_class(
+            response=filled_pdf,
             status=200,
             mimetype="application/pdf",
-            headers={"Content-Disposition": "attachment;filename=completed_form.pdf"}
+            headers=headers
         )
+        # Clean up session and drop any questions still queued for it, once
+        # the uploaded file has been sent
+        response.call_on_close(lambda: delete_session(session_id))
+        return response
 
+    except PDFPoolBusy:
+        return jsonify({"error": "Server is busy processing other PDFs. Please try again."}), 503, {"Retry-After": "5"}
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
+    except BrokenProcessPool:
+        log.error("PDF worker stopped while filling a PDF")
+        return jsonify({"error": "PDF processing failed. Please try again."}), 500
     except Exception as e:
-        print(f"[ERROR] PDF generation failed: {str(e)}")
+        log.error(f"PDF generation failed: {str(e)}")
         return jsonify({"error": f"Unable to generate PDF: {str(e)}"}), 400
 
+# ============================================================================
+# ROUTES - BULK FILL
+# ============================================================================
+
+@app.route('/bulk-fill', methods=['POST'])
+def bulk_fill():
+    """Fill one template PDF for every row of a CSV or JSONL file; returns a streamed ZIP."""
+    template_file = request.files.get('template')
+    rows_file = request.files.get('rows')
+    if not template_file or not rows_file:
+        return jsonify({"error": "Provide a 'template' PDF and a 'rows' CSV or JSONL file"}), 400
+
+    fmt = request.form.get('format') or (
+        'jsonl' if rows_file.filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+    )
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({"error": "format must be 'csv' or 'jsonl'"}), 400
+
+    template_path = None
+    try:
+        template_path = save_upload(template_file, '.pdf', MAX_FILE_SIZE)
+        if template_path is None:
+            return jsonify({"error": f"File too large. Maximum {MAX_FILE_SIZE // (1024 * 1024)}MB."}), 400
+
+        digest = upload_digest(template_file, template_path)
+        template = template_registry.find_file(digest)
+        if template:
+            fields = template["fields"]
+        else:
+            with metrics.timer("bb_stage_duration_seconds", stage="parse"):
+                fields, page_count, fingerprint = pdf_pool.run(pdf_job_extract_fields, template_path)
+            if fields:
+                template_registry.add(fingerprint, digest, fields, page_count)
+    except PDFPoolBusy:
+        remove_upload(template_path)
+        return jsonify({"error": "Server is busy processing other PDFs. Please try again."}), 503, {"Retry-After": "5"}
+    except TimeoutError as e:
+        remove_upload(template_path)
+        return jsonify({"error": str(e)}), 504
+    except BrokenProcessPool:
+        log.error("PDF worker stopped while parsing a bulk fill template")
+        remove_upload(template_path)
+        return jsonify({"error": "PDF processing failed. Please try again."}), 500
+    except PyPDF2.errors.PyPdfError as e:
+        log.warning(f"Bulk fill template could not be read: {e}")
+        remove_upload(template_path)
+        return jsonify({"error": f"Could not read template: {e}"}), 400
+    except Exception as e:
+        log.error(f"Bulk fill template parsing failed: {e}")
+        remove_upload(template_path)
+        return jsonify({"error": f"Bulk fill failed: {e}"}), 500
+
+    if not fields:
+        remove_upload(template_path)
+        return jsonify({"error": "No fillable fields found in template"}), 400
+
+    # The rows file is read while the ZIP streams, so the request context has to stay open
+    rows = read_answer_rows(rows_file.stream, fmt)
+    body = stream_bulk_fill(template_path, rows, {f['name'] for f in fields}, request.form.get('filename_column'))
+    return Response(
+        stream_with_context(body),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment;filename=filled_forms.zip"}
+    )
+
 # ============================================================================
 # ROUTES - WEBSITE FORMS
 # ============================================================================
@@ -606,16 +4861,22 @@ def generate_pdf():
 @app.route('/analyze-website-form', methods=['POST'])
 def analyze_website_form():
     """Analyze website form fields and create a session."""
-    try:
-        data = request.get_json() or {}
-        form_html = data.get('form_html', '')
-        forms_data = data.get('forms_data', None)
+    data = get_request_json()
+    form_schema = data.get('form_schema')
+    form_html = data.get('form_html', '')
+    forms_data = data.get('forms_data', None)
 
-        if not form_html:
-            return jsonify({"error": "No form HTML provided"}), 400
+    if not form_schema and not form_html:
+        return jsonify({"error": "No form schema provided"}), 400
 
-        # Extract fields
-        fields = WebFormProcessor.extract_fields_from_html(form_html, forms_data)
+    try:
+        # Extract fields; raw HTML is only parsed for clients that predate the schema
+        with metrics.timer("bb_stage_duration_seconds", stage="form_analysis"):
+            if form_schema:
+                fields = WebFormProcessor.extract_fields_from_schema(form_schema)
+            else:
+                fields = WebFormProcessor.extract_fields_from_html(form_html, forms_data)
+                form_schema = {}
 
         if not fields:
             return jsonify({"error": "No form fields detected"}), 400
@@ -623,18 +4884,28 @@ def analyze_website_form():
         # Create session
         session = create_session()
         session.form_fields = fields
-        session.form_html = form_html
+        session.form_context = WebFormProcessor.schema_context(form_schema, fields)
         session.form_type = "website"
+        session.question_groups = QuestionGrouper.group_fields(fields)
+        apply_profile(session, data.get('profile_id'))
+        save_session(session)
+
+        # Generate every question in the background while the user reads
+        pregenerate_questions(session)
 
         return jsonify({
             "session_id": session.session_id,
             "form_type": "website",
             "total_fields": len(fields),
+            "total_groups": len(session.question_groups),
+            "prefilled_fields": session.prefilled_fields,
             "fields": [{'name': f['name'], 'label': f['label'], 'type': f['type']} for f in fields]
         })
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"[ERROR] Website form analysis failed: {e}")
+        log.error(f"Website form analysis failed: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/fill-website-form', methods=['POST'])
@@ -651,6 +4922,8 @@ def fill_website_form():
         if session.form_type != "website":
             return jsonify({"error": "This is not a website form session"}), 400
 
+        profile_store.remember(session.profile_id, session.form_fields, session.answers)
+
         return jsonify({
             "success": True,
             "field_values": session.answers,
@@ -658,16 +4931,31 @@ def fill_website_form():
         })
 
     except Exception as e:
-        print(f"[ERROR] Website form filling failed: {e}")
+        log.error(f"Website form filling failed: {e}")
         return jsonify({"error": str(e)}), 500
 
+# ============================================================================
+# ROUTES - ANSWER PROFILE
+# ============================================================================
+
+@app.route('/profile/<profile_id>', methods=['DELETE'])
+def delete_profile(profile_id):
+    """Forget every answer remembered for a profile."""
+    if not profile_store.valid_id(profile_id):
+        return jsonify({"error": "Answer profiles are disabled or the profile id is invalid"}), 400
+    return jsonify({"success": True, "deleted_answers": profile_store.forget(profile_id)})
+
 # ============================================================================
 # ROUTES - IMAGE UPLOAD
 # ============================================================================
 
 @app.route('/upload-image', methods=['POST'])
 def upload_image():
-    """Handle image upload for signature fields."""
+    """Handle image upload for signature fields.
+
+    Only the image header is checked here; decoding, cropping and shrinking
+    run in the background and the result is stamped in by /generate-pdf.
+    """
     session_id = request.args.get('session_id')
     field_name = request.args.get('field_name', 'signature')
 
@@ -675,6 +4963,11 @@ def upload_image():
     if not session:
         return jsonify({"error": "Session not found"}), 404
 
+    # Uploads for a name the form does not have attach to the field being asked
+    names = [field.get('name', '') for field in session.form_fields]
+    if field_name not in names and session.current_field_index < len(names):
+        field_name = names[session.current_field_index]
+
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
 
@@ -683,9 +4976,17 @@ def upload_image():
         return jsonify({"error": "No file selected"}), 400
 
     try:
-        image_bytes = file.read()
-        session.uploaded_images[field_name] = image_bytes
+        image_path = save_upload(file, '.img', MAX_IMAGE_SIZE)
+        if image_path is None:
+            return jsonify({"error": f"File too large. Maximum {MAX_IMAGE_SIZE // (1024 * 1024)}MB."}), 400
+        try:
+            ImageProcessor.check(image_path)
+        except ValueError as e:
+            remove_upload(image_path)
+            return jsonify({"error": str(e)}), 400
+        start_image_preparation(session, field_name, image_path)
         session.answers[field_name] = f"[IMAGE_UPLOADED: {file.filename}]"
+        save_session(session)
 
         return jsonify({
             "success": True,
@@ -693,17 +4994,28 @@ def upload_image():
         })
 
     except Exception as e:
-        print(f"[ERROR] Image upload failed: {e}")
+        log.error(f"Image upload failed: {e}")
         return jsonify({"error": str(e)}), 500
 
 # ============================================================================
 # ERROR HANDLERS
 # ============================================================================
 
+@app.errorhandler(400)
+def bad_request(error):
+    return jsonify({"error": error.description}), 400
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    # A file over its own limit says so; otherwise the whole body was over the route's limit
+    if error.description != RequestEntityTooLarge.description:
+        return jsonify({"error": error.description}), 413
+    return jsonify({"error": f"Upload too large. Maximum {request.max_content_length // (1024 * 1024)}MB."}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
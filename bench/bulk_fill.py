@@ -0,0 +1,141 @@
+"""Benchmark /bulk-fill against filling the same rows one record at a time.
+
+    python bench/bulk_fill.py 1000                 # synthetic 3-page, 9-field form
+    python bench/bulk_fill.py 200 --pdf heavy.pdf  # your own template
+    python bench/bulk_fill.py 200 --mode loop      # /upload-pdf + /generate-pdf per row
+
+Requests go through the Flask test client, so the numbers cover parsing,
+the PDF worker pool and ZIP streaming but not the network. Set PDF_WORKERS
+and TEMPLATE_REGISTRY_PATH in the environment as for the server.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2
+from PyPDF2.generic import (ArrayObject, BooleanObject, DecodedStreamObject, DictionaryObject, FloatObject,
+                            NameObject, TextStringObject)
+
+import app as server
+
+
+def make_form(path: str, pages: int = 3, fields_per_page: int = 3):
+    """A blank AcroForm with text fields and one checkbox per page."""
+    writer = PyPDF2.PdfWriter()
+    fields = ArrayObject()
+    for p in range(pages):
+        writer.add_blank_page(612, 792)
+        page = writer.pages[-1]
+        annots = ArrayObject()
+        for i in range(fields_per_page):
+            checkbox = i == fields_per_page - 1
+            annot = DictionaryObject({
+                NameObject('/Type'): NameObject('/Annot'),
+                NameObject('/Subtype'): NameObject('/Widget'),
+                NameObject('/FT'): NameObject('/Btn' if checkbox else '/Tx'),
+                NameObject('/T'): TextStringObject(f"p{p + 1}_agree" if checkbox else f"p{p + 1}_field_{i}"),
+                NameObject('/Rect'): ArrayObject([FloatObject(72), FloatObject(600 - 40 * i),
+                                                  FloatObject(300), FloatObject(620 - 40 * i)]),
+                NameObject('/DA'): TextStringObject('/Helv 0 Tf 0 g'),
+            })
+            if checkbox:
+                states = {}
+                for state in ('/Yes', '/Off'):
+                    stream = DecodedStreamObject()
+                    stream.set_data(b'')
+                    states[NameObject(state)] = writer._add_object(stream)
+                annot[NameObject('/V')] = NameObject('/Off')
+                annot[NameObject('/AS')] = NameObject('/Off')
+                annot[NameObject('/AP')] = DictionaryObject({NameObject('/N'): DictionaryObject(states)})
+            ref = writer._add_object(annot)
+            annots.append(ref)
+            fields.append(ref)
+        page[NameObject('/Annots')] = annots
+    writer._root_object[NameObject('/AcroForm')] = writer._add_object(DictionaryObject({
+        NameObject('/Fields'): fields, NameObject('/NeedAppearances'): BooleanObject(True)}))
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def row_answers(i: int, fields: list) -> dict:
+    return {name: ('yes' if 'agree' in name else f'v{i}_{name}') for name in fields}
+
+
+def rows_csv(n: int, fields: list) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fields + ['name'])
+    writer.writeheader()
+    for i in range(n):
+        writer.writerow({**row_answers(i, fields), 'name': f'Person {i}'})
+    return out.getvalue().encode()
+
+
+def run_bulk(client, pdf: bytes, fields: list, n: int):
+    body = rows_csv(n, fields)
+    started = time.perf_counter()
+    response = client.post('/bulk-fill', data={
+        'template': (io.BytesIO(pdf), 'template.pdf'),
+        'rows': (io.BytesIO(body), 'rows.csv'),
+        'filename_column': 'name'
+    }, content_type='multipart/form-data', buffered=False)
+    first_chunk = None
+    archive = io.BytesIO()
+    for chunk in response.response:
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - started
+        archive.write(chunk)
+    elapsed = time.perf_counter() - started
+
+    if response.status_code != 200:
+        sys.exit(f"/bulk-fill returned {response.status_code}: {archive.getvalue()[:200]!r}")
+    entries = zipfile.ZipFile(archive)
+    summary = json.loads(entries.read('report.jsonl').decode().splitlines()[-1])
+    print(f"bulk: {n} rows in {elapsed:.2f}s ({n / elapsed:.0f} rows/s), first chunk after "
+          f"{first_chunk * 1000:.0f}ms, ZIP {archive.tell() / 1e6:.1f}MB")
+    print(f"report: {summary}")
+
+
+def run_loop(client, pdf: bytes, fields: list, n: int):
+    started = time.perf_counter()
+    for i in range(n):
+        response = client.post('/upload-pdf', data={'file': (io.BytesIO(pdf), 'form.pdf')},
+                               content_type='multipart/form-data')
+        session = server.get_session(response.get_json()['session_id'])
+        session.answers.update(row_answers(i, fields))
+        server.save_session(session)
+        client.post('/generate-pdf', json={'session_id': session.session_id}).get_data()
+    elapsed = time.perf_counter() - started
+    print(f"loop: {n} rows in {elapsed:.2f}s ({n / elapsed:.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--pdf', help="template to fill (default: a synthetic 3-page form)")
+    parser.add_argument('--mode', choices=('bulk', 'loop'), default='bulk')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp, 'form.pdf')
+            make_form(pdf_path)
+        with open(pdf_path, 'rb') as f:
+            pdf = f.read()
+        fields = list(PyPDF2.PdfReader(pdf_path).get_fields() or {})
+
+    client = server.app.test_client()
+    client.get('/health')  # start the worker pool before timing
+    (run_bulk if args.mode == 'bulk' else run_loop)(client, pdf, fields, args.rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark FieldClassifier over the labelled field names in tests/fixtures/field_names.py.
+
+Reports how many fields get a local question (and how many of those are
+right), how many are left for the AI, and per-field latency percentiles of
+FieldClassifier.question:
+
+    python bench/field_classifier.py
+    python bench/field_classifier.py --repeat 500
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from app import QUESTION_BATCH_SIZE, FieldClassifier
+from fixtures.field_names import CORPUS
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help="calls per field; the mean is its latency")
+    args = parser.parse_args()
+
+    fields = [{'name': name, 'type': ftype} for name, ftype, _expected in CORPUS]
+    recognisable = sum(1 for *_rest, expected in CORPUS if expected)
+    hits = correct = 0
+    for field, (_name, _type, expected) in zip(fields, CORPUS):
+        concept = FieldClassifier.classify(field)
+        if concept:
+            hits += 1
+            correct += concept == expected
+    to_ai = len(fields) - hits
+
+    latencies = []
+    for field in fields:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            FieldClassifier.question(field)
+        latencies.append((time.perf_counter() - started) / args.repeat * 1e6)
+
+    print(f"fields:        {len(fields)} ({recognisable} with a common meaning)")
+    print(f"local:         {hits} ({hits / len(fields):.0%} of all, {correct / recognisable:.0%} of recognisable), "
+          f"wrong {hits - correct}")
+    print(f"sent to AI:    {to_ai} fields, {math.ceil(to_ai / QUESTION_BATCH_SIZE)} batched requests "
+          f"(QUESTION_BATCH_SIZE={QUESTION_BATCH_SIZE}) instead of {math.ceil(len(fields) / QUESTION_BATCH_SIZE)}")
+    print("latency (us):  " + "  ".join(
+        f"p{int(q * 100)} {percentile(latencies, q):.1f}" for q in (0.5, 0.9, 0.99)
+    ) + f"  max {max(latencies):.1f}")
+
+
+if __name__ == '__main__':
+    main()
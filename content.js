@@ -3,6 +3,7 @@
 
 const API_BASE = 'http://localhost:8004';
 const DEBUG = true;
+const FORM_SCHEMA_VERSION = 1;
 
 function debugLog(message, data = null) {
     if (DEBUG) {
@@ -27,9 +28,9 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
                 .catch(error => sendResponse({ success: false, error: error.message }));
             return true;
             
-        case 'extractFormHTML':
-            const html = extractFormHTML();
-            sendResponse({ success: true, data: html });
+        case 'extractFormSchema':
+            const schema = buildFormSchema();
+            sendResponse({ success: true, data: schema });
             break;
             
         default:
@@ -82,6 +83,7 @@ async function detectAndAnalyzeForms() {
 // Extract all fillable fields from a form
 function extractFormFields(form) {
     const fields = [];
+    const headings = Array.from(form.querySelectorAll('h1, h2, h3, h4, h5, h6'));
     
     // Input fields
     form.querySelectorAll('input[type="text"], input[type="email"], input[type="number"], input[type="tel"], input[type="password"], input[type="date"]').forEach(input => {
@@ -90,6 +92,7 @@ function extractFormFields(form) {
             name: input.name || input.id || `field_${fields.length}`,
             type: 'text',
             label: label,
+            ...getFieldContext(input, headings),
             id: input.id,
             className: input.className,
             value: input.value,
@@ -104,6 +107,7 @@ function extractFormFields(form) {
             name: textarea.name || textarea.id || `field_${fields.length}`,
             type: 'textarea',
             label: label,
+            ...getFieldContext(textarea, headings),
             id: textarea.id,
             className: textarea.className,
             value: textarea.value,
@@ -123,6 +127,7 @@ function extractFormFields(form) {
             name: select.name || select.id || `field_${fields.length}`,
             type: 'select',
             label: label,
+            ...getFieldContext(select, headings),
             id: select.id,
             className: select.className,
             value: select.value,
@@ -140,6 +145,7 @@ function extractFormFields(form) {
                 name: name,
                 type: 'checkbox',
                 label: label,
+                ...getFieldContext(checkbox, headings),
                 options: []
             };
         }
@@ -164,6 +170,7 @@ function extractFormFields(form) {
                 name: name,
                 type: 'radio',
                 label: label,
+                ...getFieldContext(radio, headings),
                 options: []
             };
         }
@@ -201,6 +208,36 @@ function getFieldLabel(input) {
     return input.placeholder || input.name || 'Unknown field';
 }
 
+// Fieldset legend and the closest heading above a field inside its form
+function getFieldContext(input, headings) {
+    const context = {};
+
+    const legend = input.closest('fieldset')?.querySelector('legend');
+    if (legend && legend.textContent.trim()) {
+        context.group = legend.textContent.trim();
+    }
+
+    const heading = precedingHeading(input, headings);
+    if (heading) {
+        context.heading = heading;
+    }
+
+    return context;
+}
+
+// Text of the last heading in `headings` that comes before `element`
+function precedingHeading(element, headings) {
+    let text = '';
+    for (const heading of headings) {
+        if (heading.compareDocumentPosition(element) & Node.DOCUMENT_POSITION_FOLLOWING) {
+            text = heading.textContent.trim() || text;
+        } else {
+            break;
+        }
+    }
+    return text;
+}
+
 // Generate a CSS selector for a form element
 function generateSelector(element) {
     if (element.id) {
@@ -226,18 +263,56 @@ function generateSelector(element) {
     return names.join(' > ');
 }
 
-// Extract form HTML for sending to backend
-function extractFormHTML() {
-    debugLog('Extracting form HTML...');
-    
-    const forms = document.querySelectorAll('form');
-    let formHTML = '';
-    
-    forms.forEach(form => {
-        formHTML += form.outerHTML + '\n';
+// Build the compact, versioned form schema sent to the backend in place of
+// raw HTML: fields with labels, options, fieldset groups and nearby headings
+function buildFormSchema() {
+    debugLog('Building form schema...');
+
+    const pageHeadings = Array.from(document.querySelectorAll('h1, h2, h3, h4, h5, h6'));
+    const forms = [];
+
+    document.querySelectorAll('form').forEach((form, index) => {
+        const fields = extractFormFields(form).fields.map(compactField);
+        if (fields.length === 0) {
+            return;
+        }
+
+        const schemaForm = {
+            name: form.getAttribute('name') || `Form ${index + 1}`,
+            fields: fields
+        };
+        const heading = precedingHeading(form, pageHeadings);
+        if (heading) {
+            schemaForm.heading = heading;
+        }
+        forms.push(schemaForm);
     });
-    
-    return formHTML;
+
+    const schema = {
+        version: FORM_SCHEMA_VERSION,
+        title: document.title,
+        forms: forms
+    };
+
+    debugLog('Form schema:', schema);
+    return schema;
+}
+
+// Keep only what the backend uses, dropping empty values
+function compactField(field) {
+    const compact = { name: field.name, type: field.type };
+
+    if (field.label && field.label !== field.name) compact.label = field.label;
+    if (field.group) compact.group = field.group;
+    if (field.heading) compact.heading = field.heading;
+    if (field.options && field.options.length > 0) {
+        compact.options = field.options.map(option => {
+            const label = (option.label || '').trim();
+            return label && label !== option.value ? { value: option.value, label } : { value: option.value };
+        });
+    }
+
+    return compact;
 }
 
 // ============================================================================
@@ -1,6 +1,7 @@
 // API Configuration
 const API_BASE = 'http://localhost:8004';
 const DEBUG = true;
+const GZIP_MIN_BYTES = 1024;
 
 // State Management
 let currentMode = null; // 'pdf' or 'website'
@@ -10,6 +11,7 @@ let uploadedPdfFile = null;
 let totalFields = 0;
 let answeredFields = 0;
 let detectedFormFields = [];
+let currentQuestion = null; // the question group on screen
 
 // Debug Logger
 function debugLog(message, data = null) {
@@ -202,6 +204,7 @@ function resetState() {
     totalFields = 0;
     answeredFields = 0;
     detectedFormFields = [];
+    currentQuestion = null;
     chatContainer.innerHTML = '';
     progressFill.style.width = '0%';
     progressText.textContent = '0% Complete';
@@ -244,6 +247,7 @@ async function startPdfFormFilling() {
         // Upload PDF
         const formData = new FormData();
         formData.append('file', uploadedPdfFile);
+        formData.append('profile_id', await getProfileId());
 
         debugLog('Uploading PDF...');
         const uploadResponse = await fetch(`${API_BASE}/upload-pdf`, {
@@ -266,33 +270,18 @@ async function startPdfFormFilling() {
             return;
         }
 
-        // Start session
-        const startResponse = await fetch(`${API_BASE}/start-session`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ session_id: sessionId })
-        });
-
-        if (!startResponse.ok) {
-            throw new Error(`Session start failed: ${startResponse.status}`);
-        }
-
-        const startData = await startResponse.json();
-        debugLog('Session started:', startData);
-
         currentSessionId = sessionId;
         answeredFields = 0;
 
-        // Switch to chat view
+        // Switch to chat view so the first question can stream in
         showSection('chatSection');
         addMessageToChat(`🎯 Found ${totalFields} fields in your PDF form!`, 'ai');
+        showPrefilled(uploadData.prefilled_fields);
 
-        // Display first question
-        if (startData.question) {
-            displayQuestion(startData.question);
-        }
+        // Start session; related fields are asked together
+        const startData = await requestQuestion('/start-group-session-stream', { session_id: sessionId });
+        debugLog('Session started:', startData);
+        showNextQuestion(startData);
 
     } catch (error) {
         debugLog('Error in startPdfFormFilling:', error);
@@ -335,25 +324,17 @@ async function scanWebsiteForm() {
             return;
         }
 
-        // Extract form HTML for backend processing
-        const htmlResponse = await chrome.tabs.sendMessage(tab.id, { action: 'extractFormHTML' });
+        // Extract the compact form schema for backend processing
+        const schemaResponse = await chrome.tabs.sendMessage(tab.id, { action: 'extractFormSchema' });
         
-        if (!htmlResponse.success) {
-            throw new Error('Failed to extract form HTML');
+        if (!schemaResponse.success) {
+            throw new Error('Failed to extract form schema');
         }
 
-        const formHTML = htmlResponse.data;
-
         // Send to backend for analysis
         const analysisResponse = await fetch(`${API_BASE}/analyze-website-form`, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ 
-                form_html: formHTML,
-                forms_data: formData.forms
-            })
+            ...await jsonRequestInit({ form_schema: schemaResponse.data, profile_id: await getProfileId() })
         });
 
         if (!analysisResponse.ok) {
@@ -387,17 +368,16 @@ async function startWebsiteFormFilling() {
         // Get active tab
         const [tab] = await chrome.tabs.query({ active: true, currentWindow: true });
         
-        // Extract form HTML
-        const htmlResponse = await chrome.tabs.sendMessage(tab.id, { action: 'extractFormHTML' });
-        const formHTML = htmlResponse.data;
+        // Extract the compact form schema
+        const schemaResponse = await chrome.tabs.sendMessage(tab.id, { action: 'extractFormSchema' });
+        if (!schemaResponse.success) {
+            throw new Error('Failed to extract form schema');
+        }
 
         // Create session
         const sessionResponse = await fetch(`${API_BASE}/analyze-website-form`, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ form_html: formHTML })
+            ...await jsonRequestInit({ form_schema: schemaResponse.data, profile_id: await getProfileId() })
         });
 
         if (!sessionResponse.ok) {
@@ -408,31 +388,17 @@ async function startWebsiteFormFilling() {
         currentSessionId = sessionData.session_id;
         totalFields = sessionData.total_fields;
 
-        // Start conversation
-        const startResponse = await fetch(`${API_BASE}/start-session`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ session_id: currentSessionId })
-        });
-
-        if (!startResponse.ok) {
-            throw new Error(`Start session failed: ${startResponse.status}`);
-        }
-
-        const startData = await startResponse.json();
         answeredFields = 0;
 
-        // Switch to chat
+        // Switch to chat so the first question can stream in
         showSection('chatSection');
         addMessageToChat(`🌐 Ready to fill your website form!`, 'ai');
         addMessageToChat(`📝 Found ${totalFields} fields. Let's get started!`, 'system');
+        showPrefilled(sessionData.prefilled_fields);
 
-        // Display first question
-        if (startData.question) {
-            displayQuestion(startData.question);
-        }
+        // Start conversation; related fields are asked together
+        const startData = await requestQuestion('/start-group-session-stream', { session_id: currentSessionId });
+        showNextQuestion(startData);
 
     } catch (error) {
         debugLog('Error in startWebsiteFormFilling:', error);
@@ -462,33 +428,15 @@ async function sendAnswer() {
     hideError();
 
     try {
-        const response = await fetch(`${API_BASE}/next-question`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                session_id: currentSessionId,
-                answer: answer
-            })
+        const data = await requestQuestion('/next-group-stream', {
+            session_id: currentSessionId,
+            answers: { [currentQuestion.field_name]: answer }
         });
-
-        if (!response.ok) {
-            const errorText = await response.text();
-            throw new Error(`Server error: ${response.status}`);
-        }
-
-        const data = await response.json();
         debugLog('Next question response:', data);
 
         answeredFields++;
         updateProgress();
-
-        if (data.completed) {
-            showCompletion();
-        } else if (data.question) {
-            displayQuestion(data.question);
-        }
+        showNextQuestion(data);
 
     } catch (error) {
         debugLog('Error in sendAnswer:', error);
@@ -498,9 +446,132 @@ async function sendAnswer() {
     }
 }
 
+// Random id for this browser's answer profile; the backend uses it to fill in
+// answers given on earlier forms (when answer profiles are enabled)
+async function getProfileId() {
+    const stored = await chrome.storage.local.get('profileId');
+    if (stored.profileId) {
+        return stored.profileId;
+    }
+    const profileId = crypto.randomUUID();
+    await chrome.storage.local.set({ profileId });
+    return profileId;
+}
+
+function showPrefilled(prefilledFields) {
+    if (!prefilledFields || !prefilledFields.length) return;
+    answeredFields += prefilledFields.length;
+    updateProgress();
+    addMessageToChat(`📇 Filled ${prefilledFields.length} fields from your earlier answers.`, 'system');
+}
+
+// Headers and body for a JSON POST, gzip-compressed when large enough to matter
+async function jsonRequestInit(payload) {
+    const json = JSON.stringify(payload);
+
+    if (typeof CompressionStream === 'undefined' || json.length < GZIP_MIN_BYTES) {
+        return { headers: { 'Content-Type': 'application/json' }, body: json };
+    }
+
+    const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+    const body = await new Response(stream).arrayBuffer();
+    debugLog(`Compressed request body ${json.length} -> ${body.byteLength} bytes`);
+
+    return {
+        headers: { 'Content-Type': 'application/json', 'Content-Encoding': 'gzip' },
+        body
+    };
+}
+
+// POST to a question-group stream endpoint, showing the AI's draft of a
+// single field's question as it streams in (Server-Sent Events). Resolves
+// with { session_id, question } or { completed: true }.
+async function requestQuestion(path, body) {
+    const response = await fetch(`${API_BASE}${path}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(body)
+    });
+
+    if (!response.ok) {
+        throw new Error(`Server error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let draft = '';
+    let draftMessage = null;
+    let result = {};
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const { event, data } = parseSSEEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+
+            if (event === 'token') {
+                draft += data.text;
+                const preview = draftQuestionText(draft);
+                if (preview && !draftMessage) {
+                    showLoading(false);
+                    draftMessage = addMessageToChat(preview, 'ai');
+                } else if (preview) {
+                    draftMessage.textContent = '🤖 ' + preview;
+                }
+            } else if (event === 'question' || event === 'completed') {
+                result = data;
+            }
+        }
+    }
+
+    // The final question replaces the draft
+    if (draftMessage) {
+        draftMessage.remove();
+    }
+    return result;
+}
+
+function parseSSEEvent(rawEvent) {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+// Pull the question line out of a partial "Question: ...\nHelp: ..." completion
+function draftQuestionText(draft) {
+    const start = draft.indexOf('Question:');
+    if (start === -1) return '';
+    const text = draft.slice(start + 'Question:'.length);
+    const end = text.indexOf('\n');
+    return (end === -1 ? text : text.slice(0, end)).trim();
+}
+
+function showNextQuestion(data) {
+    if (data.completed) {
+        showCompletion();
+    } else if (data.question) {
+        displayQuestion(data.question);
+    }
+}
+
 function displayQuestion(question) {
     const questionText = question.text || question.question;
     const progress = question.current && question.total ? `(${question.current}/${question.total}) ` : '';
+    currentQuestion = question;
     
     addMessageToChat(progress + questionText, 'ai');
     
@@ -508,6 +579,14 @@ function displayQuestion(question) {
         addMessageToChat(`💡 ${question.explanation}`, 'system');
     }
 
+    // Several fields are answered in one small form instead of the chat box
+    const grouped = (question.fields || []).length > 1;
+    answerInput.disabled = grouped;
+    sendBtn.disabled = grouped;
+    if (grouped) {
+        addGroupForm(question);
+    }
+
     // Check if image upload needed
     if (question.field_type === 'image' || 
         questionText.toLowerCase().includes('signature') || 
@@ -518,6 +597,113 @@ function displayQuestion(question) {
     }
 }
 
+// One input per field of a question group; checkboxes become tick boxes and
+// fields with options become selects (or tick boxes for checkbox lists)
+function addGroupForm(question) {
+    const form = document.createElement('form');
+    form.className = 'chat-message ai group-form';
+
+    question.fields.forEach(field => {
+        const row = document.createElement('label');
+        row.className = 'group-field';
+        const caption = document.createElement('span');
+        caption.textContent = field.label;
+        let input;
+
+        if (field.type === 'checkbox' && field.options) {
+            input = document.createElement('span');
+            field.options.forEach(option => {
+                const box = document.createElement('input');
+                box.type = 'checkbox';
+                box.name = field.name;
+                box.value = option.value;
+                input.append(box, ` ${option.label} `);
+            });
+            row.append(caption, input);
+        } else if (field.type === 'checkbox') {
+            input = document.createElement('input');
+            input.type = 'checkbox';
+            input.name = field.name;
+            input.checked = /^(yes|true|on|1)$/i.test(field.value || '');
+            row.classList.add('group-checkbox');
+            row.append(input, caption);
+        } else if (field.options) {
+            input = document.createElement('select');
+            input.name = field.name;
+            input.append(new Option('', ''));
+            field.options.forEach(option => input.append(new Option(option.label, option.value)));
+            input.value = field.value || '';
+            row.append(caption, input);
+        } else {
+            input = document.createElement('input');
+            input.type = 'text';
+            input.name = field.name;
+            input.value = field.value || '';
+            row.append(caption, input);
+        }
+        form.appendChild(row);
+    });
+
+    const submit = document.createElement('button');
+    submit.type = 'submit';
+    submit.className = 'send-btn';
+    submit.textContent = 'Send';
+    form.appendChild(submit);
+
+    form.addEventListener('submit', (event) => {
+        event.preventDefault();
+        submitGroupForm(form, question);
+    });
+    chatContainer.appendChild(form);
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+}
+
+async function submitGroupForm(form, question) {
+    const answers = {};
+    question.fields.forEach(field => {
+        const inputs = Array.from(form.querySelectorAll(`[name="${CSS.escape(field.name)}"]`));
+        if (field.type === 'checkbox' && field.options) {
+            answers[field.name] = inputs.filter(box => box.checked).map(box => box.value);
+        } else if (field.type === 'checkbox') {
+            answers[field.name] = inputs[0].checked ? 'yes' : 'no';
+        } else {
+            answers[field.name] = inputs[0].value.trim();
+        }
+    });
+
+    // Echo what was given: ticked boxes by label, other answers as "label: value"
+    const summary = question.fields.map(field => {
+        const value = answers[field.name];
+        if (Array.isArray(value)) return value.length ? `${field.label}: ${value.join(', ')}` : '';
+        if (field.type === 'checkbox') return value === 'yes' ? field.label : '';
+        return value ? `${field.label}: ${value}` : '';
+    }).filter(Boolean);
+    form.querySelectorAll('input, select, button').forEach(element => { element.disabled = true; });
+    addMessageToChat(summary.join(', ') || '(none)', 'user');
+
+    showLoading(true);
+    hideError();
+
+    try {
+        const data = await requestQuestion('/next-group-stream', {
+            session_id: currentSessionId,
+            answers: answers
+        });
+        debugLog('Next question response:', data);
+
+        answeredFields += question.fields.length;
+        updateProgress();
+        showNextQuestion(data);
+
+    } catch (error) {
+        debugLog('Error in submitGroupForm:', error);
+        form.querySelectorAll('input, select, button').forEach(element => { element.disabled = false; });
+        showError(error.message || '❌ Something went wrong. Please try again.');
+    } finally {
+        showLoading(false);
+    }
+}
+
 // ============================================================================
 // IMAGE UPLOAD
 // ============================================================================
@@ -526,14 +712,15 @@ async function handleImageUpload(event) {
     const file = event.target.files[0];
     if (!file) return;
 
-    const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif'];
+    const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/webp'];
     if (!validTypes.includes(file.type)) {
-        showError('❌ Please upload a valid image file (PNG, JPG, JPEG, GIF)');
+        showError('❌ Please upload a valid image file (PNG, JPG, JPEG, GIF, WebP)');
         return;
     }
 
-    if (file.size > 5 * 1024 * 1024) {
-        showError('❌ Image file is too large. Max 5MB.');
+    // Phone photos are fine: the server crops and shrinks them
+    if (file.size > 20 * 1024 * 1024) {
+        showError('❌ Image file is too large. Max 20MB.');
         return;
     }
 
@@ -545,8 +732,9 @@ async function handleImageUpload(event) {
         const formData = new FormData();
         formData.append('file', file);
 
+        const fieldName = encodeURIComponent(currentQuestion ? currentQuestion.field_name : 'signature');
         const response = await fetch(
-            `${API_BASE}/upload-image?session_id=${currentSessionId}&field_name=signature`,
+            `${API_BASE}/upload-image?session_id=${currentSessionId}&field_name=${fieldName}`,
             {
                 method: 'POST',
                 body: formData
@@ -577,25 +765,11 @@ async function handleImageUpload(event) {
 async function sendAnswerDirect(answer) {
     showLoading(true);
     try {
-        const response = await fetch(`${API_BASE}/next-question`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                session_id: currentSessionId,
-                answer: answer
-            })
+        const data = await requestQuestion('/next-group-stream', {
+            session_id: currentSessionId,
+            answers: { [currentQuestion.field_name]: answer }
         });
-
-        if (response.ok) {
-            const data = await response.json();
-            if (data.completed) {
-                showCompletion();
-            } else if (data.question) {
-                displayQuestion(data.question);
-            }
-        }
+        showNextQuestion(data);
     } catch (error) {
         debugLog('Error in sendAnswerDirect:', error);
     } finally {
@@ -689,6 +863,14 @@ async function downloadPDF() {
 
         addMessageToChat('✅ PDF downloaded successfully!', 'success');
 
+        const unfilled = parseUnfilledFields(response.headers.get('X-Unfilled-Fields'));
+        const names = Object.keys(unfilled);
+        if (names.length > 0) {
+            debugLog('Unfilled fields:', unfilled);
+            const details = names.map(name => `${name} (${unfilled[name]})`).join(', ');
+            addMessageToChat(`⚠️ ${names.length} answer(s) could not be written to the PDF: ${details}`, 'system');
+        }
+
     } catch (error) {
         debugLog('Error in downloadPDF:', error);
         showError('❌ Failed to generate PDF. Please try again.');
@@ -697,6 +879,16 @@ async function downloadPDF() {
     }
 }
 
+function parseUnfilledFields(header) {
+    if (!header) return {};
+    try {
+        return JSON.parse(header) || {};
+    } catch (error) {
+        debugLog('Bad X-Unfilled-Fields header:', header);
+        return {};
+    }
+}
+
 // ============================================================================
 // UI HELPERS
 // ============================================================================
@@ -729,6 +921,7 @@ function addMessageToChat(message, type) {
     messageDiv.textContent = label + message;
     chatContainer.appendChild(messageDiv);
     chatContainer.scrollTop = chatContainer.scrollHeight;
+    return messageDiv;
 }
 
 function updateProgress() {
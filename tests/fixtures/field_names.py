@@ -0,0 +1,90 @@
+"""Field names seen on real forms (HTML autocomplete, IRS/USCIS/ACORD PDFs, intake and
+signup forms), each with the concept a person would say it asks for (None = needs wording)."""
+CORPUS = [
+    # HTML signup / checkout forms
+    ("first_name", "text", "first_name"), ("firstName", "text", "first_name"), ("fname", "text", "first_name"),
+    ("given-name", "text", "first_name"), ("FirstName", "text", "first_name"), ("first-name", "text", "first_name"),
+    ("last_name", "text", "last_name"), ("lastName", "text", "last_name"), ("lname", "text", "last_name"),
+    ("family-name", "text", "last_name"), ("surname", "text", "last_name"), ("LastName", "text", "last_name"),
+    ("middle_name", "text", "middle_name"), ("additional-name", "text", None), ("mi", "text", "middle_initial"),
+    ("name", "text", "full_name"), ("full_name", "text", "full_name"), ("fullName", "text", "full_name"),
+    ("your-name", "text", "full_name"), ("customer_name", "text", None),
+    ("email", "email", "email"), ("e-mail", "email", "email"), ("emailAddress", "email", "email"),
+    ("user_email", "email", None), ("email_confirm", "email", None), ("confirm_email", "email", None),
+    ("your-email", "email", "email"), ("contact_email", "email", "email"),
+    ("phone", "tel", "phone"), ("tel", "tel", "phone"), ("telephone", "tel", "phone"), ("phone_number", "tel", "phone"),
+    ("phoneNumber", "tel", "phone"), ("mobile", "tel", "phone"), ("cell_phone", "tel", "phone"),
+    ("tel-national", "tel", None), ("work_phone", "tel", None), ("home_phone", "tel", "phone"),
+    ("fax", "tel", "fax"), ("bday", "date", "date_of_birth"), ("dob", "date", "date_of_birth"),
+    ("date_of_birth", "date", "date_of_birth"), ("birthdate", "date", "date_of_birth"), ("birthday", "date", "date_of_birth"),
+    ("bday-day", "text", None), ("bday-month", "text", None), ("bday-year", "text", None),
+    ("age", "number", "age"), ("gender", "select", "gender"), ("sex", "radio", "gender"),
+    ("address", "text", "address"), ("address1", "text", "street"), ("address2", "text", "address_line2"),
+    ("address-line1", "text", "street"), ("address-line2", "text", "address_line2"), ("street-address", "text", "street"),
+    ("street", "text", "street"), ("apt", "text", "address_line2"), ("suite", "text", "address_line2"),
+    ("city", "text", "city"), ("town", "text", "city"), ("address-level2", "text", None), ("address-level1", "text", None),
+    ("state", "select", "state"), ("province", "text", "state"), ("region", "text", None),
+    ("zip", "text", "zip"), ("zipcode", "text", "zip"), ("zip_code", "text", "zip"), ("postal-code", "text", "zip"),
+    ("postcode", "text", "zip"), ("postalCode", "text", "zip"), ("country", "select", "country"),
+    ("country-name", "text", None), ("billing_address", "text", None), ("shipping_address", "text", None),
+    ("billing_city", "text", None), ("shipping_zip", "text", None), ("organization", "text", "company"),
+    ("company", "text", "company"), ("company_name", "text", "company"), ("employer", "text", "company"),
+    ("job_title", "text", "job_title"), ("occupation", "text", "job_title"), ("organization-title", "text", None),
+    ("website", "url", "website"), ("url", "url", "website"), ("username", "text", "username"), ("password", "password", None),
+    ("new-password", "password", None), ("cc-name", "text", None), ("cc-number", "text", None), ("cc-exp", "text", None),
+    ("coupon_code", "text", None), ("message", "textarea", None), ("comments", "textarea", None), ("subject", "text", None),
+    ("how_did_you_hear", "select", None), ("newsletter", "checkbox", None), ("terms", "checkbox", None),
+    ("agree", "checkbox", "agree"), ("accept_terms", "checkbox", "agree"), ("i_agree", "checkbox", "agree"),
+    ("consent", "checkbox", "agree"), ("remember_me", "checkbox", None), ("nationality", "select", "nationality"),
+    ("citizenship", "select", "nationality"), ("marital_status", "select", "marital_status"),
+    ("passport_number", "text", "passport_number"), ("passport_expiry", "date", None),
+    ("drivers_license", "text", "drivers_license"), ("dl_number", "text", "drivers_license"),
+    ("ssn", "text", "ssn"), ("social_security_number", "text", "ssn"), ("ssn_last4", "text", None),
+    ("place_of_birth", "text", "place_of_birth"), ("emergency_contact_name", "text", None),
+    ("emergency_contact_phone", "tel", None), ("spouse_first_name", "text", None), ("spouse_last_name", "text", None),
+    ("guardian_name", "text", None), ("student_id", "text", None), ("employee_id", "text", None),
+    ("start_date", "date", None), ("end_date", "date", None), ("salary", "text", None), ("resume", "file", None),
+    ("linkedin", "url", None), ("github", "url", None), ("cover_letter", "textarea", None),
+    ("referral_code", "text", None), ("promo", "text", None), ("quantity", "number", None),
+    # Generic AcroForm PDFs (names as PyPDF2 reports them)
+    ("Name", "text", "full_name"), ("Date", "text", None), ("Signature", "text", "signature"), ("Address", "text", "address"),
+    ("City", "text", "city"), ("State", "text", "state"), ("Zip", "text", "zip"), ("ZIP Code", "text", "zip"),
+    ("City State Zip", "text", None), ("CityStateZip", "text", None), ("Phone", "text", "phone"),
+    ("Phone Number", "text", "phone"), ("Email", "text", "email"), ("Email Address", "text", "email"),
+    ("DOB", "text", "date_of_birth"), ("Date of Birth", "text", "date_of_birth"), ("SSN", "text", "ssn"),
+    ("Social Security Number", "text", "ssn"), ("Soc Sec No", "text", None), ("First Name", "text", "first_name"),
+    ("Last Name", "text", "last_name"), ("Middle Initial", "text", "middle_initial"), ("MI", "text", "middle_initial"),
+    ("Print Name", "text", "full_name"), ("Printed Name", "text", "full_name"), ("Date Signed", "text", "signature_date"),
+    ("Signature Date", "text", "signature_date"), ("Sign Here", "text", "signature"), ("Applicant Signature", "text", "signature"),
+    ("Signature of Applicant", "text", "signature"), ("Parent Signature", "text", None),
+    ("Name of Employer", "text", None), ("Employer Name", "text", "company"), ("Employer Address", "text", None),
+    ("Occupation", "text", "job_title"), ("Home Phone", "text", "phone"), ("Work Phone", "text", None),
+    ("Cell Phone", "text", "phone"), ("Fax", "text", "fax"), ("Fax Number", "text", "fax"),
+    ("Street Address", "text", "street"), ("Address Line 1", "text", "street"), ("Address Line 2", "text", "address_line2"),
+    ("Apt", "text", "address_line2"), ("Apt No", "text", None), ("Country", "text", "country"),
+    ("Mailing Address", "text", "address"), ("Home Address", "text", "address"), ("Previous Address", "text", None),
+    ("Sex", "text", "gender"), ("Gender", "text", "gender"), ("Age", "text", "age"), ("Marital Status", "text", "marital_status"),
+    ("Name 2", "text", "full_name"), ("Text1", "text", None), ("Text2", "text", None), ("Text3", "text", None),
+    ("Check Box1", "checkbox", None), ("Check Box2", "checkbox", None), ("Group1", "checkbox", None),
+    ("Dropdown1", "choice", None), ("undefined", "text", None), ("undefined_2", "text", None),
+    ("fill_1", "text", None), ("fill_2", "text", None), ("Button1", "checkbox", None),
+    ("Amount", "text", None), ("Total", "text", None), ("Account Number", "text", None), ("Routing Number", "text", None),
+    ("Policy Number", "text", None), ("Claim Number", "text", None), ("Member ID", "text", None),
+    ("Date of Injury", "text", None), ("Description", "text", None), ("Reason for Visit", "text", None),
+    ("Allergies", "text", None), ("Medications", "text", None), ("Insurance Company", "text", None),
+    ("Insured Name", "text", None), ("Relationship to Patient", "text", None), ("Physician Name", "text", None),
+    ("Patient Name", "text", "full_name"), ("Patient DOB", "text", "date_of_birth"), ("Patient Phone", "text", "phone"),
+    # IRS / USCIS / ACORD field names
+    ("topmostSubform[0].Page1[0].f1_01[0]", "text", None), ("topmostSubform[0].Page1[0].f1_02[0]", "text", None),
+    ("topmostSubform[0].Page1[0].c1_1[0]", "checkbox", None), ("form1[0].#subform[0].Pt1Line1a_FamilyName[0]", "text", None),
+    ("form1[0].#subform[0].Pt1Line1b_GivenName[0]", "text", None), ("Pt2Line3_DateOfBirth", "text", None),
+    ("F[0].P1[0].SSN[0]", "text", "ssn"), ("NamedInsured_FullName_A", "text", None), ("Producer_ContactPerson_FullName_A", "text", None),
+    ("f1_1", "text", None), ("f1_2", "text", None), ("c1_1", "checkbox", None),
+    ("Applicant_FirstName", "text", "first_name"), ("Applicant_LastName", "text", "last_name"),
+    ("Applicant_DOB", "text", "date_of_birth"), ("Applicant_Email", "text", "email"), ("Applicant_Phone", "text", "phone"),
+    ("Applicant_Signature", "text", "signature"), ("CoApplicant_FirstName", "text", None),
+    ("Owner Name", "text", None), ("Business Name", "text", "company"), ("EIN", "text", None), ("Tax ID", "text", None),
+    ("DBA", "text", None), ("Title", "text", None), ("Position", "text", "job_title"), ("Website", "text", "website"),
+    ("Vehicle Year", "text", None), ("VIN", "text", None), ("License Plate", "text", None),
+    ("Drivers License Number", "text", "drivers_license"), ("DL State", "text", None), ("Passport No", "text", None),
+]
@@ -0,0 +1,49 @@
+"""FieldClassifier against the labelled field names in tests/fixtures/field_names.py."""
+import pytest
+
+from app import FieldClassifier
+from fixtures.field_names import CORPUS
+
+
+def test_corpus_has_no_wrong_concepts():
+    wrong = [(name, FieldClassifier.classify({'name': name, 'type': ftype}), expected)
+             for name, ftype, expected in CORPUS
+             if FieldClassifier.classify({'name': name, 'type': ftype}) not in (None, expected)]
+    assert wrong == []
+
+
+def test_corpus_hit_rate():
+    recognisable = [(name, ftype, expected) for name, ftype, expected in CORPUS if expected]
+    hits = sum(1 for name, ftype, expected in recognisable
+               if FieldClassifier.classify({'name': name, 'type': ftype}) == expected)
+    assert hits / len(recognisable) >= 0.95
+
+
+@pytest.mark.parametrize('name, label, expected', [
+    ('address1', None, 'street'),
+    ('address2', None, 'address_line2'),
+    ('Phone #', None, 'phone'),
+    ('Apt No.', None, 'address_line2'),
+    ('Soc Sec No.', None, 'ssn'),
+    ('Passport #', None, 'passport_number'),
+    ('user_name', None, 'username'),
+    ('userId', None, 'username'),
+    ('customer_name', None, None),
+    ('client_phone', None, None),
+    ('no', None, None),
+    ('Text1', 'Date of Birth', 'date_of_birth'),
+    ('first_name', '', 'first_name'),
+    # An unrecognised label is not overridden by a familiar name
+    ('first_name', 'Spouse first name', None),
+    ('phone', 'Emergency contact phone', None),
+    ('dob', 'Child date of birth', None),
+])
+def test_known_mappings(name, label, expected):
+    assert FieldClassifier.classify({'name': name, 'label': label, 'type': 'text'}) == expected
+
+
+def test_type_must_fit_concept():
+    assert FieldClassifier.classify({'name': 'agree', 'type': 'checkbox'}) == 'agree'
+    assert FieldClassifier.classify({'name': 'agree', 'type': 'text'}) is None
+    assert FieldClassifier.classify({'name': 'email', 'type': 'checkbox'}) is None
+
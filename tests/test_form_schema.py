@@ -0,0 +1,40 @@
+"""Website form schemas from the extension: malformed values are dropped, not trusted."""
+import pytest
+
+import app
+
+
+def schema(**field):
+    return {"version": 1, "forms": [{"fields": [{"name": "vessel_name", **field}]}]}
+
+
+@pytest.mark.parametrize('field', [
+    {"label": 5},
+    {"group": ["x"]},
+    {"heading": {"text": "Owner"}},
+    {"type": ["text"]},
+    {"options": "a,b"},
+    {"options": [{"value": 1, "label": ["One"]}]},
+])
+def test_malformed_values_do_not_break_analysis(field):
+    response = app.app.test_client().post('/analyze-website-form', json={"form_schema": schema(**field)})
+    assert response.status_code == 200
+    assert response.get_json()["fields"] == [{"name": "vessel_name", "label": "Vessel Name", "type": "text"}]
+
+
+def test_malformed_forms_and_title_are_ignored():
+    response = app.app.test_client().post('/analyze-website-form', json={"form_schema": {
+        "version": 1, "title": ["Page"], "forms": [{"name": 3, "heading": [1], "fields": "vessel_name"},
+                                                    {"fields": [{"name": "vessel_name"}]}]
+    }})
+    assert response.status_code == 200
+    assert [f["name"] for f in response.get_json()["fields"]] == ["vessel_name"]
+
+
+def test_string_values_are_kept():
+    fields = app.WebFormProcessor.extract_fields_from_schema(schema(
+        type="select", label="Vessel", group="Ship", heading="Owner",
+        options=[{"value": "a", "label": "Alpha"}, {"value": "b"}]
+    ))
+    assert fields == [{"name": "vessel_name", "type": "select", "label": "Vessel", "group": "Ship", "heading": "Owner",
+                       "options": [{"value": "a", "label": "Alpha"}, {"value": "b", "label": "b"}]}]
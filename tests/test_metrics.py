@@ -0,0 +1,17 @@
+"""Metrics text exposition keeps full precision."""
+from app import Metrics
+
+
+def test_large_counters_keep_every_digit():
+    metrics = Metrics()
+    metrics.describe("bb_test_total", "counter", "Test counter")
+    metrics.inc("bb_test_total", 1234567, kind="a")
+    text = metrics.render([("bb_test_gauge", {}, 9876543210), ("bb_test_ratio", {}, 0.1234567891)])
+    assert 'bb_test_total{kind="a"} 1234567\n' in text
+    assert "bb_test_gauge 9876543210\n" in text
+    assert "bb_test_ratio 0.1234567891\n" in text
+
+
+def test_special_floats():
+    text = Metrics().render([("bb_a", {}, float('inf')), ("bb_b", {}, float('nan')), ("bb_c", {}, 2.0)])
+    assert "bb_a +Inf\n" in text and "bb_b NaN\n" in text and "bb_c 2.0\n" in text
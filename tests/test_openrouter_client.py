@@ -0,0 +1,147 @@
+"""OpenRouterClient retries, circuit breaker and half-open trial against a local stub server."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app import OpenRouterClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers each POST with the next queued status (200 once the queue is empty)."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            status, headers = server.replies.pop(0) if server.replies else (200, {})
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.hits = 0
+    server.replies = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/chat"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(max_retries=2, failure_threshold=3, reset_timeout=30, max_concurrency=4):
+    client = OpenRouterClient(max_concurrency, max_retries, 5, failure_threshold, reset_timeout)
+    client.BACKOFF_BASE = 0
+    return client
+
+
+def test_retries_5xx_until_success(stub):
+    stub.replies = [(500, {}), (503, {})]
+    client = make_client()
+    response = client.post(stub.url, {}, {})
+    assert response.status_code == 200
+    assert stub.hits == 3
+    assert client.retries == 2
+    assert client.stats()["circuit"] == "closed"
+
+
+def test_retries_429_honouring_retry_after(stub):
+    stub.replies = [(429, {'Retry-After': '0'})]
+    client = make_client()
+    assert client.post(stub.url, {}, {}).status_code == 200
+    assert stub.hits == 2
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.replies = [(502, {})] * 5
+    client = make_client(max_retries=1)
+    assert client.post(stub.url, {}, {}).status_code == 502
+    assert stub.hits == 2
+    assert client.stats()["consecutive_failures"] == 1
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.replies = [(400, {})]
+    client = make_client()
+    assert client.post(stub.url, {}, {}).status_code == 400
+    assert stub.hits == 1
+
+
+def test_discarded_stream_responses_are_closed(stub, monkeypatch):
+    closed = []
+    original_close = requests.Response.close
+    monkeypatch.setattr(requests.Response, 'close', lambda self: closed.append(self.status_code) or original_close(self))
+    stub.replies = [(503, {}), (429, {'Retry-After': '0'})]
+    response = make_client().post(stub.url, {}, {}, stream=True)
+    assert response.status_code == 200
+    assert closed == [503, 429]
+    response.close()
+
+
+def test_circuit_opens_after_threshold(stub):
+    stub.replies = [(500, {})] * 4
+    client = make_client(max_retries=1, failure_threshold=2)
+    client.post(stub.url, {}, {})
+    client.post(stub.url, {}, {})
+    assert client.stats()["circuit"] == "open"
+
+    assert client.post(stub.url, {}, {}) is None
+    assert stub.hits == 4
+    assert client.short_circuited == 1
+
+
+def test_half_open_trial_success_closes_circuit(stub):
+    stub.replies = [(500, {})] * 2
+    client = make_client(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+    client.post(stub.url, {}, {})
+    client.post(stub.url, {}, {})
+    assert client.post(stub.url, {}, {}) is None
+
+    time.sleep(0.25)
+    assert client.stats()["circuit"] == "half_open"
+    assert client.post(stub.url, {}, {}).status_code == 200
+    assert client.stats()["circuit"] == "closed"
+    assert client.stats()["consecutive_failures"] == 0
+
+
+def test_half_open_trial_failure_reopens_circuit(stub):
+    stub.replies = [(500, {})] * 3
+    client = make_client(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+    client.post(stub.url, {}, {})
+    client.post(stub.url, {}, {})
+
+    time.sleep(0.25)
+    assert client.post(stub.url, {}, {}).status_code == 500
+    assert client.stats()["circuit"] == "open"
+    assert client.post(stub.url, {}, {}) is None
+    assert stub.hits == 3
+
+
+def test_only_one_trial_while_half_open(stub):
+    client = make_client(max_retries=0, failure_threshold=1, reset_timeout=0)
+    client._record(success=False)
+
+    assert client._allow_request() == (True, True)
+    assert client._allow_request() == (False, False)
+    # A call admitted before the circuit opened timing out on a slot is not the trial
+    client._record(success=False, counted=False)
+    assert client._allow_request() == (False, False)
+    client._record(success=False, trial=True, counted=False)
+    assert client._allow_request() == (True, True)
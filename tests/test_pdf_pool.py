@@ -0,0 +1,53 @@
+"""PDFWorkerPool time limits, enforced in the worker (SIGALRM) or, where that is missing, by the parent."""
+import signal
+import threading
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture(params=['worker', 'parent'])
+def pool(request):
+    if request.param == 'worker' and not hasattr(signal, 'SIGALRM'):
+        pytest.skip("no SIGALRM on this platform")
+    pool = app.PDFWorkerPool(2, 8, 1.0)
+    pool.WORKER_ALARM = request.param == 'worker'
+    yield pool
+    if pool._executor is not None:
+        pool._discard(pool._executor, terminate=True)
+
+
+def test_job_within_limit(pool):
+    assert pool.run(sum, [1, 2, 3]) == 6
+
+
+def test_hung_job_times_out_and_others_still_finish(pool):
+    pool.run(sum, [])  # start the workers before timing
+    results = {}
+
+    def run(key, fn, *args):
+        try:
+            results[key] = pool.run(fn, *args)
+        except Exception as e:
+            results[key] = e
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=run, args=('hung', time.sleep, 30)),
+               threading.Thread(target=run, args=('quick', sum, [4, 5]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(results['hung'], TimeoutError)
+    assert results['quick'] == 9
+    assert time.monotonic() - started < 10
+    assert pool.stats()["timeouts"] == 1
+    assert pool.run(sum, [1]) == 1
+
+
+def test_job_errors_are_raised(pool):
+    with pytest.raises(TypeError):
+        pool.run(sum, 5)
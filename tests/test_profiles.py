@@ -0,0 +1,49 @@
+"""Answer profiles through the website form routes: only fields that are clearly the user's are reused."""
+import pytest
+from cryptography.fernet import Fernet
+
+import app
+
+PROFILE_ID = 'profile-0123456789abcdef'
+
+FORM = {
+    "version": 1,
+    "forms": [{"fields": [
+        {"name": "fname", "type": "text", "label": "First name"},
+        {"name": "phone", "type": "tel", "label": "Phone"},
+        {"name": "first_name", "type": "text", "label": "Spouse first name"},
+        {"name": "emergency_phone", "type": "tel", "label": "Emergency contact phone"},
+        {"name": "name_2", "type": "text", "label": "Name 2"},
+    ]}]
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = app.ProfileStore(str(tmp_path / 'profiles.db'), Fernet.generate_key().decode())
+    monkeypatch.setattr(app, 'profile_store', store)
+    return app.app.test_client()
+
+
+def analyze(client):
+    response = client.post('/analyze-website-form', json={"form_schema": FORM, "profile_id": PROFILE_ID})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_other_peoples_fields_are_not_remembered_or_prefilled(client):
+    first = analyze(client)
+    assert first["prefilled_fields"] == []
+
+    session = app.get_session(first["session_id"])
+    session.answers.update({
+        "fname": "Ada", "phone": "555-0100", "first_name": "Charles",
+        "emergency_phone": "555-0199", "name_2": "Byron"
+    })
+    app.save_session(session)
+    assert client.post('/fill-website-form', json={"session_id": session.session_id}).status_code == 200
+
+    second = analyze(client)
+    assert second["prefilled_fields"] == ["fname", "phone"]
+    answers = app.get_session(second["session_id"]).answers
+    assert answers == {"fname": "Ada", "phone": "555-0100"}
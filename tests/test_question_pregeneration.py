@@ -0,0 +1,61 @@
+"""Per-field routes on a form with grouped fields: questions still come from batched background generation."""
+import threading
+
+import pytest
+
+import app
+
+FORM = {"version": 1, "forms": [{"fields": [
+    {"name": "vessel_name", "type": "text", "label": "Vessel name"},
+    *[{"name": f"cargo_{i}", "type": "text", "label": f"Cargo item {i}", "group": "Cargo manifest"} for i in range(6)],
+]}]}
+
+
+@pytest.fixture
+def ai(monkeypatch):
+    calls = {"batches": [], "inline": []}
+    lock = threading.Lock()
+
+    def generate_questions(fields, contexts=None):
+        with lock:
+            calls["batches"].append([f['name'] for f in fields])
+        return {f['name']: {"question": f"Batched {f['name']}?", "explanation": "", "field_name": f['name']}
+                for f in fields}
+
+    def generate_question(field, context=""):
+        with lock:
+            calls["inline"].append(field['name'])
+        return {"question": f"Inline {field['name']}?", "explanation": "", "field_name": field['name']}
+
+    monkeypatch.setattr(app.AIConverter, 'generate_questions', staticmethod(generate_questions))
+    monkeypatch.setattr(app.AIConverter, 'generate_question', staticmethod(generate_question))
+    return calls
+
+
+def test_grouped_fields_are_batched_for_per_field_clients(ai):
+    client = app.app.test_client()
+    session_id = client.post('/analyze-website-form', json={"form_schema": FORM}).get_json()["session_id"]
+    session = app.get_session(session_id)
+    grouped = {group['id'] for group in session.question_groups if group['kind'] != 'field'}
+    assert grouped, "the cargo fields should form a group"
+    for future in list(session.question_futures.values()):
+        future.result(timeout=10)
+    assert ai["batches"] == [["vessel_name"]]
+
+    asked = [client.post('/start-session', json={"session_id": session_id}).get_json()["question"]]
+    for _ in range(6):
+        asked.append(client.post('/next-question', json={"session_id": session_id, "answer": "x"}).get_json()["question"])
+
+    assert [q["field_name"] for q in asked] == ["vessel_name"] + [f"cargo_{i}" for i in range(6)]
+    # The first grouped field is generated inline; the rest come from one background batch
+    assert ai["inline"] == ["cargo_0"]
+    assert ai["batches"][1:] == [[f"cargo_{i}" for i in range(1, 6)]]
+
+
+def test_group_flow_does_not_generate_per_field_questions(ai):
+    client = app.app.test_client()
+    session_id = client.post('/analyze-website-form', json={"form_schema": FORM}).get_json()["session_id"]
+    client.post('/start-group-session', json={"session_id": session_id})
+    client.post('/next-group', json={"session_id": session_id, "answers": {"vessel_name": "x"}})
+    assert ai["inline"] == []
+    assert all("cargo_0" not in batch for batch in ai["batches"])
@@ -0,0 +1,64 @@
+"""AIConverter.stream_question only caches questions from streams that ran to the end."""
+import json
+
+import pytest
+import requests
+
+import app
+
+
+class FakeStream:
+    """A 200 response whose lines are given, optionally cut off by a connection error."""
+
+    status_code = 200
+
+    def __init__(self, lines, cut_off=False):
+        self.lines = lines
+        self.cut_off = cut_off
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        yield from self.lines
+        if self.cut_off:
+            raise requests.ConnectionError("connection reset")
+
+    def close(self):
+        pass
+
+
+def chunk(text=None, finish_reason=None):
+    choice = {"delta": {"content": text} if text else {}, "finish_reason": finish_reason}
+    return "data: " + json.dumps({"choices": [choice]})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(app, 'OPENROUTER_API_KEY', 'test-key')
+    monkeypatch.setattr(app.question_cache, 'get', lambda key: None)
+    monkeypatch.setattr(app.question_cache, 'put', stored.__setitem__)
+    return stored
+
+
+def stream(monkeypatch, response):
+    monkeypatch.setattr(app.openrouter_client, 'post', lambda *args, **kwargs: response)
+    events = list(app.AIConverter.stream_question({'name': 'vessel_tonnage', 'type': 'text'}))
+    assert events[-1][0] == "question"
+    return events[-1][1]
+
+
+@pytest.mark.parametrize('ending', [["data: [DONE]"], [chunk(finish_reason="stop")]])
+def test_finished_stream_is_cached(monkeypatch, cache, ending):
+    question = stream(monkeypatch, FakeStream([chunk("Question: What is the tonnage?\n"), chunk("Help: In tons."), *ending]))
+    assert question["question"] == "What is the tonnage?"
+    assert list(cache.values()) == [question]
+
+
+def test_cut_off_stream_is_returned_but_not_cached(monkeypatch, cache):
+    question = stream(monkeypatch, FakeStream([chunk("Question: What is the"), chunk(" tonnage of")], cut_off=True))
+    assert question["question"] == "What is the tonnage of"
+    assert cache == {}
+
+
+def test_stream_ending_without_done_is_not_cached(monkeypatch, cache):
+    stream(monkeypatch, FakeStream([chunk("Question: What is the tonnage?")]))
+    assert cache == {}